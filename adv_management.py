@@ -0,0 +1,361 @@
+# ------------------------------------------------------------
+# adv_management.py  –  Headless batch runner (no Streamlit)
+# ------------------------------------------------------------
+#
+#   python -m adv_management eplan  exports/            -o out/
+#   python -m adv_management komax  week42/*.csv        -o out/ --jobs 4
+#   python -m adv_management bom    boms/ --data data.xlsx --stock kaunas_stock.xlsm
+#   python -m adv_management import-data data.xlsx
+#   python -m adv_management bom    boms/ --snapshot --stock kaunas_stock.xlsm
+#   python -m adv_management bom    boms/ --data data.xlsx --stock kaunas_stock.xlsm --ledger --priority 1234-567
+#   python -m adv_management ledger
+#
+# Every input file is converted in a worker process and produces one
+# output file plus one <input>.summary.json next to it in the output
+# directory. A CUBIC BOM for a project BOM is picked up from a sibling
+# file named <stem>_cubic.<ext>.
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from instrumentation import configure
+
+INPUT_TYPES = {
+    "eplan": (".csv", ".xls", ".xlsx"),
+    "komax": (".csv",),
+    "bom": (".xls", ".xlsx", ".xlsm"),
+}
+CUBIC_SUFFIX = "_cubic"
+
+
+def discover_inputs(mode: str, paths: list, exclude=()) -> list:
+    """Input files for a mode: files as given, directories scanned (not recursively)."""
+    exts = INPUT_TYPES[mode]
+    exclude = {os.path.abspath(p) for p in exclude if p}
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                full = os.path.join(path, name)
+                stem, ext = os.path.splitext(name)
+                if not os.path.isfile(full) or ext.lower() not in exts or name.startswith("~$"):
+                    continue
+                if mode == "bom" and stem.endswith(CUBIC_SUFFIX):
+                    continue
+                found.append(full)
+        else:
+            found.append(path)
+    return [f for f in found if os.path.abspath(f) not in exclude]
+
+
+def find_cubic(path: str):
+    """The <stem>_cubic.* sibling of a project BOM, if there is one."""
+    folder, name = os.path.split(path)
+    stem = os.path.splitext(name)[0]
+    for ext in INPUT_TYPES["bom"]:
+        for candidate in (stem + CUBIC_SUFFIX + ext, stem + CUBIC_SUFFIX + ext.upper()):
+            full = os.path.join(folder or ".", candidate)
+            if os.path.isfile(full):
+                return full
+    return None
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as fh:
+        return fh.read()
+
+
+# ------------------------------------------------------------
+# Per-mode converters: (path, out_dir, options) -> summary fields
+# ------------------------------------------------------------
+def convert_eplan(path: str, out_dir: str, options: dict) -> dict:
+    from instrumentation import run_report
+    from processing import STAGE1_PIPELINES, parse_component_functions, read_table
+    df = read_table(path)
+    group_symbols = {}
+    if options.get("functions"):
+        group_symbols = parse_component_functions(read_table(options["functions"], header=None))
+    rows_in = len(df)
+    # One run per file in a worker: memoising the result would only hold memory
+    df, report = STAGE1_PIPELINES.run(df, use_cache=False, group_symbols=group_symbols)
+    output = os.path.join(out_dir, f"{os.path.splitext(os.path.basename(path))[0]}_EPLAN_processed.csv")
+    df.to_csv(output, index=False)
+    return {"output": output, "rows_in": rows_in, "rows_out": len(df), "report": run_report(report)}
+
+
+def convert_komax(path: str, out_dir: str, options: dict) -> dict:
+    from instrumentation import run_report
+    from processing import run_stage2
+    report = []
+    df = run_stage2(io.BytesIO(_read_bytes(path)), report=report, use_cache=False)
+    output = os.path.join(out_dir, f"{os.path.basename(path)[:8]}_ADV_DLW_IMPORT.csv")
+    df.to_csv(output, index=False)
+    # rows_in: the frame stage2_pipeline_1 hands to the chain, as before
+    return {"output": output, "rows_in": report[0].rows_out, "rows_out": len(df), "report": run_report(report)}
+
+
+def _bom_inputs(path: str, options: dict):
+    """(ProjectInputs, CUBIC path) for one project BOM."""
+    from bom_processing import ProjectInputs, project_number_from_name
+    inputs = ProjectInputs(
+        project_number=project_number_from_name(os.path.basename(path)),
+        panel_type=options["panel_type"],
+        grounding=options["grounding"],
+        main_switch=options["main_switch"],
+        swing_frame=options["swing_frame"],
+        ups=options["ups"],
+        rittal=options["rittal"],
+    )
+    return inputs, None if inputs.rittal else find_cubic(path)
+
+
+def _bom_sources(path: str, cubic: str, options: dict):
+    from bom_processing import BomSources
+    if options.get("snapshot"):
+        return BomSources.from_paths(bom=path, cubic_bom=cubic, ks=options["stock"], data_snapshot=options["snapshot"])
+    return BomSources.from_paths(bom=path, cubic_bom=cubic, data=options["data"], ks=options["stock"])
+
+
+def _bom_summary(out_dir: str, inputs, cubic, result, bundle) -> dict:
+    from bom_processing import export_workbook
+    filename, data = export_workbook(bundle)
+    output = os.path.join(out_dir, filename)
+    with open(output, "wb") as fh:
+        fh.write(data)
+    return {
+        "output": output,
+        "project_number": inputs.project_number,
+        "cubic": cubic,
+        "bom_rows": len(result["df_bom_proc"]),
+        "tables": {k: len(bundle[k]) for k in ("job_A", "nav_A", "job_B", "nav_B", "df_mech", "df_remain",
+                                               "miss_nav_A", "miss_nav_B") if bundle.get(k) is not None},
+    }
+
+
+def convert_bom(path: str, out_dir: str, options: dict) -> dict:
+    from bom_processing import BOM_ENGINE
+    inputs, cubic = _bom_inputs(path, options)
+    result, bundle = BOM_ENGINE.headless(_bom_sources(path, cubic, options), inputs)
+    return _bom_summary(out_dir, inputs, cubic, result.as_dict(), bundle)
+
+
+CONVERTERS = {"eplan": convert_eplan, "komax": convert_komax, "bom": convert_bom}
+
+
+def _write_summary(summary: dict, path: str, out_dir: str, start: float) -> dict:
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    summary_path = os.path.join(out_dir, f"{os.path.splitext(os.path.basename(path))[0]}.summary.json")
+    with open(summary_path, "w", encoding="utf-8") as fh:
+        json.dump(summary, fh, indent=2, ensure_ascii=False, default=str)
+    summary["summary"] = summary_path
+    return summary
+
+
+def _error(e: Exception) -> dict:
+    return {"status": "error", "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()}
+
+
+def convert_file(mode: str, path: str, out_dir: str, options: dict) -> dict:
+    """
+    Convert one input and write its JSON summary; never raises.
+
+    Runs in a worker process, so everything it needs is imported here.
+    """
+    configure(options.get("log_level"))
+    start = time.perf_counter()
+    summary = {"mode": mode, "input": os.path.abspath(path), "status": "ok"}
+    try:
+        summary.update(CONVERTERS[mode](path, out_dir, options))
+    except Exception as e:
+        summary.update(_error(e))
+    return _write_summary(summary, path, out_dir, start)
+
+
+def run_batch(mode: str, inputs: list, out_dir: str, options: dict, jobs: int = None) -> list:
+    """Convert all inputs, spread over a process pool when jobs != 1."""
+    os.makedirs(out_dir, exist_ok=True)
+    if jobs == 1 or len(inputs) <= 1:
+        return [convert_file(mode, path, out_dir, options) for path in inputs]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(convert_file, mode, path, out_dir, options) for path in inputs]
+        return [f.result() for f in futures]
+
+
+def stage_bom_file(path: str, options: dict) -> dict:
+    """Worker half of a ledger run: everything up to stock allocation."""
+    from bom_processing import load_uploads, stage_bom
+    configure(options.get("log_level"))
+    inputs, cubic = _bom_inputs(path, options)
+    sources = _bom_sources(path, cubic, options)
+    return stage_bom(load_uploads(sources.as_uploads(), inputs.rittal), inputs.as_dict())
+
+
+def prioritise(inputs: list, priority: str = None) -> list:
+    """Inputs whose project number is listed in priority (comma separated) first, in that order; the rest keep their order."""
+    from bom_processing import project_number_from_name
+    rank = {p.strip(): i for i, p in enumerate((priority or "").split(",")) if p.strip()}
+    key = lambda path: rank.get(project_number_from_name(os.path.basename(path)), len(rank))
+    return sorted(inputs, key=key)
+
+
+def run_bom_ledger(inputs: list, out_dir: str, options: dict, jobs: int = None) -> list:
+    """
+    Stage 3 for several projects against the shared stock ledger.
+
+    BOMs are staged in parallel, then every project reserves stock in one
+    ledger transaction in priority order, so an earlier project's bins are
+    no longer available to the later ones; journals and workbooks are
+    written from those reservations.
+    """
+    from bom_processing import finish_bom, headless_bundle
+    from stock_ledger import StockLedger
+    os.makedirs(out_dir, exist_ok=True)
+    ordered = prioritise(inputs, options.get("priority"))
+    start = time.perf_counter()
+    staged, summaries = {}, {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {path: pool.submit(stage_bom_file, path, options) for path in ordered}
+        for path, future in futures.items():
+            summaries[path] = {"mode": "bom", "input": os.path.abspath(path), "status": "ok"}
+            try:
+                staged[path] = future.result()
+            except Exception as e:
+                summaries[path].update(_error(e))
+    jobs_ok = [path for path in ordered if path in staged]
+    # Ledger key: the project number, made unique if one batch holds several BOMs of a project
+    projects, seen = {}, set()
+    for path in jobs_ok:
+        project = _bom_inputs(path, options)[0].project_number or os.path.splitext(os.path.basename(path))[0]
+        projects[path] = project if project not in seen else f"{project}/{os.path.basename(path)}"
+        seen.add(project)
+    reserved = {}
+    if jobs_ok:
+        try:
+            ledger = StockLedger(options["ledger"])
+            stock = staged[jobs_ok[0]]["stock"]
+            reserved = ledger.reserve(stock, [(projects[p], [staged[p]["lines_A"], staged[p]["lines_B"]]) for p in jobs_ok])
+        except Exception as e:
+            for path in jobs_ok:
+                summaries[path].update(_error(e))
+            jobs_ok = []
+    for path in jobs_ok:
+        try:
+            inputs_, cubic = _bom_inputs(path, options)
+            proc = finish_bom(staged[path], inputs_.as_dict(), reserved[projects[path]])
+            bundle = headless_bundle(proc, inputs_.as_dict())
+            summaries[path].update(_bom_summary(out_dir, inputs_, cubic, proc, bundle))
+            summaries[path].update({"ledger": options["ledger"], "ledger_project": projects[path],
+                                    "priority": ordered.index(path) + 1})
+        except Exception as e:
+            summaries[path].update(_error(e))
+    return [_write_summary(summaries[path], path, out_dir, start) for path in ordered]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="adv_management", description="Batch conversion without the Streamlit UI.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("inputs", nargs="+", help="input files or directories")
+    common.add_argument("-o", "--output-dir", default="adv_output", help="where outputs and summaries go")
+    common.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    common.add_argument("--log-level", default=None, choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="stage log level on stderr (default: $ADV_LOG_LEVEL or INFO)")
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    eplan = sub.add_parser("eplan", parents=[common], help="Stage 1 – convert for EPLAN")
+    eplan.add_argument("--functions", help="component function list (for daisy chains)")
+
+    sub.add_parser("komax", parents=[common], help="Stage 2 – convert for KOMAX")
+
+    bom = sub.add_parser("bom", parents=[common], help="Stage 3 – BOM, job journals and NAV tables")
+    data = bom.add_mutually_exclusive_group(required=True)
+    data.add_argument("--data", help="DATA workbook")
+    data.add_argument("--snapshot", nargs="?", const="latest",
+                      help="DATA snapshot directory (default: the newest one, see import-data)")
+    bom.add_argument("--stock", required=True, help="Kaunas stock workbook")
+    bom.add_argument("--panel-type", default="A")
+    bom.add_argument("--grounding", default="TT", choices=["TT", "TN-S", "TN-C-S"])
+    bom.add_argument("--main-switch", default="C160S4FM")
+    bom.add_argument("--swing-frame", action="store_true")
+    bom.add_argument("--ups", action="store_true")
+    bom.add_argument("--rittal", action="store_true", help="no CUBIC BOM")
+    bom.add_argument("--ledger", nargs="?", const=True, default=None,
+                     help="reserve stock in the shared ledger (default: $ADV_STOCK_LEDGER or stock_ledger.sqlite)")
+    bom.add_argument("--priority", help="project numbers to allocate first, comma separated (with --ledger)")
+
+    imp = sub.add_parser("import-data", help="store a DATA workbook as a columnar snapshot")
+    imp.add_argument("workbook", help="DATA workbook (.xlsx)")
+    imp.add_argument("--root", default=None, help="snapshot directory (default: $ADV_DATA_SNAPSHOTS or data_snapshots)")
+
+    led = sub.add_parser("ledger", help="show or release stock reservations")
+    led.add_argument("--path", default=None, help="ledger file (default: $ADV_STOCK_LEDGER or stock_ledger.sqlite)")
+    led.add_argument("--release", metavar="PROJECT", help="drop all reservations of a project")
+    return parser
+
+
+def import_data(workbook: str, root: str = None) -> int:
+    from data_snapshot import DEFAULT_ROOT, import_data_workbook, read_manifest
+    path = import_data_workbook(workbook, root or DEFAULT_ROOT)
+    manifest = read_manifest(path)
+    print(f"📦 {workbook} → {path} ({manifest['format']}, {len(manifest['sheets'])} sheets)")
+    return 0
+
+
+def ledger(path: str = None, release: str = None) -> int:
+    from stock_ledger import DEFAULT_PATH, StockLedger
+    led = StockLedger(path or DEFAULT_PATH)
+    if release:
+        print(f"🔓 {release}: {led.release(release)} reservations released")
+    summary = led.summary()
+    print(summary.to_string(index=False) if not summary.empty else "No reservations.")
+    return 0
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    configure(getattr(args, "log_level", None))
+    # pandas copy-on-write for this process and its workers (inherited through
+    # the environment), set before pandas is imported and never toggled per run
+    os.environ["PANDAS_COPY_ON_WRITE"] = "1"
+    if "pandas" in sys.modules:
+        sys.modules["pandas"].set_option("mode.copy_on_write", True)
+    if args.mode == "import-data":
+        return import_data(args.workbook, args.root)
+    if args.mode == "ledger":
+        return ledger(args.path, args.release)
+    if getattr(args, "snapshot", None) == "latest":
+        from data_snapshot import latest_snapshot
+        args.snapshot = latest_snapshot()
+        if args.snapshot is None:
+            print("No DATA snapshot found; run import-data first.", file=sys.stderr)
+            return 2
+    options = {k: v for k, v in vars(args).items() if k not in ("inputs", "output_dir", "jobs", "mode")}
+    exclude = [options.get("functions"), options.get("data"), options.get("stock")]
+    inputs = discover_inputs(args.mode, args.inputs, exclude=exclude)
+    if not inputs:
+        print(f"No {args.mode} inputs found.", file=sys.stderr)
+        return 2
+    if options.get("ledger"):
+        if options["ledger"] is True:
+            from stock_ledger import DEFAULT_PATH
+            options["ledger"] = DEFAULT_PATH
+        results = run_bom_ledger(inputs, args.output_dir, options, jobs=args.jobs)
+    else:
+        results = run_batch(args.mode, inputs, args.output_dir, options, jobs=args.jobs)
+    failed = 0
+    for r in results:
+        if r["status"] == "ok":
+            print(f"✅ {r['input']} → {r['output']} ({r['seconds']}s)")
+        else:
+            failed += 1
+            print(f"❌ {r['input']}: {r['error']}", file=sys.stderr)
+    print(f"{len(results) - failed}/{len(results)} converted, summaries in {args.output_dir}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
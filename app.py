@@ -1,35 +1,59 @@
 # ------------------------------------------------------------
 # app.py  –  Advansor Project Preparation Tool (main interface)
 # ------------------------------------------------------------
+import os
+import sys
 import streamlit as st
 import importlib
-import pandas as pd
-
-# --- SAFE IMPORTS ---
-stage1_ok = True
-stage2_ok = True
-bom_ok = True
-stage1_err = ""
-stage2_err = ""
-bom_err = ""
-
-try:
-    stage1 = importlib.import_module("stage1_to_eplan")
-except Exception as e:
-    stage1_ok = False
-    stage1_err = str(e)
-
-try:
-    stage2 = importlib.import_module("stage2_komax")
-except Exception as e:
-    stage2_ok = False
-    stage2_err = str(e)
-
-try:
-    stage3 = importlib.import_module("stage3_bom")
-except Exception as e:
-    bom_ok = False
-    bom_err = str(e)
+import importlib.util
+from instrumentation import configure
+
+# Stage loggers to stderr ($ADV_LOG_LEVEL, default INFO)
+configure()
+
+# pandas copy-on-write for the whole server process: the option is global to
+# the process (not per session thread), so it is set once here, before pandas
+# is first imported, and never toggled per run
+os.environ["PANDAS_COPY_ON_WRITE"] = "1"
+if "pandas" in sys.modules:
+    sys.modules["pandas"].set_option("mode.copy_on_write", True)
+
+# --- LAZY STAGES ---
+# A stage module (and pandas / openpyxl behind it) is imported only when its
+# page is opened; the landing page just checks that the module exists.
+STAGES = {
+    "eplan": ("stage1_to_eplan", "🚀 Convert for EPLAN", "❌ EPLAN module error"),
+    "komax": ("stage2_komax", "🔧 Convert for KOMAX", "❌ KOMAX module error"),
+    "bom": ("stage3_bom", "📦 BOM Generator", "❌ BOM module error"),
+}
+
+
+@st.cache_resource
+def module_found(module):
+    """Whether a stage module exists, checked once per process (finding it does not import it)."""
+    return importlib.util.find_spec(module) is not None
+
+
+def stage_error(stage):
+    module = STAGES[stage][0]
+    if not module_found(module):
+        return f"No module named '{module}'"
+    # A stage that failed to import is retried on every rerun, so a transient
+    # error or a fixed module clears without restarting the server
+    if stage in st.session_state.setdefault("stage_errors", {}):
+        load_stage(stage)
+    return st.session_state["stage_errors"].get(stage, "")
+
+
+def load_stage(stage):
+    errors = st.session_state.setdefault("stage_errors", {})
+    try:
+        module = importlib.import_module(STAGES[stage][0])
+    except Exception as e:
+        errors[stage] = str(e)
+        return None
+    errors.pop(stage, None)
+    return module
 
 # --- PAGE CONFIG ---
 st.set_page_config(
@@ -119,35 +143,26 @@ if "stage" not in st.session_state:
 # --- MAIN BUTTONS ---
 col1, col2, col3 = st.columns([3,2,3])
 with col2:
-    if stage1_ok:
-        if st.button("🚀 Convert for EPLAN", use_container_width=True):
-            st.session_state.stage = "eplan"
-    else:
-        st.button("❌ EPLAN module error", disabled=True, use_container_width=True)
-
-    st.write("")
-    if stage2_ok:
-        if st.button("🔧 Convert for KOMAX", use_container_width=True):
-            st.session_state.stage = "komax"
-    else:
-        st.button("❌ KOMAX module error", disabled=True, use_container_width=True)
-
-    st.write("")
-    if bom_ok:
-        if st.button("📦 BOM Generator", use_container_width=True):
-            st.session_state.stage = "bom"
-    else:
-        st.button("❌ BOM module error", disabled=True, use_container_width=True)
+    for i, (stage, (_, label, error_label)) in enumerate(STAGES.items()):
+        if i:
+            st.write("")
+        err = stage_error(stage)
+        if not err:
+            if st.button(label, use_container_width=True):
+                st.session_state.stage = stage
+        else:
+            st.button(error_label, disabled=True, help=err, use_container_width=True)
 
 st.markdown("---")
 
 # --- ROUTING ---
-if st.session_state.stage == "eplan" and stage1_ok:
-    stage1.render()
-elif st.session_state.stage == "komax" and stage2_ok:
-    stage2.render()
-elif st.session_state.stage == "bom" and bom_ok:
-    stage3.render()
+if st.session_state.stage in STAGES and not stage_error(st.session_state.stage):
+    module = load_stage(st.session_state.stage)
+    if module is None:
+        # Failed on first use: rerun so its button shows disabled, with the error as tooltip
+        st.session_state.stage = None
+        st.rerun()
+    module.render()
 
 # --- FOOTER ---
 st.markdown("---")
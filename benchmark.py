@@ -0,0 +1,328 @@
+# ------------------------------------------------------------
+# benchmark.py  –  Per-stage timings and peak memory on synthetic inputs
+# ------------------------------------------------------------
+#
+#   python -m benchmark                                   # all stages, 500 … 200k rows
+#   python -m benchmark --sizes 500,5000 --stages eplan,komax
+#   python -m benchmark --save-baseline                   # → benchmark_baseline.json
+#   python -m benchmark --baseline benchmark_baseline.json
+#
+# Every stage1_pipeline_* / stage2_pipeline_* and every Stage 3 step is
+# timed on seeded inputs from synthetic.py (best of --repeat runs), then
+# run once more under tracemalloc for its peak memory. Each step's output
+# digest is recorded too, so a baseline comparison flags changed results
+# as well as slower steps; the exit code is 1 if either happened.
+import argparse
+import contextlib
+import datetime
+import hashlib
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+
+import numpy as np
+import pandas as pd
+
+import synthetic
+from caching import params_digest
+from instrumentation import configure
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+STAGES = ("eplan", "komax", "bom")
+# Stage 3 steps timed inside stage_bom / finish_bom / headless_bundle
+BOM_STEPS = (
+    "pipeline_3A_0_rename", "pipeline_3A_1_filter", "pipeline_3A_2_accessories", "pipeline_3A_3_nav",
+    "pipeline_3A_4_stock", "pipeline_3A_5_tables", "pipeline_3B_0_prepare_cubic", "pipeline_3B_1_filtering",
+    "pipeline_3B_2_accessories", "pipeline_3B_3_nav", "pipeline_3B_4_stock", "pipeline_3B_5_tables",
+    "pipeline_4_1_calculation", "pipeline_4_2_missing_nav",
+)
+BOM_INPUTS = {"project_number": "2025-100", "panel_type": "B", "grounding": "TT", "main_switch": "C160S4FM",
+              "swing_frame": True, "ups": True, "rittal": False}
+
+
+@dataclass
+class StepResult:
+    """One step at one input size; nested Stage 3 steps are named parent/child."""
+    stage: str
+    size: int
+    step: str
+    seconds: float
+    calls: int
+    rows_in: int
+    rows_out: int
+    peak_mb: float = None
+    digest: str = ""
+
+
+def _rows(obj) -> int:
+    if isinstance(obj, io.BytesIO):
+        # A CSV upload: data lines
+        return max(obj.getvalue().count(b"\n") - 1, 0)
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, (tuple, list)):
+        return next((len(o) for o in obj if isinstance(o, pd.DataFrame)), 0)
+    if isinstance(obj, dict):
+        return sum(len(v) for v in obj.values() if isinstance(v, pd.DataFrame))
+    return 0
+
+
+def _frame_rows_digest(df: pd.DataFrame) -> str:
+    """
+    Hash of columns, dtypes and the multiset of rows.
+
+    Row order is left out: pipeline 20 appends terminal rows in set order,
+    which changes with PYTHONHASHSEED, so the order of tied rows differs
+    from one process to the next while the content does not.
+    """
+    rows = np.sort(pd.util.hash_pandas_object(df, index=False).to_numpy()) if len(df.columns) else np.array([len(df)])
+    return params_digest([str(c) for c in df.columns], [str(t) for t in df.dtypes], hashlib.sha256(rows.tobytes()).hexdigest())
+
+
+def _digest(obj) -> str:
+    """Content hash of a step's output (frames, tuples / dicts of frames); "" for anything else."""
+    if isinstance(obj, pd.DataFrame):
+        return _frame_rows_digest(obj)
+    if isinstance(obj, pd.Series):
+        return _frame_rows_digest(obj.to_frame())
+    if isinstance(obj, (tuple, list)):
+        return params_digest([_digest(o) for o in obj])
+    if isinstance(obj, dict):
+        return params_digest({str(k): _digest(v) for k, v in obj.items()})
+    return ""
+
+
+class Recorder:
+    """
+    Times calls by step name; with memory=True also their tracemalloc peak.
+
+    Calls may nest (a Stage 3 step inside stage_bom): the inner step is
+    recorded as outer/inner, and the outer peak still covers the inner one
+    although reset_peak() is called for each step. Output digests are
+    taken for outermost calls of the timing runs only.
+    """
+
+    def __init__(self, stage: str, size: int, memory: bool = False):
+        self.stage = stage
+        self.size = size
+        self.memory = memory
+        self.steps = {}
+        self._stack = []
+
+    def call(self, step: str, func, *args, **kwargs):
+        name = "/".join([f["step"] for f in self._stack] + [step])
+        if name not in self.steps:
+            # Listed in call order, an enclosing step before its inner ones
+            self.steps[name] = StepResult(self.stage, self.size, name, 0.0, 0, _rows(args[0]) if args else 0, 0)
+        frame = {"step": step, "base": 0, "peak": 0}
+        if self.memory:
+            if self._stack:
+                parent = self._stack[-1]
+                parent["peak"] = max(parent["peak"], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            frame["base"] = frame["peak"] = tracemalloc.get_traced_memory()[0]
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            out = func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            self._stack.pop()
+        peak = None
+        if self.memory:
+            frame["peak"] = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            peak = (frame["peak"] - frame["base"]) / 2**20
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], frame["peak"])
+        # Hashing inside an enclosing step would count towards its time, so nested steps get no digest
+        rec = self.steps[name]
+        rec.seconds += seconds
+        rec.calls += 1
+        rec.rows_out = _rows(out)
+        rec.digest = _digest(out) if not self._stack and not self.memory else ""
+        if peak is not None:
+            rec.peak_mb = max(rec.peak_mb or 0.0, peak)
+        return out
+
+
+def _run_registry(rec: Recorder, registry, df: pd.DataFrame, **params) -> pd.DataFrame:
+    """registry.run() without its cache, one recorded call per stage."""
+    df = df.copy()
+    for stage in registry.stages:
+        kwargs = {p: params[p] for p in stage.params if p in params}
+        df = rec.call(stage.name, stage.func, df, **kwargs)
+    return df
+
+
+@contextlib.contextmanager
+def _recorded(rec: Recorder, module, names):
+    """Route module-level calls of the named functions through rec for the duration of the block."""
+    originals = {n: getattr(module, n) for n in names}
+
+    def wrap(name, func):
+        return lambda *args, **kwargs: rec.call(name, func, *args, **kwargs)
+
+    try:
+        for name, func in originals.items():
+            setattr(module, name, wrap(name, func))
+        yield
+    finally:
+        for name, func in originals.items():
+            setattr(module, name, func)
+
+
+def prepare(stage: str, size: int, seed: int = 0):
+    """Synthetic input of one stage at one size (generated once, reused by every pass)."""
+    if stage == "eplan":
+        from processing import parse_component_functions
+        df = synthetic.eplan_wirelist(size, seed)
+        return df, parse_component_functions(synthetic.component_functions(df, seed))
+    if stage == "komax":
+        return synthetic.komax_csv(size, seed)
+    if stage == "bom":
+        return synthetic.bom_uploads(size, seed)
+    raise ValueError(f"unknown stage {stage!r}")
+
+
+def run_stage(rec: Recorder, stage: str, data) -> None:
+    if stage == "eplan":
+        from processing import STAGE1_PIPELINES
+        df, group_symbols = data
+        _run_registry(rec, STAGE1_PIPELINES, df, group_symbols=group_symbols)
+    elif stage == "komax":
+        from processing import STAGE2_PIPELINES, stage2_pipeline_1
+        df = rec.call("stage2_pipeline_1", stage2_pipeline_1, io.BytesIO(data))
+        _run_registry(rec, STAGE2_PIPELINES, df)
+    else:
+        import bom_processing as bp
+        # Cold caches: every pass parses the workbooks and builds the part catalogue
+        bp.PARSED_CACHE.clear()
+        bp.PART_CATALOGS.clear()
+        files = rec.call("load_uploads", bp.load_uploads, data)
+        with _recorded(rec, bp, BOM_STEPS):
+            staged = rec.call("stage_bom", bp.stage_bom, files, BOM_INPUTS)
+            proc = rec.call("finish_bom", bp.finish_bom, staged, BOM_INPUTS)
+            bundle = rec.call("headless_bundle", bp.headless_bundle, proc, BOM_INPUTS)
+        rec.call("export_workbook", bp.export_workbook, bundle, "202501010000")
+
+
+def bench(stage: str, size: int, seed: int = 0, repeat: int = 1, memory: bool = True) -> list:
+    """StepResults of one stage at one size: best-of-repeat seconds, peak memory from a separate traced run."""
+    data = prepare(stage, size, seed)
+    best = None
+    for _ in range(max(1, repeat)):
+        rec = Recorder(stage, size)
+        run_stage(rec, stage, data)
+        if best is None:
+            best = rec.steps
+        else:
+            for name, r in rec.steps.items():
+                best[name].seconds = min(best[name].seconds, r.seconds)
+    if memory:
+        rec = Recorder(stage, size, memory=True)
+        tracemalloc.start()
+        try:
+            run_stage(rec, stage, data)
+        finally:
+            tracemalloc.stop()
+        for name, r in rec.steps.items():
+            best[name].peak_mb = r.peak_mb
+    return list(best.values())
+
+
+def environment() -> dict:
+    from bom_processing import get_app_version
+    return {"version": get_app_version(), "python": platform.python_version(), "pandas": pd.__version__,
+            "machine": platform.machine(), "node": hashlib.sha256(platform.node().encode()).hexdigest()[:12],
+            "created": datetime.datetime.now().isoformat(timespec="seconds")}
+
+
+def compare(results: list, baseline: dict, tolerance: float = 0.25, min_seconds: float = 0.005) -> pd.DataFrame:
+    """
+    Results next to a baseline: time ratio, regression and changed-output flags per step.
+
+    A step regresses when it is more than tolerance slower and the
+    difference exceeds min_seconds (sub-millisecond steps are noise).
+    """
+    base = {(r["stage"], r["size"], r["step"]): r for r in baseline.get("results", [])}
+    rows = []
+    for r in results:
+        b = base.get((r.stage, r.size, r.step))
+        row = asdict(r)
+        row.update({"base_seconds": None, "ratio": None, "regression": False, "output_changed": False})
+        if b is not None:
+            row["base_seconds"] = b["seconds"]
+            row["ratio"] = r.seconds / b["seconds"] if b["seconds"] else None
+            row["regression"] = r.seconds > b["seconds"] * (1 + tolerance) and r.seconds - b["seconds"] > min_seconds
+            row["output_changed"] = bool(b.get("digest") and r.digest and b["digest"] != r.digest)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def write_results(path: str, results: list, options: dict) -> None:
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump({"environment": environment(), "options": options, "results": [asdict(r) for r in results]},
+                  fh, indent=2)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="benchmark", description="Time every pipeline stage on synthetic inputs.")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in synthetic.SIZES),
+                        help="wire-list rows per run, comma separated (Stage 3 inputs scale from it)")
+    parser.add_argument("--stages", default=",".join(STAGES), help="eplan, komax and/or bom")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per size; the fastest counts")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slow-down before a step regresses")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, metavar="PATH",
+                        help=f"store the results as baseline (default: {DEFAULT_BASELINE})")
+    parser.add_argument("-o", "--output", help="also write the results JSON here")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    configure("WARNING")
+    # Copy-on-write for the whole run, as app.py sets it for the server
+    pd.set_option("mode.copy_on_write", True)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        print(f"Unknown stage(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    results = []
+    for stage in stages:
+        for size in sizes:
+            start = time.perf_counter()
+            results.extend(bench(stage, size, args.seed, args.repeat, memory=not args.no_memory))
+            print(f"⏱️ {stage} {size} rows: {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    options = {"sizes": sizes, "stages": stages, "seed": args.seed, "repeat": args.repeat}
+    table = compare(results, {})
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            table = compare(results, json.load(fh), args.tolerance)
+    cols = ["stage", "size", "step", "seconds", "calls", "rows_in", "rows_out", "peak_mb"]
+    if args.baseline:
+        cols += ["base_seconds", "ratio", "regression", "output_changed"]
+    with pd.option_context("display.width", 200, "display.max_rows", None, "display.float_format", "{:.4f}".format):
+        print(table[cols].to_string(index=False))
+    for path in (args.output, args.save_baseline):
+        if path:
+            write_results(path, results, options)
+            print(f"📄 {path}", file=sys.stderr)
+    if args.baseline:
+        slow, changed = int(table["regression"].sum()), int(table["output_changed"].sum())
+        print(f"{slow} step(s) slower than {args.baseline} by more than {args.tolerance:.0%}, "
+              f"{changed} with changed output", file=sys.stderr)
+        return 1 if slow or changed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,578 @@
+# ------------------------------------------------------------
+# bom_processing.py  –  Stage 3 BOM processing (no UI)
+# ------------------------------------------------------------
+import pandas as pd
+import re, io, datetime, os, subprocess, hashlib
+from dataclasses import dataclass, asdict, fields
+from typing import Optional
+from functools import lru_cache
+from caching import LRUCache, frame_digest, frame_nbytes_estimate, params_digest
+from openpyxl import Workbook
+from openpyxl.styles import Font, PatternFill, Border, Side, NamedStyle
+from openpyxl.cell import WriteOnlyCell
+CURRENCY="EUR"; CURRENCY_FORMAT='#,##0.00 "EUR"'; PURCHASE_LOCATION_CODE="KAUNAS"; ALLOC_LOCATION_CODE="KAUNAS"
+@lru_cache(maxsize=None)
+def get_app_version():
+    # git is shelled out to once per process, not on every Stage 3 rerun
+    try:
+        cnt=subprocess.check_output(["git","rev-list","--count","HEAD"],stderr=subprocess.DEVNULL).decode().strip(); sha=subprocess.check_output(["git","rev-parse","--short","HEAD"],stderr=subprocess.DEVNULL).decode().strip(); return f"v{int(cnt):03d} ({sha})"
+    except Exception:
+        env_ver=os.getenv("APP_VERSION") or os.getenv("COMMIT_SHA"); return env_ver if env_ver else "v000"
+def coalesce_cols(df,target,candidates):
+    if target not in df.columns: df[target]=""
+    for c in candidates:
+        if c in df.columns: df[target]=df[target].where(df[target].notna()&(df[target].astype(str).str.strip()!=""),df[c])
+    return df.drop(columns=[c for c in candidates if c in df.columns],errors="ignore")
+def ensure_scalar_strings(df):
+    import numpy as np
+    def _to_scalar(v):
+        if isinstance(v,pd.Series):
+            v=v.dropna(); return "" if v.empty else _to_scalar(v.iloc[0])
+        if isinstance(v,(list,tuple,set,np.ndarray,dict)): return str(v)
+        return v
+    if df.empty: return df.map(_to_scalar)
+    # Numeric and all-string columns come out of the cell-wise map unchanged
+    out=df.copy()
+    for i in range(df.shape[1]):
+        s=df.iloc[:,i]
+        if s.dtype.kind in "biuf" or (s.dtype==object and pd.api.types.infer_dtype(s,skipna=True)=="string"): continue
+        out.isetitem(i,s.astype(object).map(_to_scalar))
+    return out
+def safe_parse_qty(x):
+    if pd.isna(x): return 0.0
+    if isinstance(x,(int,float)): return float(x)
+    s=str(x).strip()
+    if s in {"-","–","—",""}: return 0.0
+    s=s.replace("\xa0","").replace(" ","")
+    if "," in s and "." in s: s=s.replace(",","")
+    else: s=s.replace(".","").replace(",",".")
+    try: return float(s)
+    except Exception: return 0.0
+def get_excluded_from_stock(df_stock):
+    if df_stock is None or df_stock.empty or df_stock.shape[1]<3: return set(),set()
+    cols=list(df_stock.columns); s=df_stock.rename(columns={cols[0]:"Component",cols[2]:"Comment"})
+    m=s["Comment"].astype(str).str.strip().str.lower().isin(["no need","q1"])
+    comp=s.loc[m,"Component"].astype(str)
+    by_type=comp.str.upper().str.replace(" ","").str.strip()
+    def _norm_no(x):
+        try: return str(int(float(str(x).replace(",","." ).strip())))
+        except: return str(x).strip()
+    by_no=comp.map(_norm_no)
+    return set(by_type),set(by_no)
+def add_extra_components(df,extras):
+    if df is None: df=pd.DataFrame()
+    out=df.copy()
+    for e in extras or []: out=pd.concat([out,pd.DataFrame([{"Original Type":e.get("type",""),"Quantity":e.get("qty",1),"Source":"Extra","No.":e.get("force_no",e.get("type",""))}])],ignore_index=True)
+    return out
+def build_nav_table_from_bom(df_bom,df_part_no,label="Project BOM"):
+    req={"PartNo_A","SupplierNo_E","Manufacturer_D"}
+    if df_part_no is None or df_part_no.empty or not req.issubset(df_part_no.columns): return pd.DataFrame(columns=["Entry Type","No.","Quantity","Supplier","Profit","Discount","Description"])
+    supplier_map=dict(zip(df_part_no["PartNo_A"].astype(str),df_part_no["SupplierNo_E"])); manuf_map=dict(zip(df_part_no["PartNo_A"].astype(str),df_part_no["Manufacturer_D"].astype(str)))
+    tmp=df_bom.copy()
+    if "Quantity" not in tmp: tmp["Quantity"]=0
+    if "Description" not in tmp: tmp["Description"]=""
+    if "No." not in tmp: tmp["No."]=""
+    tmp["No."]=tmp["No."].astype(str); tmp["Quantity"]=pd.to_numeric(tmp["Quantity"],errors="coerce").fillna(0)
+    rows=[]
+    for _,r in tmp.iterrows():
+        part_no=str(r["No."]).strip(); qty=safe_parse_qty(r.get("Quantity",0)); manuf=manuf_map.get(part_no,""); profit=10 if "DANFOSS" in str(manuf).upper() else 17; supplier=supplier_map.get(part_no,30093)
+        rows.append({"Entry Type":"Item","No.":part_no,"Quantity":qty,"Supplier":supplier,"Profit":profit,"Discount":0,"Description":r.get("Description","")})
+    return pd.DataFrame(rows,columns=["Entry Type","No.","Quantity","Supplier","Profit","Discount","Description"])
+def pipeline_1_1_norm_name(x): return "".join(str(x).upper().split())
+def pipeline_1_2_parse_qty(x): return safe_parse_qty(x)
+def pipeline_1_4_normalize_no(x):
+    try: return str(int(float(str(x).replace(",","." ).strip())))
+    except Exception: return str(x).strip()
+def read_excel_any(file,**kwargs):
+    try: return pd.read_excel(file,engine="openpyxl",**kwargs)
+    except Exception: return pd.read_excel(file,engine="xlrd",**kwargs)
+normalize_no=pipeline_1_4_normalize_no
+def pipeline_2_3_get_sheet_safe(data_dict,names):
+    if not isinstance(data_dict,dict): return None
+    targets=[n.upper().replace(" ","_") for n in names]
+    for key in data_dict.keys():
+        if str(key).strip().upper().replace(" ","_") in targets: return data_dict[key]
+    return None
+def pipeline_2_4_normalize_part_no(df_raw):
+    if df_raw is None or df_raw.empty: return pd.DataFrame()
+    df=df_raw.copy().rename(columns=lambda c:str(c).strip()); col_map={}
+    if df.shape[1]>=1: col_map[df.columns[0]]="PartNo_A"
+    if df.shape[1]>=2: col_map[df.columns[1]]="PartName_B"
+    if df.shape[1]>=3: col_map[df.columns[2]]="Desc_C"
+    if df.shape[1]>=4: col_map[df.columns[3]]="Manufacturer_D"
+    if df.shape[1]>=5: col_map[df.columns[4]]="SupplierNo_E"
+    if df.shape[1]>=6: col_map[df.columns[5]]="UnitPrice_F"
+    return df.rename(columns=col_map)
+def pipeline_3A_0_rename(df_bom,df_part_code,extras=None):
+    if df_bom is None or df_bom.empty: return pd.DataFrame()
+    df=df_bom.copy()
+    if df_part_code is not None and not df_part_code.empty:
+        rename_map=dict(zip(df_part_code.iloc[:,0].astype(str).str.strip(),df_part_code.iloc[:,1].astype(str).str.strip()))
+        if "Original Type" in df.columns: df["Original Type"]=df["Original Type"].astype(str).str.strip().replace(rename_map)
+    if "Original Article" not in df.columns: df["Original Article"]=df.iloc[:,0].astype(str)
+    if extras: df=add_extra_components(df,[e for e in extras if e.get("target")=="bom"])
+    return df
+def pipeline_3A_1_filter(df_bom,df_stock):
+    if df_bom is None or df_bom.empty: return pd.DataFrame()
+    if df_stock is None or df_stock.empty: return df_bom.copy()
+    cols=list(df_stock.columns)
+    if len(cols)<3: return df_bom.copy()
+    df_stock=df_stock.rename(columns={cols[0]:"Component",cols[2]:"Comment"})
+    excluded=df_stock[df_stock["Comment"].astype(str).str.lower().str.strip()=="no need"]["Component"].astype(str).str.upper().str.replace(" ","").str.strip().unique()
+    df=df_bom.copy(); df["Norm_Type"]=df["Original Type"].astype(str).str.upper().str.replace(" ","").str.strip()
+    return df[~df["Norm_Type"].isin(excluded)].drop(columns=["Norm_Type"]).reset_index(drop=True)
+def compile_accessories(df_acc):
+    """Accessories sheet in long form: one row per (main item, accessory triplet), in sheet order.
+    A row's triplets end at the first blank accessory or at an incomplete triplet."""
+    recs=[]
+    if df_acc is not None and not df_acc.empty:
+        for main,v in zip(df_acc.iloc[:,0].astype(str).str.strip(),df_acc.values[:,1:]):
+            for i in range(0,len(v),3):
+                if i+2>=len(v) or pd.isna(v[i]): break
+                recs.append((main,str(v[i]).strip(),safe_parse_qty(str(v[i+1]).strip()),str(v[i+2]).strip()))
+    return pd.DataFrame(recs,columns=["Main","Original Type","Quantity","Manufacturer"])
+def expand_accessories(df,acc_long):
+    """df followed by the accessories of each of its rows (by row, then sheet order)."""
+    import numpy as np
+    if df.empty or acc_long.empty: return df.copy()
+    keys=pd.DataFrame({"Main":df["Original Type"].astype(str).str.strip().to_numpy(),"pos":np.arange(len(df))})
+    hit=keys.merge(acc_long.assign(seq=np.arange(len(acc_long))),on="Main").sort_values(["pos","seq"],kind="stable")
+    if hit.empty: return df.copy()
+    acc=pd.DataFrame({"Original Type":hit["Original Type"].to_numpy(),"Quantity":hit["Quantity"].to_numpy(dtype=float),"Manufacturer":hit["Manufacturer"].to_numpy(),"Source":"Accessory"})
+    return pd.concat([df,acc],ignore_index=True)
+def pipeline_3A_2_accessories(df_bom,df_acc,acc_long=None):
+    if df_acc is None or df_acc.empty: return df_bom
+    return expand_accessories(df_bom,acc_long if acc_long is not None else compile_accessories(df_acc))
+def _norm_part_no(x):
+    try: return str(int(float(str(x).strip().replace(",","."))))
+    except Exception: return str(x).strip()
+def part_no_keys(df_part_no):
+    part=df_part_no.reset_index(drop=True).rename(columns=lambda c:str(c).strip())
+    return pd.DataFrame({"Norm_B":part["PartName_B"].astype(str).str.upper().str.replace(" ","").str.strip(),"PartNo_A":part["PartNo_A"].map(_norm_part_no).fillna("").astype(str)})
+class PartCatalog:
+    """Part_no sheet hashed by normalised type name (Norm_B) and by NAV number (PartNo_A), first row winning on each.
+    lookup() resolves a whole BOM type column to No. plus the Part_no fields in one pass."""
+    FIELDS={"Desc_C":"Description","Manufacturer_D":"Supplier","SupplierNo_E":"Supplier No.","UnitPrice_F":"Unit Cost"}
+    def __init__(self,df_part_no,part_keys=None):
+        part=df_part_no.reset_index(drop=True).rename(columns=lambda c:str(c).strip())
+        keys=part_keys if part_keys is not None and len(part_keys)==len(part) else part_no_keys(part)
+        part=part.assign(Norm_B=keys["Norm_B"].to_numpy(),PartNo_A=keys["PartNo_A"].to_numpy())
+        part=part.drop_duplicates(subset=["Norm_B"],keep="first").drop_duplicates(subset=["PartNo_A"],keep="first").reset_index(drop=True)
+        self.by_type=pd.Index(part["Norm_B"]); self.by_no=pd.Index(part["PartNo_A"]); self.part_no=part["PartNo_A"].to_numpy(dtype=object)
+        self.records=part[[c for c in self.FIELDS if c in part.columns]].rename(columns=self.FIELDS)
+    def __len__(self): return len(self.by_type)
+    def lookup(self,types):
+        import numpy as np
+        norm=types.astype(str).str.upper().str.replace(" ","").str.strip(); pos=self.by_type.get_indexer(norm)
+        no=np.where(pos>=0,self.part_no[np.maximum(pos,0)],"").astype(object)
+        # An unknown type has No. "" and still picks up a part whose number normalises to ""
+        rows=np.where(pos>=0,pos,self.by_no.get_indexer([""])[0])
+        return no,self.records.reindex(rows).reset_index(drop=True)
+PART_CATALOGS=LRUCache(maxsize=4)
+def part_catalog(df_part_no,part_keys=None,data_digest=None):
+    """Catalog for a Part_no sheet, reused across runs on the same DATA source when data_digest is given."""
+    if df_part_no is None or df_part_no.empty: return None
+    if not {"PartName_B","PartNo_A"}.issubset(str(c).strip() for c in df_part_no.columns): return None
+    catalog=PART_CATALOGS.get(data_digest) if data_digest else None
+    if catalog is None:
+        catalog=PartCatalog(df_part_no,part_keys)
+        if data_digest: PART_CATALOGS.put(data_digest,catalog)
+    return catalog
+def pipeline_3A_3_nav(df_bom,df_part_no,part_keys=None,catalog=None):
+    if df_bom is None or df_bom.empty: return pd.DataFrame()
+    catalog=catalog if catalog is not None else part_catalog(df_part_no,part_keys)
+    if catalog is None:
+        df=df_bom.copy(); df["No."]=""; return df
+    no,rec=catalog.lookup(df_bom["Original Type"])
+    df=df_bom.drop(columns=["Norm_Type"],errors="ignore").reset_index(drop=True); df["No."]=no; df=pd.concat([df,rec],axis=1)
+    for c in PartCatalog.FIELDS.values():
+        if c not in df.columns: df[c]=""
+    return ensure_scalar_strings(df)
+def _read_stock_df(ks_file):
+    if isinstance(ks_file,pd.DataFrame): stock=ks_file.copy()
+    else: stock=pd.read_excel(io.BytesIO(ks_file.getvalue()),engine="openpyxl")
+    stock=stock.rename(columns=lambda c:str(c).strip())
+    cand_no=[c for c in stock.columns if c.lower() in ["no.","no","item no.","item no"]]; cand_bin=[c for c in stock.columns if c.lower() in ["bin code","bin","bin_code"]]; cand_qty=[c for c in stock.columns if c.lower() in ["quantity","qty","q"]]
+    if cand_no and cand_bin and cand_qty:
+        cols=[cand_no[0],cand_bin[0],cand_qty[0]]; stock=stock[cols]; stock.columns=["No.","Bin Code","Quantity"]
+    else:
+        cols=list(stock.columns)
+        if len(cols)>=4: stock=stock[[cols[2],cols[1],cols[3]]]; stock.columns=["No.","Bin Code","Quantity"]
+        else: return pd.DataFrame(columns=["No.","Bin Code","Quantity"])
+    stock["No."]=stock["No."].apply(pipeline_1_4_normalize_no); stock["Quantity"]=pd.to_numeric(stock["Quantity"],errors="coerce").fillna(0.0); stock["Bin Code"]=stock["Bin Code"].astype(str).str.strip()
+    return stock
+class StockAllocator:
+    """Kaunas stock as per-part bin arrays (sheet order) for greedy allocation of whole BOMs.
+    A line fills its part's bins in order, skipping empty bins and the excluded bin, and buys the rest.
+    By default lines do not deplete each other; deplete=True lets earlier lines use bins up first.
+    Parts with no stock row at all are bought outright."""
+    EXCLUDED_BIN="67-01-01-01"; EPS=1e-9
+    def __init__(self,stock,key=None):
+        import numpy as np
+        self.stock=stock.reset_index(drop=True); self._key=key
+        self.parts=pd.Index(pd.unique(self.stock["No."].to_numpy()))
+        ok=(self.stock["Quantity"].to_numpy(dtype=float)>0)&(self.stock["Bin Code"].to_numpy()!=self.EXCLUDED_BIN)
+        code=self.parts.get_indexer(self.stock["No."])[ok]; order=np.argsort(code,kind="stable")
+        self.rows=np.flatnonzero(ok)[order]; self.bins=self.stock["Bin Code"].to_numpy(dtype=object)[self.rows]; self.qty=self.stock["Quantity"].to_numpy(dtype=float)[self.rows]
+        # Trailing zero slot: code -1 (no stock rows) reads as a part without bins
+        self.counts=np.append(np.bincount(code,minlength=len(self.parts)),0); self.starts=np.cumsum(self.counts)-self.counts
+    @classmethod
+    def from_ks(cls,ks_file): return cls(_read_stock_df(ks_file))
+    @property
+    def key(self):
+        """Content hash of the stock sheet; reservations are recorded against it."""
+        if self._key is None: self._key=frame_digest(self.stock)
+        return self._key
+    def without(self,reserved):
+        """Allocator over what is left after reserved ({stock row: qty}) is taken out."""
+        import numpy as np
+        if not reserved: return self
+        q=self.stock["Quantity"].to_numpy(dtype=float).copy(); rows=np.fromiter(reserved.keys(),dtype=int,count=len(reserved)); ok=(rows>=0)&(rows<len(q))
+        np.subtract.at(q,rows[ok],np.fromiter(reserved.values(),dtype=float,count=len(reserved))[ok]); q[q<self.EPS]=0.0
+        return StockAllocator(self.stock.assign(Quantity=q),key=self.key)
+    @staticmethod
+    def demand(df):
+        """(normalised No., parsed qty) of the journal lines in df."""
+        import numpy as np
+        return _column_values(df,"No.",None),np.array([safe_parse_qty(v) for v in _column_values(df,"Quantity",0)],dtype=float)
+    def allocate(self,nos,qtys,deplete=False):
+        """(line, bin, qty, stock row) arrays in journal order for lines with normalised No. and parsed qty.
+        bin is "" for a purchased remainder and None for a line whose part has no stock rows; row is -1 for both."""
+        import numpy as np
+        qtys=np.asarray(qtys,dtype=float); code=self.parts.get_indexer(pd.Index(nos,dtype=object)); n=self.counts[code]
+        need=np.where(np.isnan(qtys),0.0,qtys); none=np.flatnonzero(code<0)
+        parts=[(none,np.zeros(len(none),dtype=int),np.full(len(none),None,dtype=object),qtys[none],np.full(len(none),-1))]
+        if deplete: rem=self._deplete(code,need,parts)
+        else:
+            rem=need.copy()
+            # One vectorised step per bin rank; rem - take in the same order as filling bin by bin
+            for k in range(int(n.max()) if len(n) else 0):
+                act=np.flatnonzero((n>k)&(rem>0))
+                if not len(act): break
+                j=self.starts[code[act]]+k; take=np.minimum(self.qty[j],rem[act]); rem[act]=rem[act]-take
+                parts.append((act,j,self.bins[j],take,self.rows[j]))
+        act=np.flatnonzero((code>=0)&(rem>0)); parts.append((act,np.full(len(act),len(self.qty)),np.full(len(act),"",dtype=object),rem[act],np.full(len(act),-1)))
+        lines,ranks,bins,out,rows=(np.concatenate(a) for a in zip(*parts)); order=np.lexsort((ranks,lines))
+        return lines[order],bins[order],out[order],rows[order]
+    def _deplete(self,code,need,parts):
+        # Per part: line i covers [sum of earlier demand, + need) of the part's cumulative bin supply
+        import numpy as np
+        rem=need.copy(); live=np.flatnonzero((code>=0)&(need>0)); live=live[np.argsort(code[live],kind="stable")]
+        for grp in np.split(live,np.flatnonzero(np.diff(code[live]))+1):
+            if not len(grp): continue
+            p=code[grp[0]]; start=self.starts[p]; s=self.qty[start:start+self.counts[p]]
+            if not len(s): continue
+            d=need[grp]; hi=np.cumsum(d); lo=np.concatenate([[0.0],hi[:-1]]); S=np.cumsum(s); P=np.concatenate([[0.0],S[:-1]])
+            first=np.searchsorted(S,lo,side="right"); cnt=np.maximum(np.searchsorted(P,hi,side="left")-first,0)
+            li=np.repeat(np.arange(len(grp)),cnt); j=np.repeat(first,cnt)+np.arange(cnt.sum())-np.repeat(np.cumsum(cnt)-cnt,cnt)
+            take=np.where((P[j]>=lo[li])&(S[j]<=hi[li]),s[j],np.minimum(S[j],hi[li])-np.maximum(P[j],lo[li])); keep=take>self.EPS
+            li,j=li[keep],start+j[keep]; parts.append((grp[li],j,self.bins[j],take[keep],self.rows[j]))
+            rem[grp]=np.where(lo>=S[-1],d,np.maximum(hi-S[-1],0.0))
+        return rem
+    def allocate_frames(self,frames):
+        """Depleting allocation of several journals in turn; one (line, bin, qty, row) tuple per frame, None for a missing frame."""
+        import numpy as np
+        dem=[self.demand(f) if f is not None and not f.empty else None for f in frames]
+        used=[d for d in dem if d is not None]
+        if not used: return [None]*len(frames)
+        sizes=[len(d[1]) for d in used]; off=np.cumsum(sizes)-sizes
+        line,bins,qty,rows=self.allocate(np.concatenate([d[0] for d in used]),np.concatenate([d[1] for d in used]),deplete=True)
+        out=[]; i=0
+        for d in dem:
+            if d is None: out.append(None); continue
+            m=(line>=off[i])&(line<off[i]+sizes[i]); out.append((line[m]-off[i],bins[m],qty[m],rows[m])); i+=1
+        return out
+def pipeline_3A_4_stock(df_bom):
+    if df_bom is None or df_bom.empty: return pd.DataFrame()
+    df=df_bom.copy(); df["No."]=df["No."].apply(pipeline_1_4_normalize_no); return df
+def _column_values(df,col,default):
+    import numpy as np
+    return df[col].to_numpy(dtype=object) if col in df.columns else np.full(len(df),default,dtype=object)
+def _job_journal(df,project_number,stock,allocation=None):
+    import numpy as np
+    if df is None or df.empty: return pd.DataFrame()
+    nos,qty=stock.demand(df); line,bins,alloc,_=allocation if allocation is not None else stock.allocate(nos,qty)
+    if not len(line): return pd.DataFrame()
+    bought=np.array([b is None for b in bins]); binc=np.where(bought,"",bins); m=len(line)
+    return pd.DataFrame({"Entry Type":["Item"]*m,"No.":nos[line].tolist(),"Document No.":np.where(bought,f"{project_number}/N",project_number).tolist(),"Job No.":[project_number]*m,"Job Task No.":[1144]*m,
+        "Quantity":alloc.tolist(),"Location Code":np.where(binc!="",ALLOC_LOCATION_CODE,PURCHASE_LOCATION_CODE).tolist(),"Bin Code":binc.tolist(),
+        "Description":_column_values(df,"Description","")[line].tolist(),"Original Type":_column_values(df,"Original Type","")[line].tolist()})
+def _nav_table(df_bom,df_part_no):
+    supplier_map=manuf_map={}
+    if df_part_no is not None and not df_part_no.empty:
+        if {"PartNo_A","SupplierNo_E"}.issubset(df_part_no.columns): supplier_map=dict(zip(df_part_no["PartNo_A"].astype(str),df_part_no["SupplierNo_E"]))
+        if {"PartNo_A","Manufacturer_D"}.issubset(df_part_no.columns): manuf_map=dict(zip(df_part_no["PartNo_A"].astype(str),df_part_no["Manufacturer_D"].astype(str)))
+    tmp=df_bom.copy()
+    if "Quantity" not in tmp: tmp["Quantity"]=0
+    if "Description" not in tmp: tmp["Description"]=""
+    tmp["No."]=tmp["No."].astype(str); tmp["Quantity"]=pd.to_numeric(tmp["Quantity"],errors="coerce").fillna(0)
+    nos=tmp["No."].tolist(); n=len(nos)
+    return pd.DataFrame({"Entry Type":["Item"]*n,"No.":nos,"Quantity":[float(q or 0) for q in tmp["Quantity"].tolist()],"Supplier":[supplier_map.get(p,30093) for p in nos],
+        "Profit":[10 if "DANFOSS" in str(manuf_map.get(p,"")).upper() else 17 for p in nos],"Discount":[0]*n,"Description":tmp["Description"].tolist()},columns=["Entry Type","No.","Quantity","Supplier","Profit","Discount","Description"])
+def pipeline_3A_5_tables(df_bom,project_number,df_part_no,stock,allocation=None):
+    return _job_journal(df_bom,project_number,stock,allocation),_nav_table(df_bom,df_part_no),df_bom
+def pipeline_3B_0_prepare_cubic(df_cubic,df_part_code,extras=None):
+    if df_cubic is None or df_cubic.empty: return pd.DataFrame()
+    df=df_cubic.copy().rename(columns=lambda c:str(c).strip())
+    qty_cols=[c for c in df.columns if str(c).strip() in {"E","F","G"}]; combo=[c for c in df.columns if re.sub(r"\s+","",str(c)).upper() in {"E+F+G","E+F","F+G","E+G"} or (("E" in str(c).upper()) and ("F" in str(c).upper()) and ("G" in str(c).upper()))]
+    if qty_cols: df["Quantity"]=df[qty_cols].bfill(axis=1).iloc[:,0]
+    elif combo:
+        cc=combo[0]; df["Quantity"]=df[cc].apply(lambda v: safe_parse_qty(re.search(r"([0-9]+[.,]?[0-9]*)",str(v)).group(1)) if (pd.notna(v) and re.search(r"([0-9]+[.,]?[0-9]*)",str(v))) else 0.0)
+    else:
+        if "Quantity" not in df.columns: df["Quantity"]=0
+    df["Quantity"]=pd.to_numeric(df["Quantity"],errors="coerce").fillna(0)
+    if "Item Id" in df.columns: df["Original Type"]=df["Item Id"].astype(str).str.strip()
+    elif "Original Type" not in df.columns: df["Original Type"]=df[df.columns[0]].astype(str)
+    if "No." not in df.columns: df["No."]=df["Original Type"]
+    if df_part_code is not None and not df_part_code.empty:
+        rename_map=dict(zip(df_part_code.iloc[:,0].astype(str).str.strip(),df_part_code.iloc[:,1].astype(str).str.strip()))
+        df["Original Type"]=df["Original Type"].astype(str).str.strip().replace(rename_map)
+    if extras: df=add_extra_components(df,[e for e in extras if e.get("target")=="cubic"])
+    return df
+def pipeline_3B_1_filtering(df_cubic,df_stock):
+    if df_cubic is None or df_cubic.empty: return pd.DataFrame(),pd.DataFrame()
+    if df_stock is None or df_stock.empty: return df_cubic.copy(),df_cubic.copy()
+    cols=list(df_stock.columns)
+    if len(cols)<3: return df_cubic.copy(),df_cubic.copy()
+    s=df_stock.rename(columns={cols[0]:"Component",cols[2]:"Comment"}); bad=s[s["Comment"].astype(str).str.strip().str.lower().isin(["no need","q1"])]["Component"].astype(str); banned=bad.str.upper().str.replace(" ","").str.strip().unique()
+    df=df_cubic.copy(); df["Norm_Type"]=df["Original Type"].astype(str).str.upper().str.replace(" ","").str.strip()
+    df_keep=df[~df["Norm_Type"].isin(banned)].reset_index(drop=True).drop(columns=["Norm_Type"])
+    return df_keep.copy(),df_keep.copy()
+def pipeline_3B_2_accessories(df,df_acc,acc_long=None): return pipeline_3A_2_accessories(df,df_acc,acc_long)
+def pipeline_3B_3_nav(df,df_part_no,part_keys=None,catalog=None): return pipeline_3A_3_nav(df,df_part_no,part_keys,catalog)
+def pipeline_3B_4_stock(df_journal): return pipeline_3A_4_stock(df_journal)
+def pipeline_3B_5_tables(df_journal,df_nav,project_number,df_part_no,stock,allocation=None):
+    return _job_journal(df_journal,project_number,stock,allocation),_nav_table(df_nav,df_part_no),df_nav
+def pipeline_4_1_calculation(df_bom,df_cubic,df_hours,panel_type,grounding,project_number,df_instr=None):
+    if df_bom is None: df_bom=pd.DataFrame()
+    if df_cubic is None: df_cubic=pd.DataFrame()
+    if df_hours is None: df_hours=pd.DataFrame()
+    if not df_bom.empty and {"Quantity","Unit Cost"}.issubset(df_bom.columns): parts_cost=(pd.to_numeric(df_bom["Quantity"],errors="coerce").fillna(0)*pd.to_numeric(df_bom["Unit Cost"],errors="coerce").fillna(0)).sum()
+    else: parts_cost=0
+    if not df_cubic.empty and {"Quantity","Unit Cost"}.issubset(df_cubic.columns): cubic_cost=(pd.to_numeric(df_cubic["Quantity"],errors="coerce").fillna(0)*pd.to_numeric(df_cubic["Unit Cost"],errors="coerce").fillna(0)).sum()
+    else: cubic_cost=0
+    hours_cost=0
+    if not df_hours.empty and df_hours.shape[1]>4:
+        hourly_rate=pd.to_numeric(df_hours.iloc[1,4],errors="coerce"); row=df_hours[df_hours.iloc[:,0].astype(str).str.upper()==str(panel_type).upper()]
+        if not row.empty:
+            if grounding=="TT": h=pd.to_numeric(row.iloc[0,1],errors="coerce")
+            elif grounding=="TN-S": h=pd.to_numeric(row.iloc[0,2],errors="coerce")
+            else: h=pd.to_numeric(row.iloc[0,3],errors="coerce")
+            hours_cost=(h if pd.notna(h) else 0)*(hourly_rate if pd.notna(hourly_rate) else 0)
+    smart_supply=9750.0; wire_set=2500.0; total=parts_cost+cubic_cost+hours_cost+smart_supply+wire_set; project_size=""; pallet_size=""
+    if df_instr is not None and not df_instr.empty:
+        row=df_instr[df_instr.iloc[:,0].astype(str).str.upper()==str(panel_type).upper()]
+        if not row.empty:
+            project_size=str(row.iloc[0,1]) if row.shape[1]>1 else ""; pallet_size=str(row.iloc[0,2]) if row.shape[1]>2 else ""
+    return pd.DataFrame([{"Label":"Parts","Value":parts_cost},{"Label":"Cubic","Value":cubic_cost},{"Label":"Hours cost","Value":hours_cost},{"Label":"Smart supply","Value":smart_supply},{"Label":"Wire set","Value":wire_set},{"Label":"Extra","Value":0},{"Label":"Total","Value":total},{"Label":"Total+5%","Value":total*1.05},{"Label":"Total+35%","Value":total*1.35},{"Label":"Project size","Value":project_size},{"Label":"Pallet size","Value":pallet_size}])
+def pipeline_4_2_missing_nav(df,source):
+    if df is None or df.empty or "No." not in df.columns: return pd.DataFrame()
+    missing=df[df["No."].astype(str).str.strip()=="" ] if not df.empty else pd.DataFrame()
+    if missing.empty: return pd.DataFrame()
+    qty=pd.to_numeric(missing.get("Quantity",0),errors="coerce").fillna(0).astype(float) if "Quantity" in missing else 0
+    return pd.DataFrame({"Source":source,"Original Article":missing.get("Original Article",""),"Original Type":missing.get("Original Type",""),"Quantity":qty,"NAV No.":missing["No."]})
+PARSED_CACHE=LRUCache(maxsize=64,max_bytes=256*1024*1024)
+def _copy_parsed(obj): return {k:v.copy() for k,v in obj.items()} if isinstance(obj,dict) else obj.copy()
+def read_excel_cached(raw,fallback=True,**kwargs):
+    """read_excel_any (fallback=True) or pd.read_excel on upload bytes, parsed once per (SHA-256, options); returns a private copy."""
+    key=params_digest("xlsx",hashlib.sha256(raw).hexdigest(),fallback,kwargs); hit=PARSED_CACHE.get(key)
+    if hit is None:
+        hit=read_excel_any(io.BytesIO(raw),**kwargs) if fallback else pd.read_excel(io.BytesIO(raw),**kwargs); PARSED_CACHE.put(key,hit)
+    return _copy_parsed(hit)
+def read_upload(raw,*,skiprows=None):
+    try:
+        if skiprows is not None: return read_excel_cached(raw,skiprows=skiprows)
+        return read_excel_cached(raw)
+    except Exception: return read_excel_cached(raw)
+def prepare_cubic_upload(df_cubic):
+    df_cubic=df_cubic.rename(columns=lambda c:str(c).strip())
+    qty_cols=[c for c in df_cubic.columns if str(c).strip() in {"E","F","G"}]
+    combo=[c for c in df_cubic.columns if re.sub(r"\s+","",str(c)).upper() in {"E+F+G","E+F","F+G","E+G"} or (("E" in str(c).upper()) and ("F" in str(c).upper()) and ("G" in str(c).upper()))]
+    if qty_cols: df_cubic["Quantity"]=df_cubic[qty_cols].bfill(axis=1).iloc[:,0]
+    elif combo:
+        cc=combo[0]; df_cubic["Quantity"]=df_cubic[cc].apply(lambda v: safe_parse_qty(re.search(r"([0-9]+[.,]?[0-9]*)",str(v)).group(1)) if (pd.notna(v) and re.search(r"([0-9]+[.,]?[0-9]*)",str(v))) else 0.0)
+    else:
+        if "Quantity" not in df_cubic.columns: df_cubic["Quantity"]=0
+    df_cubic["Quantity"]=pd.to_numeric(df_cubic["Quantity"],errors="coerce").fillna(0)
+    if "Item Id" in df_cubic.columns: df_cubic=df_cubic.rename(columns={"Item Id":"Original Type"})
+    else: df_cubic["Original Type"]=df_cubic[df_cubic.columns[0]].astype(str)
+    if "No." not in df_cubic.columns: df_cubic["No."]=df_cubic["Original Type"]
+    return df_cubic
+def prepare_bom_upload(df_bom):
+    if df_bom.shape[1]>=2:
+        colA=df_bom.iloc[:,0].fillna("").astype(str).str.strip(); colB=df_bom.iloc[:,1].fillna("").astype(str).str.strip()
+        df_bom["Original Article"]=colA; df_bom["Original Type"]=colB.where(colB!="",colA)
+    else:
+        df_bom["Original Article"]=df_bom.iloc[:,0].fillna("").astype(str).str.strip(); df_bom["Original Type"]=df_bom["Original Article"]
+    return df_bom
+def load_uploads(uploads,rittal=False):
+    dfs={}
+    if not rittal and uploads.get("cubic_bom"): dfs["cubic_bom"]=prepare_cubic_upload(read_upload(uploads["cubic_bom"],skiprows=15))
+    if uploads.get("bom"): dfs["bom"]=prepare_bom_upload(read_upload(uploads["bom"]))
+    if uploads.get("data_snapshot"):
+        from data_snapshot import load_data_snapshot
+        dfs["data"],dfs["data_keys"]=load_data_snapshot(uploads["data_snapshot"]); dfs["data_digest"]=os.path.abspath(uploads["data_snapshot"])
+    elif uploads.get("data"): dfs["data"]=read_excel_cached(uploads["data"],fallback=False,sheet_name=None); dfs["data_digest"]=hashlib.sha256(uploads["data"]).hexdigest()
+    if uploads.get("ks"): dfs["ks"]=read_upload(uploads["ks"])
+    return dfs
+def project_number_from_name(name):
+    m=re.search(r"\d{4}\s*[-–—]\s*\d{3}",str(name)); return re.sub(r"\s*[-–—]\s*","-",m.group(0)) if m else ""
+def stage_bom(files,inputs):
+    """process_bom up to the stock allocation: DATA sheets, extras and the normalised journal lines."""
+    data_book=files.get("data",{}); part_keys=(files.get("data_keys") or {}).get("part_no")
+    df_stock=pipeline_2_3_get_sheet_safe(data_book,["Stock"])
+    df_part_no=pipeline_2_4_normalize_part_no(pipeline_2_3_get_sheet_safe(data_book,["Part_no","Parts_no","Part no"])); catalog=part_catalog(df_part_no,part_keys,files.get("data_digest"))
+    df_hours=pipeline_2_3_get_sheet_safe(data_book,["Hours"])
+    df_acc=pipeline_2_3_get_sheet_safe(data_book,["Accessories"]); acc_long=compile_accessories(df_acc)
+    df_code=pipeline_2_3_get_sheet_safe(data_book,["Part_code"])
+    df_instr=pipeline_2_3_get_sheet_safe(data_book,["Instructions"])
+    extras=[]
+    if inputs["ups"]: extras.extend([{"type":"LI32111CT01","qty":1,"target":"bom","force_no":"2214036"},{"type":"ADV UPS holder V3","qty":1,"target":"bom","force_no":"2214035"},{"type":"268-2610","qty":1,"target":"bom","force_no":"1865206"}])
+    if inputs["swing_frame"]: extras.append({"type":"9030+2970","qty":1,"target":"cubic","force_no":"2185835"})
+    if df_instr is not None and not df_instr.empty:
+        row=df_instr[df_instr.iloc[:,0].astype(str).str.upper()==str(inputs["panel_type"]).upper()]
+        if not row.empty:
+            if inputs["panel_type"][0] not in ["F","G"]:
+                try: qty_sdd=int(pd.to_numeric(row.iloc[0,4],errors="coerce").fillna(0))
+                except Exception: qty_sdd=0
+                if qty_sdd>0: extras.append({"type":"SDD07550","qty":qty_sdd,"target":"cubic","force_no":"SDD07550"})
+            for cidx in range(5,10):
+                if cidx<row.shape[1]:
+                    v=str(row.iloc[0,cidx]).strip()
+                    if v and v.lower()!="nan": extras.append({"type":v,"qty":1,"target":"cubic"})
+    stock=StockAllocator.from_ks(files["ks"]) if "ks" in files else None; lines_A=lines_B=lines_nav=None
+    if all(k in files for k in ["bom","data","ks"]):
+        df_bom=pipeline_3A_0_rename(files["bom"],df_code,extras); df_bom=pipeline_3A_1_filter(df_bom,df_stock); df_bom=pipeline_3A_2_accessories(df_bom,df_acc,acc_long); df_bom=pipeline_3A_3_nav(df_bom,df_part_no,part_keys,catalog); lines_A=pipeline_3A_4_stock(df_bom)
+    if (not inputs["rittal"]) and all(k in files for k in ["cubic_bom","data","ks"]):
+        df_cubic=pipeline_3B_0_prepare_cubic(files["cubic_bom"],df_code,extras); df_j,df_n=pipeline_3B_1_filtering(df_cubic,df_stock); df_j=pipeline_3B_2_accessories(df_j,df_acc,acc_long); df_n=pipeline_3B_2_accessories(df_n,df_acc,acc_long); df_j=pipeline_3B_3_nav(df_j,df_part_no,part_keys,catalog); lines_nav=pipeline_3B_3_nav(df_n,df_part_no,part_keys,catalog); lines_B=pipeline_3B_4_stock(df_j)
+    return {"data_book":data_book,"df_stock":df_stock,"df_part_no":df_part_no,"df_hours":df_hours,"df_acc":df_acc,"df_code":df_code,"df_instr":df_instr,"extras":extras,"stock":stock,"lines_A":lines_A,"lines_B":lines_B,"lines_nav":lines_nav}
+def finish_bom(staged,inputs,allocations=(None,None)):
+    """Job journals and NAV tables from stage_bom output; allocations are precomputed (A, B) stock allocations, e.g. from a ledger."""
+    proc={k:v for k,v in staged.items() if k not in ("stock","lines_A","lines_B","lines_nav")}; pn=inputs["project_number"]
+    job_A=nav_A=df_bom_proc=job_B=nav_B=df_cub_proc=pd.DataFrame()
+    if staged["lines_A"] is not None: job_A,nav_A,df_bom_proc=pipeline_3A_5_tables(staged["lines_A"],pn,staged["df_part_no"],staged["stock"],allocations[0])
+    if staged["lines_B"] is not None: job_B,nav_B,df_cub_proc=pipeline_3B_5_tables(staged["lines_B"],staged["lines_nav"],pn,staged["df_part_no"],staged["stock"],allocations[1])
+    return {**proc,"job_A":job_A,"nav_A":nav_A,"df_bom_proc":df_bom_proc,"job_B":job_B,"nav_B":nav_B,"df_cub_proc":df_cub_proc}
+def process_bom(files,inputs,ledger=None):
+    """Full Stage 3 run; with a StockLedger the project's allocations are reserved against what other projects hold."""
+    staged=stage_bom(files,inputs); allocations=(None,None)
+    if ledger is not None and staged["stock"] is not None:
+        allocations=ledger.reserve(staged["stock"],[(inputs["project_number"],[staged["lines_A"],staged["lines_B"]])])[inputs["project_number"]]
+    return finish_bom(staged,inputs,allocations)
+def apply_stock_exclusions(df,ex_type,ex_no):
+    if df is None or df.empty: return df
+    _norm_type=lambda s: str(s).upper().replace(" ","").strip()
+    def _norm_no(x):
+        sx=str(x).strip()
+        try: return str(int(float(sx.replace(",","."))))
+        except: return sx
+    t=df.copy()
+    if "Original Type" in t.columns:
+        t["_T"]=t["Original Type"].map(_norm_type); t["_N"]=t["No."].map(_norm_no) if "No." in t.columns else ""
+        t=t[~t["_T"].isin(ex_type) & (~t["_N"].isin(ex_no) if "No." in t.columns else True)].drop(columns=["_T","_N"],errors="ignore")
+    return t
+def mechanics_editable(job_B,ex_type,ex_no):
+    editable=apply_stock_exclusions(job_B.copy(),ex_type,ex_no); editable["Available Qty"]=editable["Quantity"].astype(float); return editable
+def split_mechanics(editable,takes,inputs):
+    mech_rows,remain_rows=[],[]
+    for idx,row in editable.iterrows():
+        take=float(takes.get(idx,0.0)); avail=float(row["Available Qty"]); r=row.to_dict()
+        if take>0: mech_rows.append({**r,"Quantity":take})
+        rem=max(avail-take,0.0)
+        if rem>0 and str(r.get("No.",""))!="2185835": remain_rows.append({**r,"Quantity":rem})
+    df_mech=pd.DataFrame(mech_rows); df_remain=pd.DataFrame(remain_rows)
+    if inputs["swing_frame"]:
+        swing=pd.DataFrame([{"Entry Type":"Item","Original Type":"9030+2970","No.":"2185835","Quantity":1,"Document No.":inputs["project_number"],"Job No.":inputs["project_number"],"Job Task No.":1144,"Location Code":PURCHASE_LOCATION_CODE,"Bin Code":"","Description":"Swing frame component","Source":"Extra"}])
+        df_mech=pd.concat([df_mech,swing],ignore_index=True)
+    return df_mech,df_remain
+def build_export_bundle(proc,inputs,df_mech,df_remain):
+    calc=pipeline_4_1_calculation(proc["df_bom_proc"],proc["df_cub_proc"],proc["df_hours"],inputs["panel_type"],inputs["grounding"],inputs["project_number"],proc["df_instr"])
+    miss_nav_A=pipeline_4_2_missing_nav(proc["df_bom_proc"],"Project BOM"); miss_nav_B=pipeline_4_2_missing_nav(proc["df_cub_proc"],"CUBIC BOM")
+    return {"inputs":inputs,"calc":calc,"job_A":proc["job_A"],"nav_A":proc["nav_A"],"job_B":proc["job_B"],"nav_B":proc["nav_B"],"miss_nav_A":miss_nav_A,"miss_nav_B":miss_nav_B,"df_mech":df_mech,"df_remain":df_remain}
+def process_bom_headless(files,inputs,mech_takes=None):
+    proc=process_bom(files,inputs); return proc,headless_bundle(proc,inputs,mech_takes)
+def headless_bundle(proc,inputs,mech_takes=None):
+    ex_type,ex_no=get_excluded_from_stock(proc["df_stock"]); df_mech=df_remain=pd.DataFrame()
+    if not proc["job_B"].empty:
+        editable=mechanics_editable(proc["job_B"],ex_type,ex_no)
+        if not editable.empty: df_mech,df_remain=split_mechanics(editable,mech_takes or {},inputs)
+    return build_export_bundle(proc,inputs,apply_stock_exclusions(df_mech,ex_type,ex_no),apply_stock_exclusions(df_remain,ex_type,ex_no))
+def _export_styles(wb):
+    """Register the export's named styles and return their names: cell (thin border), head (bold grey + border), head_only (bold grey), money (border + currency)."""
+    bold=Font(bold=True); grey=PatternFill(start_color="DDDDDD",end_color="DDDDDD",fill_type="solid"); thin=Border(left=Side(style="thin"),right=Side(style="thin"),top=Side(style="thin"),bottom=Side(style="thin"))
+    styles={"adv_cell":{"border":thin},"adv_head":{"font":bold,"fill":grey,"border":thin},"adv_head_only":{"font":bold,"fill":grey},"adv_money":{"border":thin,"number_format":CURRENCY_FORMAT}}
+    for name,kw in styles.items(): wb.add_named_style(NamedStyle(name=name,**kw))
+    return {name:name for name in styles}
+def _styled(ws,values,styles):
+    # Named styles are registered once per workbook; assigning one by name is openpyxl's public per-cell API
+    out=[]
+    for v,st in zip(values,styles):
+        c=WriteOnlyCell(ws,v); c.style=st; out.append(c)
+    return out
+def export_workbook(b,ts=None):
+    """Project workbook as (filename, bytes); written in openpyxl write-only mode, each row styled as it is streamed from its frame."""
+    ts=ts or datetime.datetime.now().strftime("%Y%m%d%H%M")
+    try: project_size=str(b["calc"][b["calc"]["Label"]=="Project size"]["Value"].iloc[0]); pallet_size=str(b["calc"][b["calc"]["Label"]=="Pallet size"]["Value"].iloc[0])
+    except Exception: project_size=pallet_size=""
+    filename=f"{b['inputs']['project_number']}_{b['inputs']['panel_type']}_{b['inputs']['grounding']}_{pallet_size}_{ts}.xlsx"
+    wb=Workbook(write_only=True); ws=wb.create_sheet("Info"); S=_export_styles(wb); info=[["Project number",b["inputs"]["project_number"]],["Panel type",b["inputs"]["panel_type"]],["Grounding",b["inputs"]["grounding"]],["Main switch",b["inputs"]["main_switch"]],["Swing frame",b["inputs"]["swing_frame"]],["UPS",b["inputs"]["ups"]],["Rittal",b["inputs"]["rittal"]],["Project size",project_size],["Pallet size",pallet_size]]
+    ws.column_dimensions["A"].width=20; ws.column_dimensions["B"].width=20
+    for r in info: ws.append(_styled(ws,r,[S["adv_head"],S["adv_cell"]]))
+    def add_df_to_wb(df,title,colw=None,nav=False,calc=False):
+        if df is None or df.empty: return
+        df=ensure_scalar_strings(df); w=wb.create_sheet(title); n=df.shape[1]
+        for col,wid in (colw or {}).items(): w.column_dimensions[col].width=wid
+        # NAV headers are bold over A:G even when the table is narrower
+        pad=max(7-n,0) if nav else 0; cell=[S["adv_cell"]]*n
+        head=[S["adv_head"]]*n+[S["adv_head_only"]]*pad if nav else [S["adv_head"]]+cell[1:] if calc else cell
+        money=([S["adv_head"],S["adv_money"]]+cell[2:])[:n]
+        w.append(_styled(w,df.columns.tolist()+[None]*pad,head))
+        for r,row in enumerate(df.values,start=2): w.append(_styled(w,row,money if calc and r<=10 else cell))
+    job_w={"A":8,"B":10,"C":12,"D":12,"E":12,"F":12,"G":13,"H":12,"I":40,"J":25}; nav_w={"A":8,"B":10,"C":9,"D":9,"E":9,"F":9,"G":50}
+    add_df_to_wb(b["df_mech"],"JobJournal_Mech",job_w); add_df_to_wb(b["df_remain"],"JobJournal_Remaining",job_w); add_df_to_wb(b["job_A"],"JobJournal_ProjectBOM",job_w); add_df_to_wb(b["job_B"],"JobJournal_CUBICBOM",job_w)
+    add_df_to_wb(b["nav_B"],"NAV_CUBICBOM",nav_w,nav=True); add_df_to_wb(b["nav_A"],"NAV_ProjectBOM",nav_w,nav=True); add_df_to_wb(b["calc"],"Calculation",{"A":12,"B":18},calc=True); add_df_to_wb(b["miss_nav_A"],"MissingNAV_ProjectBOM"); add_df_to_wb(b["miss_nav_B"],"MissingNAV_CUBICBOM")
+    buf=io.BytesIO(); wb.save(buf); return filename,buf.getvalue()
+@dataclass(frozen=True)
+class ProjectInputs:
+    project_number:str=""; panel_type:str="A"; grounding:str="TT"; main_switch:str="C160S4FM"; swing_frame:bool=False; ups:bool=False; rittal:bool=False
+    @classmethod
+    def from_dict(cls,d): return cls(**{f.name:d[f.name] for f in fields(cls) if f.name in d})
+    def as_dict(self): return asdict(self)
+@dataclass(frozen=True)
+class BomSources:
+    bom:Optional[bytes]=None; cubic_bom:Optional[bytes]=None; data:Optional[bytes]=None; ks:Optional[bytes]=None; data_snapshot:Optional[str]=None
+    @classmethod
+    def from_uploads(cls,uploads): return cls(**{f.name:uploads.get(f.name) or None for f in fields(cls)})
+    @classmethod
+    def from_paths(cls,data_snapshot=None,**paths): return cls(data_snapshot=data_snapshot,**{k:(open(v,"rb").read() if v else None) for k,v in paths.items()})
+    def as_uploads(self): return {f.name:getattr(self,f.name) for f in fields(self) if getattr(self,f.name)}
+    def digest(self):
+        # A snapshot directory is immutable and named after its source hash
+        return {f.name:(v if isinstance(v,str) else hashlib.sha256(v).hexdigest() if v else None) for f in fields(self) for v in [getattr(self,f.name)]}
+@dataclass
+class BomResult:
+    data_book:dict; df_stock:object; df_part_no:pd.DataFrame; df_hours:object; df_acc:object; df_code:object; df_instr:object; extras:list
+    job_A:pd.DataFrame; nav_A:pd.DataFrame; df_bom_proc:pd.DataFrame; job_B:pd.DataFrame; nav_B:pd.DataFrame; df_cub_proc:pd.DataFrame
+    def as_dict(self): return {f.name:getattr(self,f.name) for f in fields(self)}
+# Byte budget of the BomEngine result cache ($ADV_BOM_CACHE_MB, default 256; 0 stores nothing)
+BOM_CACHE_BYTES=int(float(os.getenv("ADV_BOM_CACHE_MB","256"))*2**20)
+def _result_nbytes(result): return frame_nbytes_estimate(result.as_dict())
+class BomEngine:
+    """Pure Stage 3 run: (sources, inputs) -> BomResult, memoised by SHA-256 of the input bytes and options.
+    Cached results are shared between callers - treat their frames as read-only. Each result holds the stock and
+    DATA-derived frames, so the cache is bounded by BOM_CACHE_BYTES as well as by entry count."""
+    def __init__(self,maxsize=16,max_bytes=None): self.cache=LRUCache(maxsize=maxsize,max_bytes=BOM_CACHE_BYTES if max_bytes is None else max_bytes,sizeof=_result_nbytes)
+    def key(self,sources,inputs): return params_digest("bom",sources.digest(),inputs.as_dict())
+    def run(self,sources,inputs,ledger=None):
+        if isinstance(inputs,dict): inputs=ProjectInputs.from_dict(inputs)
+        # A ledger run reserves stock and depends on what others hold, so it is never memoised
+        key=self.key(sources,inputs) if ledger is None else None; hit=self.cache.get(key) if key else None
+        if hit is not None: return hit
+        files=load_uploads(sources.as_uploads(),inputs.rittal); result=BomResult(**process_bom(files,inputs.as_dict(),ledger))
+        if key: self.cache.put(key,result)
+        return result
+    def headless(self,sources,inputs,mech_takes=None,ledger=None):
+        if isinstance(inputs,dict): inputs=ProjectInputs.from_dict(inputs)
+        result=self.run(sources,inputs,ledger); return result,headless_bundle(result.as_dict(),inputs.as_dict(),mech_takes)
+BOM_ENGINE=BomEngine()
+def cache_stats(): return {"parsed":PARSED_CACHE.stats(),"engine":BOM_ENGINE.cache.stats()}
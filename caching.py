@@ -0,0 +1,141 @@
+# ------------------------------------------------------------
+# caching.py  –  Small in-process caches shared by the stages
+# ------------------------------------------------------------
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """
+    Content hash of a DataFrame: column names, dtypes, index and values.
+    Two frames with the same digest produce the same pipeline output.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps([str(c) for c in df.columns]).encode("utf-8"))
+    h.update(json.dumps([str(t) for t in df.dtypes]).encode("utf-8"))
+    if len(df):
+        h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return h.hexdigest()
+
+
+def params_digest(*parts) -> str:
+    """Stable hash of JSON-serialisable options (dict keys are sorted)."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def frame_nbytes(obj) -> int:
+    """Approximate in-memory size of a DataFrame / Series, or a dict or list of them."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, dict):
+        return sum(frame_nbytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(frame_nbytes(v) for v in obj)
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    return 0
+
+
+def frame_nbytes_estimate(obj, sample: int = 1000) -> int:
+    """
+    frame_nbytes at a fraction of the cost on large frames: object columns
+    are sized from an evenly spaced sample of their values.
+    """
+    if isinstance(obj, pd.Series):
+        obj = obj.to_frame()
+    if not isinstance(obj, pd.DataFrame):
+        if isinstance(obj, dict):
+            return sum(frame_nbytes_estimate(v, sample) for v in obj.values())
+        if isinstance(obj, (list, tuple)):
+            return sum(frame_nbytes_estimate(v, sample) for v in obj)
+        return frame_nbytes(obj)
+    n = len(obj)
+    if n <= sample:
+        return frame_nbytes(obj)
+    rows = obj.iloc[::max(n // sample, 1)]
+    deep = rows.memory_usage(index=False, deep=True)
+    shallow = obj.memory_usage(index=True, deep=False)
+    total = int(shallow.get("Index", 0))
+    for i, col in enumerate(obj.columns):
+        # Positional, so duplicate column names are sized one by one
+        if obj.dtypes.iloc[i] == object:
+            total += int(deep.iloc[i] * n / len(rows))
+        else:
+            total += int(shallow.iloc[i + 1])
+    return total
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with hit/miss counters.
+
+    maxsize bounds the number of entries; max_bytes (optional) bounds the
+    total size of the values as measured by sizeof. The oldest entries are
+    evicted first; a value larger than max_bytes on its own is not stored.
+    """
+
+    def __init__(self, maxsize: int = 128, max_bytes: int = None, sizeof=frame_nbytes):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = value
+            self._sizes[key] = size
+            self.nbytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes is not None and self.nbytes > self.max_bytes):
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        del self._data[key]
+        self.nbytes -= self._sizes.pop(key, 0)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        return {"entries": len(self._data), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "bytes": self.nbytes}
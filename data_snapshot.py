@@ -0,0 +1,223 @@
+# ------------------------------------------------------------
+# data_snapshot.py  –  Versioned columnar snapshots of the DATA workbook
+# ------------------------------------------------------------
+import datetime
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from bom_processing import pipeline_2_3_get_sheet_safe, pipeline_2_4_normalize_part_no, part_no_keys
+
+try:
+    import pyarrow  # noqa: F401  (Feather backend)
+    HAVE_ARROW = True
+except ImportError:
+    HAVE_ARROW = False
+
+DEFAULT_ROOT = os.getenv("ADV_DATA_SNAPSHOTS", "data_snapshots")
+MANIFEST = "manifest.json"
+SNAPSHOT_VERSION = 1
+
+
+def _column_name(value) -> dict:
+    """JSON form of a column label that keeps ints / floats distinct from str."""
+    if isinstance(value, (bool, np.bool_)):
+        return {"type": "bool", "value": bool(value)}
+    if isinstance(value, (int, np.integer)):
+        return {"type": "int", "value": int(value)}
+    if isinstance(value, (float, np.floating)):
+        return {"type": "float", "value": float(value)}
+    return {"type": "str", "value": str(value)}
+
+
+def _restore_name(spec: dict):
+    return {"bool": bool, "int": int, "float": float}.get(spec["type"], str)(spec["value"])
+
+
+# Python types an object column may mix and still be stored column-wise;
+# each cell is written as text plus the tag of its original type
+_TAGS = {str: 1, int: 2, float: 3, bool: 4}
+_DECODE = {1: str, 2: int, 3: float, 4: lambda v: v == "True"}
+
+
+def _encode_mixed(s: pd.Series):
+    """(text, tag) columns for a mixed object column, or None if it holds other types."""
+    text, tags = [], []
+    for v in s:
+        if v is None:
+            text.append(None); tags.append(0)
+        elif isinstance(v, float) and v != v:
+            text.append(None); tags.append(5)
+        elif type(v) in _TAGS:
+            text.append(repr(v) if type(v) is float else str(v)); tags.append(_TAGS[type(v)])
+        else:
+            return None
+    return pd.Series(text, dtype=object), pd.Series(tags, dtype="int8")
+
+
+def _decode_mixed(text: pd.Series, tags: pd.Series) -> pd.Series:
+    values = [None if t == 0 else np.nan if t == 5 else _DECODE[t](v) for v, t in zip(text, tags)]
+    return pd.Series(values, dtype=object)
+
+
+def _to_storable(df: pd.DataFrame):
+    """
+    Frame with positional string column names that Feather can store.
+
+    Object columns mixing str / int / float / bool (as read_excel returns
+    for hand-typed part numbers) are split into a text column and a type
+    tag column so they load back unchanged. Returns (frame, tagged column
+    names), or (None, []) if the sheet holds values that need pickling.
+    """
+    out = pd.DataFrame(index=pd.RangeIndex(len(df)))
+    tagged = []
+    for i, col in enumerate(df.columns):
+        s = df.iloc[:, i].reset_index(drop=True)
+        if s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) not in ("string", "empty"):
+            encoded = _encode_mixed(s)
+            if encoded is None:
+                return None, []
+            out[f"c{i}"], out[f"c{i}_tag"] = encoded
+            tagged.append(f"c{i}")
+        else:
+            out[f"c{i}"] = s
+    return out, tagged
+
+
+def _from_storable(df: pd.DataFrame, tagged: list) -> pd.DataFrame:
+    for col in tagged:
+        df[col] = _decode_mixed(df[col], df.pop(f"{col}_tag"))
+    return df
+
+
+def _write_frame(df: pd.DataFrame, path: str, fmt: str):
+    if fmt == "feather":
+        df.to_feather(path)
+    else:
+        df.to_pickle(path)
+
+
+def _read_frame(path: str, fmt: str) -> pd.DataFrame:
+    if fmt == "feather":
+        from pyarrow import feather
+        df = feather.read_table(path, memory_map=True).to_pandas()
+        # Arrow gives None for missing strings; the XLSX reader gives NaN
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].where(df[col].notna(), np.nan)
+        return df
+    return pd.read_pickle(path)
+
+
+def import_data_workbook(source, root: str = DEFAULT_ROOT, fmt: Optional[str] = None) -> str:
+    """
+    Convert a DATA workbook (path or bytes) into a snapshot directory.
+
+    The snapshot is named <timestamp>_<sha256[:12]> under root and holds
+    one file per sheet plus the precomputed Part_no keys (Norm_B and the
+    normalised PartNo_A) and a manifest. Importing the same workbook twice
+    returns the existing snapshot. Without pyarrow the frames are pickled,
+    as are sheets with cells Feather cannot round-trip (dates in text columns).
+    """
+    raw = source if isinstance(source, (bytes, bytearray)) else open(source, "rb").read()
+    digest = hashlib.sha256(raw).hexdigest()
+    for existing in list_snapshots(root):
+        if read_manifest(existing).get("sha256") == digest:
+            return existing
+    fmt = fmt or ("feather" if HAVE_ARROW else "pickle")
+    ext = ".feather" if fmt == "feather" else ".pkl"
+    book = pd.read_excel(io.BytesIO(raw), sheet_name=None)
+
+    os.makedirs(root, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    name = f"{stamp}_{digest[:12]}"
+    tmp = tempfile.mkdtemp(prefix=".import_", dir=root)
+    try:
+        sheets = []
+        for i, (sheet, df) in enumerate(book.items()):
+            stored, tagged = _to_storable(df) if fmt == "feather" else (None, [])
+            sheet_fmt = fmt if stored is not None else "pickle"
+            fname = f"sheet_{i:02d}{'.feather' if sheet_fmt == 'feather' else '.pkl'}"
+            _write_frame(stored if stored is not None else df, os.path.join(tmp, fname), sheet_fmt)
+            sheets.append({
+                "name": sheet,
+                "file": fname,
+                "format": sheet_fmt,
+                "rows": len(df),
+                "columns": [_column_name(c) for c in df.columns],
+                "tagged": tagged,
+            })
+        keys = {}
+        part_no = pipeline_2_4_normalize_part_no(pipeline_2_3_get_sheet_safe(book, ["Part_no", "Parts_no", "Part no"]))
+        if {"PartNo_A", "PartName_B"}.issubset(part_no.columns):
+            _write_frame(part_no_keys(part_no), os.path.join(tmp, f"keys_part_no{ext}"), fmt)
+            keys["part_no"] = f"keys_part_no{ext}"
+        manifest = {
+            "snapshot_version": SNAPSHOT_VERSION,
+            "name": name,
+            "sha256": digest,
+            "source": source if isinstance(source, str) else None,
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "format": fmt,
+            "sheets": sheets,
+            "keys": keys,
+        }
+        with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, indent=2, ensure_ascii=False)
+        target = os.path.join(root, name)
+        os.replace(tmp, target)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return target
+
+
+def read_manifest(path: str) -> dict:
+    with open(os.path.join(path, MANIFEST), encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def list_snapshots(root: str = DEFAULT_ROOT) -> list:
+    """Snapshot directories under root, oldest first."""
+    if not os.path.isdir(root):
+        return []
+    return [os.path.join(root, d) for d in sorted(os.listdir(root))
+            if not d.startswith(".") and os.path.isfile(os.path.join(root, d, MANIFEST))]
+
+
+def latest_snapshot(root: str = DEFAULT_ROOT) -> Optional[str]:
+    snapshots = list_snapshots(root)
+    return snapshots[-1] if snapshots else None
+
+
+def load_data_snapshot(path: str):
+    """
+    Load a snapshot as (data_book, keys).
+
+    data_book matches pd.read_excel(..., sheet_name=None) of the source
+    workbook (sheet order, column labels, cell types). keys maps "part_no" to the precomputed Norm_B / PartNo_A frame.
+    """
+    manifest = read_manifest(path)
+    if manifest.get("snapshot_version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported DATA snapshot version in {path}")
+    fmt = manifest["format"]
+    if fmt == "feather" and not HAVE_ARROW:
+        raise ImportError("pyarrow is required to read Feather DATA snapshots")
+    book = {}
+    for sheet in manifest["sheets"]:
+        sheet_fmt = sheet.get("format", fmt)
+        df = _read_frame(os.path.join(path, sheet["file"]), sheet_fmt)
+        if sheet_fmt == "feather":
+            df = _from_storable(df, sheet["tagged"])
+        # read_excel labels the columns of an empty sheet with an empty RangeIndex
+        names = [_restore_name(c) for c in sheet["columns"]]
+        df.columns = pd.Index(names) if names else pd.RangeIndex(0)
+        book[sheet["name"]] = df
+    keys = {k: _read_frame(os.path.join(path, f), fmt) for k, f in manifest.get("keys", {}).items()}
+    return book, keys
@@ -0,0 +1,563 @@
+# ------------------------------------------------------------
+# equivalence.py  –  Golden-output check of candidate stage implementations
+# ------------------------------------------------------------
+#
+#   python -m equivalence                                  # working tree vs HEAD, synthetic corpus
+#   python -m equivalence --reference v1.4 --stages eplan --sizes 500,5000,50000
+#   python -m equivalence --candidate fast_stages.py       # HEAD vs HEAD + fast_stages overrides
+#   python -m equivalence --stages eplan --files exports/ --functions functions.xlsx
+#   python -m equivalence --stages bom --files boms/ --data data.xlsx --stock kaunas_stock.xlsm
+#
+# The reference is processing.py / bom_processing.py as of a git revision
+# (or from a directory holding copies of them); the candidate is the
+# working tree, with any same-named functions of --candidate switched in.
+# EPLAN and KOMAX stages each get the reference output of the stage
+# before, so every stage is compared on identical input. Stage 3 runs
+# both sides end to end and compares every step's output in call order.
+# Both sides are timed; the first divergent stage of each input is shown
+# with its differing rows, and the exit code is 1 if any stage diverged.
+import argparse
+import contextlib
+import hashlib
+import importlib.util
+import inspect
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from benchmark import BOM_INPUTS, BOM_STEPS, prepare
+from instrumentation import configure
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGES = ("eplan", "komax", "bom")
+MODULES = {"eplan": "processing", "komax": "processing", "bom": "bom_processing"}
+BOM_FLOW = ("load_uploads", "stage_bom", "finish_bom", "headless_bundle")
+SAMPLES = {"bom": "bom.XLSX", "cubic_bom": "cubic.xls", "data": "data.xlsx", "ks": "kaunas_stock.xlsm"}
+
+
+@dataclass
+class FrameDiff:
+    """Where a candidate frame differs from the reference; no reason means equal."""
+    reason: str = ""
+    rows: list = field(default_factory=list)
+
+    @property
+    def equal(self) -> bool:
+        return not self.reason
+
+
+@dataclass
+class StageCheck:
+    """
+    One stage of one input on both sides.
+
+    status is same, differs, error (a side raised) or new (the reference
+    has no such stage, so there is nothing to compare against).
+    """
+    case: str
+    stage: str
+    status: str
+    ref_seconds: float = None
+    cand_seconds: float = None
+    rows_ref: int = None
+    rows_cand: int = None
+    detail: str = ""
+    rows: list = field(default_factory=list)
+
+    @property
+    def speedup(self):
+        if self.ref_seconds and self.cand_seconds:
+            return self.ref_seconds / self.cand_seconds
+        return None
+
+
+# ------------------------------------------------------------
+# Loading the two sides
+# ------------------------------------------------------------
+def _import_file(path: str, name: str):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    # Dataclasses look their module up in sys.modules while the class body runs
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except Exception:
+        del sys.modules[name]
+        raise
+    return module
+
+
+def load_reference(source: str, module: str):
+    """
+    processing / bom_processing as of source: a directory holding
+    <module>.py, or a git revision of this repository.
+
+    It is imported under a name of its own, next to the working-tree module.
+    """
+    if os.path.isdir(source):
+        path = os.path.join(source, f"{module}.py")
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"no {module}.py in {source}")
+        text = open(path, "rb").read()
+    else:
+        proc = subprocess.run(["git", "show", f"{source}:{module}.py"], cwd=REPO_DIR, capture_output=True)
+        if proc.returncode:
+            raise ValueError(f"{module}.py at {source!r}: {proc.stderr.decode(errors='replace').strip()}")
+        text = proc.stdout
+    name = f"_reference_{module}_{hashlib.sha256(text).hexdigest()[:12]}"
+    if name in sys.modules:
+        return sys.modules[name]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"{module}.py")
+        with open(path, "wb") as fh:
+            fh.write(text)
+        return _import_file(path, name)
+
+
+def load_candidate(path: str) -> dict:
+    """The functions defined in a candidate file, by name."""
+    if not path:
+        return {}
+    module = _import_file(path, f"_candidate_{hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:12]}")
+    return {n: f for n, f in vars(module).items()
+            if inspect.isfunction(f) and f.__module__ == module.__name__ and not n.startswith("__")}
+
+
+@contextlib.contextmanager
+def _patched(module, funcs: dict):
+    """Module globals replaced by same-named candidate functions for the duration of the block."""
+    originals = {n: getattr(module, n) for n in funcs if hasattr(module, n)}
+    try:
+        for name in originals:
+            setattr(module, name, funcs[name])
+        yield
+    finally:
+        for name, func in originals.items():
+            setattr(module, name, func)
+
+
+# ------------------------------------------------------------
+# Comparing outputs
+# ------------------------------------------------------------
+def _value(v):
+    """A cell as plain JSON-friendly data for the report."""
+    if v is None or (np.ndim(v) == 0 and pd.isna(v)):
+        return None
+    return v.item() if isinstance(v, np.generic) else v if isinstance(v, (str, int, float, bool)) else str(v)
+
+
+def _row_order(df: pd.DataFrame) -> pd.DataFrame:
+    """Rows in a content-defined order, for stages whose tied rows may come out in any order."""
+    order = np.argsort(pd.util.hash_pandas_object(df, index=False).to_numpy(), kind="stable")
+    return df.iloc[order].reset_index(drop=True)
+
+
+def diff_frames(expected: pd.DataFrame, got: pd.DataFrame, ignore_order: bool = False, max_rows: int = 5) -> FrameDiff:
+    """
+    Compare two frames row by row: columns, cell values (NaN equals NaN),
+    row count, dtypes and index, in that order.
+
+    rows lists the first max_rows differing rows with the reference and
+    candidate value of every column that differs. With ignore_order the
+    rows are compared as a multiset and the index is not checked.
+    """
+    cols_e, cols_g = [str(c) for c in expected.columns], [str(c) for c in got.columns]
+    if cols_e != cols_g:
+        missing = [c for c in cols_e if c not in cols_g]
+        extra = [c for c in cols_g if c not in cols_e]
+        if missing or extra:
+            return FrameDiff(f"columns differ: missing {missing}, extra {extra}")
+        return FrameDiff(f"column order differs: {cols_g}")
+    if ignore_order:
+        expected, got = _row_order(expected), _row_order(got)
+    n = min(len(expected), len(got))
+    a = expected.iloc[:n].to_numpy(dtype=object)
+    b = got.iloc[:n].to_numpy(dtype=object)
+    same = (a == b) | (pd.isna(a) & pd.isna(b))
+    bad = np.flatnonzero(~same.all(axis=1))
+    if len(bad):
+        rows = []
+        for i in bad[:max_rows]:
+            cells = {cols_e[j]: {"reference": _value(a[i, j]), "candidate": _value(b[i, j])}
+                     for j in np.flatnonzero(~same[i])}
+            rows.append({"row": int(i), "index": _value(expected.index[i]), "columns": cells})
+        reason = f"{len(bad)} of {n} rows differ, first at row {bad[0]}"
+        if len(expected) != len(got):
+            reason += f" ({len(expected)} rows vs {len(got)})"
+        return FrameDiff(reason, rows)
+    if len(expected) != len(got):
+        if len(expected) > len(got):
+            rows = [{"row": i, "index": _value(expected.index[i]), "columns": {}} for i in range(n, min(len(expected), n + max_rows))]
+            return FrameDiff(f"candidate lacks {len(expected) - n} row(s) from row {n} on", rows)
+        rows = [{"row": i, "index": _value(got.index[i]), "columns": {}} for i in range(n, min(len(got), n + max_rows))]
+        return FrameDiff(f"candidate has {len(got) - n} extra row(s) from row {n} on", rows)
+    dtypes = [f"{c}: {e} vs {g}" for c, e, g in zip(cols_e, expected.dtypes, got.dtypes) if e != g]
+    if dtypes:
+        return FrameDiff(f"dtypes differ: {'; '.join(dtypes)}")
+    if not ignore_order and not expected.index.equals(got.index):
+        first = int(np.flatnonzero(expected.index.to_numpy() != got.index.to_numpy())[0])
+        return FrameDiff(f"index differs, first at row {first}: {expected.index[first]!r} vs {got.index[first]!r}")
+    return FrameDiff()
+
+
+def diff_outputs(expected, got, ignore_order: bool = False, max_rows: int = 5) -> FrameDiff:
+    """
+    diff_frames over a step's whole output: frames, series, tuples / lists
+    and dicts of them, and plain values. Other objects (a StockAllocator)
+    belong to their own module and are not compared.
+    """
+    if isinstance(expected, pd.DataFrame) or isinstance(got, pd.DataFrame):
+        if not (isinstance(expected, pd.DataFrame) and isinstance(got, pd.DataFrame)):
+            return FrameDiff(f"{type(expected).__name__} vs {type(got).__name__}")
+        return diff_frames(expected, got, ignore_order, max_rows)
+    if isinstance(expected, pd.Series) and isinstance(got, pd.Series):
+        return diff_frames(expected.to_frame(), got.to_frame(), ignore_order, max_rows)
+    if isinstance(expected, dict) and isinstance(got, dict):
+        if list(expected) != list(got):
+            return FrameDiff(f"keys differ: {list(expected)} vs {list(got)}")
+        for key in expected:
+            diff = diff_outputs(expected[key], got[key], ignore_order, max_rows)
+            if not diff.equal:
+                return FrameDiff(f"[{key!r}] {diff.reason}", diff.rows)
+        return FrameDiff()
+    if isinstance(expected, (tuple, list)) and isinstance(got, (tuple, list)):
+        if len(expected) != len(got):
+            return FrameDiff(f"{len(expected)} items vs {len(got)}")
+        for i, (e, g) in enumerate(zip(expected, got)):
+            diff = diff_outputs(e, g, ignore_order, max_rows)
+            if not diff.equal:
+                return FrameDiff(f"[{i}] {diff.reason}", diff.rows)
+        return FrameDiff()
+    plain = (str, bytes, int, float, bool, np.generic, type(None))
+    if isinstance(expected, plain) and isinstance(got, plain):
+        text = isinstance(expected, (str, bytes)) or isinstance(got, (str, bytes))
+        if expected == got or (not text and pd.isna(expected) and pd.isna(got)):
+            return FrameDiff()
+        return FrameDiff(f"{expected!r} vs {got!r}")
+    return FrameDiff()
+
+
+def _rows(obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, (tuple, list)):
+        return next((len(o) for o in obj if isinstance(o, pd.DataFrame)), None)
+    if isinstance(obj, dict):
+        return sum(len(v) for v in obj.values() if isinstance(v, pd.DataFrame))
+    return None
+
+
+def _frame(out):
+    # stage1_pipeline_1 itself returns (df, removed rows)
+    return out[0] if isinstance(out, tuple) else out
+
+
+def _timed(func, args, kwargs, repeat: int):
+    """(output of the last call, fastest of repeat calls); each call gets fresh copies of frame arguments."""
+    best, out = None, None
+    for _ in range(max(1, repeat)):
+        call_args = [a.copy() if isinstance(a, pd.DataFrame) else io.BytesIO(a) if isinstance(a, bytes) else a for a in args]
+        start = time.perf_counter()
+        out = func(*call_args, **kwargs)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return out, best
+
+
+# ------------------------------------------------------------
+# EPLAN and KOMAX: stage by stage on the reference input
+# ------------------------------------------------------------
+def _reference_stage(reference, registry_name: str, name: str):
+    registry = getattr(reference, registry_name, None)
+    if registry is not None and name in registry.names():
+        return registry.get(name).func
+    return getattr(reference, name, None)
+
+
+def _check_step(case, name, ref_func, cand_func, args, kwargs, repeat, ignore_order):
+    """(StageCheck, reference output or None when the reference failed)."""
+    if ref_func is None:
+        return StageCheck(case, name, "new", detail="not in the reference"), None
+    try:
+        ref_out, ref_s = _timed(ref_func, args, kwargs, repeat)
+    except Exception as exc:
+        return StageCheck(case, name, "error", detail=f"reference raised {exc!r}"), None
+    check = StageCheck(case, name, "same", ref_seconds=ref_s, rows_ref=_rows(_frame(ref_out)))
+    try:
+        cand_out, check.cand_seconds = _timed(cand_func, args, kwargs, repeat)
+    except Exception as exc:
+        check.status, check.detail = "error", f"candidate raised {exc!r}"
+        return check, ref_out
+    check.rows_cand = _rows(_frame(cand_out))
+    diff = diff_outputs(_frame(ref_out), _frame(cand_out), ignore_order)
+    if not diff.equal:
+        check.status, check.detail, check.rows = "differs", diff.reason, diff.rows
+    return check, ref_out
+
+
+def check_registry(case: str, reference, registry_name: str, registry, df: pd.DataFrame,
+                   repeat: int = 1, ignore_order: bool = False, **params) -> list:
+    """
+    StageChecks of every stage of a registry, each fed the reference output
+    of the stage before (or the candidate's, for a stage new to the candidate).
+    """
+    checks = []
+    for stage in registry.stages:
+        kwargs = {p: params[p] for p in stage.params if p in params}
+        ref_func = _reference_stage(reference, registry_name, stage.name)
+        check, out = _check_step(case, stage.name, ref_func, stage.func, [df], kwargs, repeat, ignore_order)
+        checks.append(check)
+        if check.status == "new":
+            out = stage.func(df.copy(), **kwargs)
+        elif out is None:
+            break
+        df = _frame(out)
+    return checks
+
+
+def check_eplan(case, reference, candidate, df, group_symbols, repeat=1, ignore_order=False) -> list:
+    import processing
+    registry = processing.STAGE1_PIPELINES.with_overrides(
+        {n: f for n, f in candidate.items() if n in processing.STAGE1_PIPELINES.names()})
+    with _patched(processing, candidate):
+        return check_registry(case, reference, "STAGE1_PIPELINES", registry, df, repeat, ignore_order,
+                              group_symbols=group_symbols)
+
+
+def check_komax(case, reference, candidate, data: bytes, repeat=1, ignore_order=False) -> list:
+    import processing
+    registry = processing.STAGE2_PIPELINES.with_overrides(
+        {n: f for n, f in candidate.items() if n in processing.STAGE2_PIPELINES.names()})
+    with _patched(processing, candidate):
+        check, df = _check_step(case, "stage2_pipeline_1", getattr(reference, "stage2_pipeline_1", None),
+                                processing.stage2_pipeline_1, [data], {}, repeat, ignore_order)
+        if df is None:
+            return [check]
+        return [check] + check_registry(case, reference, "STAGE2_PIPELINES", registry, df, repeat, ignore_order)
+
+
+# ------------------------------------------------------------
+# Stage 3: both sides end to end, every step recorded
+# ------------------------------------------------------------
+def _snapshot(obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return obj.copy(deep=True)
+    if isinstance(obj, dict):
+        return {k: _snapshot(v) for k, v in obj.items()}
+    if isinstance(obj, (tuple, list)):
+        return type(obj)(_snapshot(v) for v in obj)
+    return obj
+
+
+class _Trace:
+    """Outputs and seconds of every call, keyed step/inner-step#occurrence, in completion order."""
+
+    def __init__(self):
+        self.steps = {}
+        self._stack = []
+        self._seen = {}
+
+    def call(self, step, func, *args, **kwargs):
+        path = "/".join(self._stack + [step])
+        self._stack.append(step)
+        start = time.perf_counter()
+        try:
+            out = func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            self._stack.pop()
+        n = self._seen.get(path, 0)
+        self._seen[path] = n + 1
+        self.steps[path if not n else f"{path}#{n + 1}"] = (_snapshot(out), seconds)
+        return out
+
+
+def _bom_run(module, uploads: dict, inputs: dict) -> _Trace:
+    for cache in ("PARSED_CACHE", "PART_CATALOGS"):
+        if hasattr(module, cache):
+            getattr(module, cache).clear()
+    missing = [n for n in BOM_FLOW if not hasattr(module, n)]
+    if missing:
+        raise AttributeError(f"{module.__name__} has no {', '.join(missing)}")
+    trace = _Trace()
+    names = [n for n in BOM_STEPS if hasattr(module, n)]
+    originals = {n: getattr(module, n) for n in names}
+    try:
+        for name, func in originals.items():
+            setattr(module, name, lambda *a, _n=name, _f=func, **k: trace.call(_n, _f, *a, **k))
+        files = trace.call("load_uploads", module.load_uploads, uploads, inputs["rittal"])
+        staged = trace.call("stage_bom", module.stage_bom, files, inputs)
+        proc = trace.call("finish_bom", module.finish_bom, staged, inputs)
+        trace.call("headless_bundle", module.headless_bundle, proc, inputs)
+    finally:
+        for name, func in originals.items():
+            setattr(module, name, func)
+    return trace
+
+
+def check_bom(case, reference, candidate, uploads: dict, inputs: dict = None, repeat=1, ignore_order=False) -> list:
+    """StageChecks of every Stage 3 step; the fastest of repeat end-to-end runs per side counts."""
+    import bom_processing
+    inputs = dict(inputs or BOM_INPUTS)
+    runs = {"ref": [], "cand": []}
+    for _ in range(max(1, repeat)):
+        try:
+            runs["ref"].append(_bom_run(reference, uploads, inputs))
+        except Exception as exc:
+            return [StageCheck(case, "bom", "error", detail=f"reference raised {exc!r}")]
+        try:
+            with _patched(bom_processing, candidate):
+                runs["cand"].append(_bom_run(bom_processing, uploads, inputs))
+        except Exception as exc:
+            return [StageCheck(case, "bom", "error", detail=f"candidate raised {exc!r}")]
+    ref, cand = runs["ref"][-1].steps, runs["cand"][-1].steps
+    checks = []
+    for step, (ref_out, _) in ref.items():
+        ref_s = min(r.steps[step][1] for r in runs["ref"])
+        check = StageCheck(case, step, "same", ref_seconds=ref_s, rows_ref=_rows(ref_out))
+        if step not in cand:
+            check.status, check.detail = "differs", "the candidate never ran this step"
+        else:
+            check.cand_seconds = min(r.steps[step][1] for r in runs["cand"])
+            check.rows_cand = _rows(cand[step][0])
+            diff = diff_outputs(ref_out, cand[step][0], ignore_order)
+            if not diff.equal:
+                check.status, check.detail, check.rows = "differs", diff.reason, diff.rows
+        checks.append(check)
+    for step in cand:
+        if step not in ref:
+            checks.append(StageCheck(case, step, "new", cand_seconds=min(r.steps[step][1] for r in runs["cand"]),
+                                     rows_cand=_rows(cand[step][0]), detail="not in the reference"))
+    return checks
+
+
+# ------------------------------------------------------------
+# Corpus
+# ------------------------------------------------------------
+def corpus(stage: str, sizes=(), seeds=(0,), files=(), options: dict = None):
+    """(case name, input) pairs: synthetic inputs of every size and seed, then the given files."""
+    options = options or {}
+    for size in sizes:
+        for seed in seeds:
+            yield f"synthetic {size} seed {seed}", prepare(stage, size, seed)
+    if stage == "eplan":
+        from processing import parse_component_functions, read_table
+        group_symbols = {}
+        if options.get("functions"):
+            group_symbols = parse_component_functions(read_table(options["functions"], header=None))
+        for path in files:
+            yield path, (read_table(path), group_symbols)
+    elif stage == "komax":
+        for path in files:
+            with open(path, "rb") as fh:
+                yield path, fh.read()
+    else:
+        from adv_management import find_cubic
+
+        def read(path):
+            with open(path, "rb") as fh:
+                return fh.read()
+
+        if options.get("samples") and all(os.path.isfile(os.path.join(REPO_DIR, f)) for f in SAMPLES.values()):
+            yield "samples", {k: read(os.path.join(REPO_DIR, f)) for k, f in SAMPLES.items()}
+        for path in files:
+            cubic = find_cubic(path)
+            yield path, {"bom": read(path), "cubic_bom": read(cubic) if cubic else None,
+                         "data": read(options["data"]), "ks": read(options["stock"])}
+
+
+def check_case(stage, case, data, reference, candidate, repeat=1, ignore_order=False) -> list:
+    if stage == "eplan":
+        df, group_symbols = data
+        return check_eplan(case, reference, candidate, df, group_symbols, repeat, ignore_order)
+    if stage == "komax":
+        return check_komax(case, reference, candidate, data, repeat, ignore_order)
+    return check_bom(case, reference, candidate, data, BOM_INPUTS, repeat, ignore_order)
+
+
+def first_divergence(checks: list):
+    return next((c for c in checks if c.status in ("differs", "error")), None)
+
+
+def _print_divergence(check: StageCheck) -> None:
+    print(f"\n✗ {check.case}: first divergent stage {check.stage} – {check.detail}")
+    for row in check.rows:
+        print(f"    row {row['row']} (index {row['index']!r})")
+        for col, v in row["columns"].items():
+            print(f"      {col}: {v['reference']!r} → {v['candidate']!r}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="equivalence",
+                                     description="Compare candidate stage implementations with a reference.")
+    parser.add_argument("--reference", default="HEAD",
+                        help="git revision, or directory with processing.py / bom_processing.py (default HEAD)")
+    parser.add_argument("--candidate", help="python file whose functions replace the same-named working-tree ones")
+    parser.add_argument("--stages", default=",".join(STAGES), help="eplan, komax and/or bom")
+    parser.add_argument("--sizes", default="500,5000", help="synthetic inputs, comma separated; empty for none")
+    parser.add_argument("--seeds", default="0", help="synthetic seeds, comma separated")
+    parser.add_argument("--files", nargs="*", default=[], help="real inputs of the (single) selected stage")
+    parser.add_argument("--functions", help="EPLAN component functions file for --files")
+    parser.add_argument("--data", default=os.path.join(REPO_DIR, SAMPLES["data"]), help="DATA workbook for BOM --files")
+    parser.add_argument("--stock", default=os.path.join(REPO_DIR, SAMPLES["ks"]), help="stock workbook for BOM --files")
+    parser.add_argument("--no-samples", action="store_true", help="leave out the sample workbooks shipped with the app")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per side; the fastest counts")
+    parser.add_argument("--ignore-order", action="store_true", help="compare rows as a multiset")
+    parser.add_argument("-o", "--output", help="also write every check as JSON here")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    configure("WARNING")
+    # Copy-on-write for the whole run, as app.py sets it for the server
+    pd.set_option("mode.copy_on_write", True)
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        print(f"Unknown stage(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    if args.files and len(stages) != 1:
+        print("--files needs exactly one stage in --stages", file=sys.stderr)
+        return 2
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    seeds = [int(s) for s in args.seeds.split(",") if s.strip()]
+    candidate = load_candidate(args.candidate)
+    options = {"functions": args.functions, "data": args.data, "stock": args.stock, "samples": not args.no_samples}
+    checks = []
+    for stage in stages:
+        reference = load_reference(args.reference, MODULES[stage])
+        for case, data in corpus(stage, sizes, seeds, args.files, options):
+            start = time.perf_counter()
+            found = check_case(stage, case, data, reference, candidate, args.repeat, args.ignore_order)
+            div = first_divergence(found)
+            print(f"{'✗' if div else '✓'} {stage} {case}: {time.perf_counter() - start:.1f}s", file=sys.stderr)
+            checks.extend(dict(asdict(c), mode=stage, speedup=c.speedup) for c in found)
+            if div:
+                _print_divergence(div)
+    table = pd.DataFrame(checks, columns=["mode", "case", "stage", "ref_seconds", "cand_seconds", "speedup",
+                                          "rows_ref", "rows_cand", "status"])
+    print()
+    with pd.option_context("display.width", 200, "display.max_rows", None, "display.float_format", "{:.4f}".format):
+        print(table.to_string(index=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump({"reference": args.reference, "candidate": args.candidate, "checks": checks}, fh,
+                      indent=2, default=str)
+        print(f"📄 {args.output}", file=sys.stderr)
+    diverged = int(table["status"].isin(["differs", "error"]).sum()) if len(table) else 0
+    inputs = len(table[["mode", "case"]].drop_duplicates())
+    print(f"{diverged} divergent stage(s) across {inputs} input(s)", file=sys.stderr)
+    return 1 if diverged else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
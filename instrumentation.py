@@ -0,0 +1,104 @@
+# ------------------------------------------------------------
+# instrumentation.py  –  Stage loggers, timing and run reports
+# ------------------------------------------------------------
+import contextlib
+import contextvars
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+ROOT_LOGGER = "adv"
+LOG_LEVEL = os.getenv("ADV_LOG_LEVEL", "INFO")
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+def get_logger(stage: str) -> logging.Logger:
+    """Logger of one stage, e.g. adv.stage1_pipeline_18; levels are set per stage or on adv."""
+    return logging.getLogger(f"{ROOT_LOGGER}.{stage}")
+
+
+def configure(level=None, stream=None) -> logging.Logger:
+    """
+    Send the adv loggers to stderr at level (default $ADV_LOG_LEVEL, INFO).
+
+    Safe to call more than once (Streamlit reruns): the handler is added
+    only the first time, later calls just change the level. Per-row
+    diagnostics are logged at DEBUG and skipped entirely above it.
+    """
+    root = logging.getLogger(ROOT_LOGGER)
+    if not any(getattr(h, "_adv_handler", False) for h in root.handlers):
+        handler = logging.StreamHandler(stream or sys.stderr)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handler._adv_handler = True
+        root.addHandler(handler)
+        root.propagate = False
+    level = level or LOG_LEVEL
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    return root
+
+
+@dataclass
+class StageTiming:
+    """What timed_stage() measured: duration, row counts and the stage's own counters."""
+    name: str
+    rows_in: int
+    rows_out: Optional[int] = None
+    seconds: float = 0.0
+    counters: dict = field(default_factory=dict)
+
+
+_CURRENT = contextvars.ContextVar("adv_stage_timing", default=None)
+
+
+@contextlib.contextmanager
+def timed_stage(name: str, rows_in: int):
+    """
+    Time one stage; the caller sets rows_out on the yielded StageTiming.
+
+    While the block runs, count() adds to its counters, so a stage can
+    report what it did without knowing who (if anyone) is measuring it.
+    """
+    timing = StageTiming(name=name, rows_in=rows_in)
+    token = _CURRENT.set(timing)
+    start = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        timing.seconds = time.perf_counter() - start
+        _CURRENT.reset(token)
+
+
+def count(key: str, n: int = 1) -> None:
+    """Add n to a counter of the stage being timed (no-op outside timed_stage)."""
+    timing = _CURRENT.get()
+    if timing is not None:
+        timing.counters[key] = timing.counters.get(key, 0) + int(n)
+
+
+def rows_added(n: int) -> None:
+    count("rows_added", n)
+
+
+def rows_removed(n: int) -> None:
+    count("rows_removed", n)
+
+
+def run_report(reports: list) -> dict:
+    """
+    One run as JSON-ready data: totals plus one entry per stage.
+
+    reports are StageReports (anything with as_dict() and the row fields).
+    """
+    stages = [r.as_dict() for r in reports]
+    return {
+        "seconds": round(sum(s["seconds"] for s in stages), 6),
+        "rows_in": stages[0]["rows_in"] if stages else None,
+        "rows_out": stages[-1]["rows_out"] if stages else None,
+        "rows_added": sum(s["rows_added"] for s in stages),
+        "rows_removed": sum(s["rows_removed"] for s in stages),
+        "cached": sum(bool(s["cached"]) for s in stages),
+        "stages": stages,
+    }
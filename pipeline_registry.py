@@ -0,0 +1,152 @@
+# ------------------------------------------------------------
+# pipeline_registry.py  –  Ordered, named pipeline stages
+# ------------------------------------------------------------
+import os
+from dataclasses import dataclass, field, asdict, replace
+from typing import Callable, Optional
+
+import pandas as pd
+
+from caching import LRUCache, frame_digest, frame_nbytes_estimate, params_digest
+from instrumentation import timed_stage
+
+# Byte budget of each registry's result cache; 0 stores nothing
+CACHE_BYTES = int(float(os.getenv("ADV_STAGE_CACHE_MB", "256")) * 2**20)
+
+
+def result_cache() -> LRUCache:
+    """Cache of chain results, bounded by CACHE_BYTES (outputs sized by sampling)."""
+    return LRUCache(maxsize=16, max_bytes=CACHE_BYTES, sizeof=frame_nbytes_estimate)
+
+
+@dataclass(frozen=True)
+class PipelineStage:
+    """
+    One named DataFrame → DataFrame stage.
+
+    params names the keyword arguments of run() that are passed on to the
+    stage.
+    """
+    name: str
+    func: Callable
+    params: tuple = ()
+    description: str = ""
+
+
+@dataclass
+class StageReport:
+    """
+    Timing and row counts of one stage in one run.
+
+    counters holds what the stage reported through instrumentation.count();
+    rows_added / rows_removed come from there when the stage counted them,
+    otherwise from the net row delta.
+    """
+    name: str
+    seconds: float
+    rows_in: int
+    rows_out: int
+    cached: bool = False
+    counters: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_timing(cls, timing, cached: bool = False) -> "StageReport":
+        return cls(name=timing.name, seconds=timing.seconds, rows_in=timing.rows_in,
+                   rows_out=timing.rows_out, cached=cached, counters=dict(timing.counters))
+
+    @property
+    def row_delta(self) -> int:
+        return self.rows_out - self.rows_in
+
+    @property
+    def rows_added(self) -> int:
+        return self.counters.get("rows_added", max(self.row_delta, 0))
+
+    @property
+    def rows_removed(self) -> int:
+        return self.counters.get("rows_removed", max(-self.row_delta, 0))
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "row_delta": self.row_delta,
+                "rows_added": self.rows_added, "rows_removed": self.rows_removed}
+
+
+@dataclass
+class PipelineRegistry:
+    """
+    Ordered list of stages that the UI and batch callers resolve from.
+
+    run() feeds each stage the output of the previous one and records a
+    StageReport per stage. Copy-on-write is not switched here: it is a
+    process-wide pandas option, set once at start-up (see app.py). The final output of
+    a run is memoised by input content hash, stage names and params, so an
+    unchanged input skips the whole chain; its stages are then reported
+    as cached, with the rows and counters of the run that computed them.
+    Only chain results are kept (never intermediate frames), within the
+    byte budget of CACHE_BYTES ($ADV_STAGE_CACHE_MB); cache=None or
+    run(use_cache=False) turns memoisation off.
+    """
+    name: str
+    stages: list
+    cache: Optional[LRUCache] = field(default_factory=result_cache)
+
+    def names(self) -> list:
+        return [s.name for s in self.stages]
+
+    def get(self, name: str) -> PipelineStage:
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(f"{self.name}: unknown stage {name!r}")
+
+    def with_overrides(self, overrides: dict) -> "PipelineRegistry":
+        """
+        A copy in which the named stages run other functions (a faster
+        engine switched on stage by stage); it starts with an empty cache,
+        or none if this registry has none.
+        """
+        unknown = sorted(set(overrides) - set(self.names()))
+        if unknown:
+            raise KeyError(f"{self.name}: unknown stage(s) {', '.join(unknown)}")
+        stages = [replace(s, func=overrides[s.name]) if s.name in overrides else s for s in self.stages]
+        return PipelineRegistry(self.name, stages, result_cache() if self.cache is not None else None)
+
+    def run(self, df: pd.DataFrame, use_cache: bool = True, report: Optional[list] = None, **params):
+        """
+        Run all stages in order and return (result, reports).
+
+        report, if given, is extended with the StageReport of every stage.
+        """
+        reports = [] if report is None else report
+        stage_params = [{p: params[p] for p in s.params if p in params} for s in self.stages]
+        key = None
+        if use_cache and self.cache is not None:
+            key = params_digest(self.name, frame_digest(df), [[s.name, kw] for s, kw in zip(self.stages, stage_params)])
+            hit = self.cache.get(key)
+            if hit is not None:
+                df, cached = hit
+                reports.extend(replace(r, seconds=0.0, cached=True, counters=dict(r.counters)) for r in cached)
+                return df.copy(), reports
+        run_reports = []
+        # One private working copy per run; stages share it from here on
+        df = df.copy()
+        for stage, kwargs in zip(self.stages, stage_params):
+            with timed_stage(stage.name, len(df)) as timing:
+                df = stage.func(df, **kwargs)
+                timing.rows_out = len(df)
+            run_reports.append(StageReport.from_timing(timing))
+        if key is not None:
+            self.cache.put(key, (df, run_reports))
+        reports.extend(replace(r, counters=dict(r.counters)) for r in run_reports)
+        # Callers get a frame that the cached result shares no data with
+        return df.copy(), reports
+
+
+def reports_to_frame(reports: list) -> pd.DataFrame:
+    """StageReports as a table for display; stage counters other than the row counts go into notes."""
+    rows = []
+    for r in reports:
+        notes = ", ".join(f"{k}: {v}" for k, v in r.counters.items() if k not in ("rows_added", "rows_removed"))
+        rows.append({**r.as_dict(), "notes": notes})
+    return pd.DataFrame(rows, columns=["name", "seconds", "rows_in", "rows_out", "row_delta",
+                                       "rows_added", "rows_removed", "cached", "notes"])
@@ -1,8 +1,14 @@
 import pandas as pd
+import numpy as np
+import io
 import os
 from collections import defaultdict
 import re
 import csv
+import logging
+from typing import NamedTuple
+from pipeline_registry import PipelineRegistry, PipelineStage, StageReport
+from instrumentation import count, get_logger, rows_added, rows_removed, timed_stage
 
 
 def friendly_file_type(filetype: str, filename: str) -> str:
@@ -20,8 +26,530 @@ def friendly_file_type(filetype: str, filename: str) -> str:
         return "Text"
     return filetype.split("/")[-1].capitalize()
 
+
+def read_table(source, name: str = None, header=0) -> pd.DataFrame:
+    """
+    Read an EPLAN export (or component function list) as strings.
+
+    source is a path or an uploaded file; name (defaults to the path or
+    the upload's .name) decides between CSV and Excel.
+    """
+    name = name or getattr(source, "name", None) or str(source)
+    if os.path.splitext(name)[1].lower() == ".csv":
+        return pd.read_csv(source, dtype=str, header=header)
+    return pd.read_excel(source, dtype=str, header=header)
+
+
+def _field_counts(raw: bytes, sep: str) -> np.ndarray:
+    """Fields per non-blank line of unquoted, "\n"-terminated CSV bytes (a byte scan, no tokenizing)."""
+    buf = np.frombuffer(raw, dtype=np.uint8)
+    # Each line with its "\n"; no segment is empty, so reduceat sums exactly one line
+    starts = np.concatenate(([0], np.flatnonzero(buf == ord("\n")) + 1))
+    starts = starts[starts < len(buf)]
+    if not len(starts):
+        return np.zeros(0, dtype=int)
+    blank = np.zeros(256, dtype=bool)
+    blank[list(b" \t\n\r\x0b\x0c")] = True
+    seps = np.add.reduceat(buf == ord(sep), starts, dtype=np.int64)
+    text = np.add.reduceat(~blank[buf], starts, dtype=np.int64)
+    return seps[(seps > 0) | (text > 0)] + 1
+
+
+def _read_csv_fast(raw: bytes, sep: str, encoding: str):
+    """
+    Parse CSV bytes with the C engine as the python engine would, or None.
+
+    The C parser fills the fields missing from short rows with "" where
+    the csv-module reader gives None, so those are set back to None; field
+    counts come from a byte scan of the lines, or from csv.reader when
+    quoted fields may hold delimiters or newlines. Returns None, so the
+    caller can fall back to the python engine, where the two engines
+    disagree: the C parser rejects the file or finds no columns in it,
+    rows are wider than the header (the inferred index is typed
+    differently), a UTF-8 BOM is followed by a quote or whitespace, a
+    quoted file has bare "\r" line endings, the csv reader cannot
+    tokenize it, or the two disagree on the lines (quoted blank or
+    whitespace-only lines, which the csv reader drops).
+    """
+    if raw.startswith(b"\xef\xbb\xbf") and raw[3:4].strip() in (b"", b'"'):
+        return None
+    quoted = b'"' in raw
+    if b"\r" in raw.replace(b"\r\n", b""):
+        # The C tokenizer can misplace fields after a bare "\r"; unquoted, every
+        # "\r" ends a line for the csv module too, so it can be made "\n"
+        if quoted:
+            return None
+        raw = raw.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    try:
+        df = pd.read_csv(io.BytesIO(raw), sep=sep, engine="c", dtype=str, encoding=encoding, keep_default_na=False)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError):
+        return None
+    if not df.shape[1] or not isinstance(df.index, pd.RangeIndex):
+        return None
+    if quoted:
+        # newline="" leaves \r / \r\n / \n line endings to the csv module itself;
+        # strict like the python engine, so what it rejects falls back to it
+        records = csv.reader(io.StringIO(raw.decode(encoding), newline=""), delimiter=sep, strict=True)
+        try:
+            counts = [len(r) for r in records if len(r) > 1 or (r and r[0].strip())]
+        except csv.Error:
+            return None
+    else:
+        counts = _field_counts(raw, sep)
+    # The header is the first non-blank line for both engines
+    if len(counts) != len(df) + 1:
+        return None
+    counts = np.asarray(counts[1:], dtype=int)
+    ncols = df.shape[1]
+    for j in range(counts.min(initial=ncols), ncols):
+        values = df.iloc[:, j].to_numpy(dtype=object, copy=True)
+        values[counts <= j] = None
+        df.isetitem(j, pd.Series(values, index=df.index))
+    return df
+
+
+def read_komax_csv(uploaded_file) -> pd.DataFrame:
+    """
+    Read a KOMAX CSV export as strings in one pass.
+
+    The file is read once: the delimiter is sniffed from the first 8 KiB,
+    the encoding is utf-8 if the bytes decode as such (latin1 otherwise)
+    and the C parser reads straight from the buffer, with the python
+    engine kept for files it cannot match. Rows exported by Excel as one
+    quoted field per line come out as a single column; they are split on
+    the delimiter into integer-named columns (the header line is lost, as
+    before) with surrounding whitespace stripped.
+    """
+    uploaded_file.seek(0)
+    raw = uploaded_file.read()
+    try:
+        sep = csv.Sniffer().sniff(raw[:8192].decode("utf-8", errors="replace"), delimiters=[",", ";", "\t", "|"]).delimiter
+    except csv.Error:
+        sep = ","
+    try:
+        raw.decode("utf-8")
+        encoding = "utf-8"
+    except UnicodeDecodeError:
+        encoding = "latin1"
+    df = _read_csv_fast(raw, sep, encoding)
+    if df is None:
+        df = pd.read_csv(io.BytesIO(raw), sep=sep, engine="python", dtype=str, encoding=encoding, keep_default_na=False)
+
+    if df.shape[1] == 1:
+        parts = df.iloc[:, 0].str.split(sep, expand=True)
+        # Rows with fewer fields are padded with None; keep it rather than NaN
+        df = parts.apply(lambda s: s.str.strip().where(s.notna(), s))
+    return df
+
+
+def _stage_copy(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Private working copy for a pipeline stage.
+
+    With copy-on-write on for the process (app.py and the command-line
+    entry points switch it on at start-up) a shallow copy is enough: the
+    column buffers stay shared until a stage actually writes to them.
+    Without it a stage takes a full deep copy.
+    """
+    if pd.get_option("mode.copy_on_write") is True:
+        return df.copy(deep=False)
+    return df.copy()
+
+
+def _pair_mask(left: pd.Series, right: pd.Series, pairs) -> pd.Series:
+    """Boolean mask of rows whose (left, right) value pair is one of `pairs`."""
+    pairs = list(pairs)
+    if not pairs or len(left) == 0:
+        return pd.Series(False, index=left.index)
+    keys = pd.MultiIndex.from_arrays([left, right])
+    return pd.Series(keys.isin(pairs), index=left.index)
+
+
+def _pair_key(left, right, unordered=False, by=()) -> np.ndarray:
+    """
+    One int64 per row, equal for two rows exactly when their (left, right)
+    pairs and by-values are equal; NaN and None match each other, as in
+    drop_duplicates. unordered (True, or a boolean mask of rows) makes
+    (a, b) and (b, a) the same pair.
+    """
+    n = len(left)
+    codes, uniques = pd.factorize(np.concatenate([np.asarray(left, dtype=object), np.asarray(right, dtype=object)]))
+    # Missing values are coded -1; shift them to 0
+    codes = codes.astype(np.int64) + 1
+    a, b = codes[:n], codes[n:]
+    if unordered is not False:
+        swap = (b < a) & np.asarray(unordered, dtype=bool)
+        a, b = np.where(swap, b, a), np.where(swap, a, b)
+    key = a * (len(uniques) + 1) + b
+    for values in by:
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        # Re-densify first so the combined key stays far from int64 overflow
+        key = pd.factorize(key)[0].astype(np.int64) * (len(uniques) + 1) + codes + 1
+    return key
+
+
+def _drop_duplicate_pairs(df: pd.DataFrame, left: str = "Name", right: str = "Name.1",
+                          unordered=False) -> pd.DataFrame:
+    """df.drop_duplicates(subset=[left, right], keep="first") on the pair key; unordered as in _pair_key."""
+    key = _pair_key(df[left], df[right], unordered)
+    return df[~pd.Series(key).duplicated().to_numpy()]
+
+
+def _symbol_cells(df: pd.DataFrame, columns=()) -> pd.DataFrame:
+    """
+    Name / Name.1 cells stacked into one stripped-str "Symbol" column, row by
+    row with Name before Name.1, each next to the given columns of its row
+    ("" where df has no such column). The index is the row position.
+    """
+    n = len(df)
+    data = {"Symbol": np.column_stack([df[c].astype(str).str.strip().to_numpy(dtype=object)
+                                       for c in ("Name", "Name.1")]).ravel()}
+    for col in columns:
+        values = df[col].to_numpy(dtype=object) if col in df.columns else np.full(n, "", dtype=object)
+        data[col] = np.repeat(values, 2)
+    return pd.DataFrame(data, index=np.repeat(np.arange(n), 2))
+
+
+class MultiReplacer:
+    """
+    Compiled multi-pattern substitution for string columns.
+
+    Rules are applied left to right, first-listed first, exactly like a chain
+    of str.replace (or re.sub when regex=True) calls - later rules see the
+    output of earlier ones, so "DBL"→"DBU" followed by "DBUWH"→"DBU/WH"
+    still turns "DBLWH" into "DBU/WH". A single alternation regex of all
+    rules is used as a gate: a value none of the rules matches is returned
+    untouched. The chain itself runs once per distinct value, not per cell.
+    """
+
+    def __init__(self, rules, regex: bool = False):
+        self.rules = list(rules.items()) if isinstance(rules, dict) else list(rules)
+        self.regex = regex
+        if regex:
+            self._steps = [(re.compile(old), new) for old, new in self.rules]
+            gate = "|".join(f"(?:{old})" for old, _ in self.rules)
+        else:
+            self._steps = self.rules
+            gate = "|".join(re.escape(old) for old, _ in self.rules)
+        self._gate = re.compile(gate) if self.rules else None
+
+    def replace(self, value: str) -> str:
+        """Apply all rules to one string."""
+        if self._gate is None or not self._gate.search(value):
+            return value
+        if self.regex:
+            for old, new in self._steps:
+                value = old.sub(new, value)
+        else:
+            for old, new in self._steps:
+                value = value.replace(old, new)
+        return value
+
+    def apply(self, series: pd.Series, stringify: bool = False) -> pd.Series:
+        """
+        Apply all rules to every string cell of a Series.
+
+        Non-string cells are left as they are; with stringify=True the Series
+        is first cast with astype(str) (skipped when it already holds only
+        strings). Returns the input object itself when nothing changes.
+        """
+        if stringify and pd.api.types.infer_dtype(series, skipna=False) != "string":
+            series = series.astype(str)
+        if self._gate is None or len(series) == 0 or series.dtype != object:
+            return series
+        codes, uniques = pd.factorize(series)
+        replaced = [self.replace(v) if isinstance(v, str) else v for v in uniques]
+        if all(new is old for new, old in zip(replaced, uniques)):
+            return series
+        values = np.asarray(replaced, dtype=object)[codes]
+        missing = codes < 0
+        if missing.any():
+            values[missing] = series.to_numpy(dtype=object)[missing]
+        return pd.Series(values, index=series.index, name=series.name)
+
+    def apply_frame(self, df: pd.DataFrame, stringify: bool = False) -> pd.DataFrame:
+        """Apply the rules to every column of df in place; returns df."""
+        for col in df.columns:
+            before = df[col]
+            after = self.apply(before, stringify=stringify)
+            if after is not before:
+                df[col] = after
+        return df
+
+
+# Colour / voltage / cross-section token clean-up of stage1_pipeline_3
+STAGE1_TOKEN_REPLACER = MultiReplacer({
+    "24VDC.": "24VDC",
+    "DBL": "DBU",
+    "DBLWH": "DBU/WH",
+    "DBUWH": "DBU/WH",
+    "RDWH": "RD/WH",
+    "LBL": "BU",
+    "N'": "N2",
+    "N´": "N2",
+    "N`": "N2",
+    "'": "",
+    "\u23F6": "~",
+    ".P": "",
+    ".S": "",
+    "1,0": "0,75",
+    "\u23E6": "~",
+    "0VDC.": "0VDC",
+    "24VDC.": "24VDC",
+    "24VDC1.": "24VDC1",
+    "24VDC2.": "24VDC2"
+})
+
+# Any cell mentioning an error (stage1_pipeline_12)
+ERROR_CELL_SCRUBBER = MultiReplacer({r'.*[Ee]rror.*': ''}, regex=True)
+
+# Cells holding a single space (stage2_pipeline_1)
+BLANK_CELL_SCRUBBER = MultiReplacer({r'^ $': ''}, regex=True)
+
+
+class Components(NamedTuple):
+    """Result of connected_components (one entry per row)."""
+    labels: np.ndarray        # component id, numbered 0, 1, … in order of first row
+    sizes: np.ndarray         # number of rows in the row's component
+    left_degree: np.ndarray   # occurrences of the row's left value across both columns (0 if blank)
+    right_degree: np.ndarray  # same for the right value
+
+    @property
+    def left_endpoint(self) -> np.ndarray:
+        return self.left_degree == 1
+
+    @property
+    def right_endpoint(self) -> np.ndarray:
+        return self.right_degree == 1
+
+
+def connected_components(left: pd.Series, right: pd.Series, left_valid=None, right_valid=None) -> Components:
+    """
+    Group rows that share an endpoint value into connected components.
+
+    Every row is a wire between its left and right value; two rows are
+    connected when they share a value in either column. Values where
+    left_valid / right_valid is False are ignored (a row with no valid
+    value is a component of its own).
+
+    Values are factorised to integer codes and components are found with
+    an iterative, array-backed union-find (min-label hooking plus pointer
+    jumping), so long chains need no recursion.
+    """
+    n = len(left)
+    lv = np.ones(n, dtype=bool) if left_valid is None else np.asarray(left_valid, dtype=bool)
+    rv = np.ones(n, dtype=bool) if right_valid is None else np.asarray(right_valid, dtype=bool)
+    rows_l = np.flatnonzero(lv)
+    rows_r = np.flatnonzero(rv)
+    values = np.concatenate([np.asarray(left, dtype=object)[rows_l], np.asarray(right, dtype=object)[rows_r]])
+    codes, uniques = pd.factorize(values)
+    # Bipartite graph: rows are nodes 0..n-1, distinct values are nodes n..
+    u = np.concatenate([rows_l, rows_r])
+    v = codes + n
+    parent = np.arange(n + len(uniques))
+    while len(u):
+        pu, pv = parent[u], parent[v]
+        differ = pu != pv
+        if not differ.any():
+            break
+        lo = np.minimum(pu[differ], pv[differ])
+        hi = np.maximum(pu[differ], pv[differ])
+        np.minimum.at(parent, hi, lo)
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+    labels, _ = pd.factorize(parent[:n])
+    sizes = np.bincount(labels, minlength=1)[labels] if n else np.zeros(0, dtype=np.int64)
+    counts = np.bincount(codes, minlength=len(uniques))
+    left_degree = np.zeros(n, dtype=np.int64)
+    right_degree = np.zeros(n, dtype=np.int64)
+    left_degree[rows_l] = counts[codes[:len(rows_l)]]
+    right_degree[rows_r] = counts[codes[len(rows_l):]]
+    return Components(labels, sizes, left_degree, right_degree)
+
+
+# Named symbol markers queried by the Stage 1 pipelines (see SymbolFeatures).
+# A spec is (op, arg); ops are listed in SymbolFeatures._evaluate.
+SYMBOL_FLAGS = {
+    "x102":           ("startswith", "-X102:"),
+    "g90a3":          ("contains", "-G90A3"),
+    "g90a3_word":     ("search", r"\bG90A3\b"),
+    "g_bat":          ("search", r"(?i)-G.*BAT"),
+    "g_in":           ("search", r"(?i)-G.*IN"),
+    "bat":            ("search", r"(?i)BAT"),
+    "t8x":            ("search", r"-T8\d"),
+    "t8x_s2":         ("match", r"-T8.*:S2"),
+    "m92x_n":         ("search", r"-M92[345]:N"),
+    "v2":             ("search", "230VL2|230VN2"),
+    "t901":           ("startswith", "-T901:"),
+    "t901_or_f901_1": ("search", r"-T901|-F901\.1"),
+    "f901":           ("contains", "-F901:"),
+    "k924":           ("startswith", "-K924"),
+    "carel_j":        ("pin_contains", "J"),
+}
+
+
+class SymbolFeatures:
+    """
+    Marker index over the symbol columns of a wire list.
+
+    Every distinct value of the indexed columns (Name / Name.1 by default)
+    is factorised once into shared uniques, and split into component (text
+    before the first ':'), pin (text after it) and prefix class ('-X',
+    '-K', …). A marker - a name from SYMBOL_FLAGS or an (op, arg) spec - is
+    evaluated once per distinct value and memoised, so a stage asking for
+    several masks and presence flags scans the unique symbol set, not every
+    row, and repeated questions are answered from the memo.
+
+        feats = SymbolFeatures(df)
+        feats.any("g90a3")             # any -G90A3 in Name or Name.1
+        df[feats.mask("x102")]         # rows with a -X102:* symbol
+
+    Non-string cells never match a marker. take() / extend() follow a stage
+    that drops or appends rows without re-factorising the kept rows.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns=("Name", "Name.1")):
+        self.columns = tuple(c for c in columns if c in df.columns)
+        self.n_rows = len(df)
+        if self.columns:
+            codes, uniques = pd.factorize(pd.concat([df[c] for c in self.columns], ignore_index=True))
+        else:
+            codes, uniques = np.zeros(0, dtype=np.intp), np.array([], dtype=object)
+        self.uniques = np.asarray(uniques, dtype=object)
+        self.codes = {c: codes[i * self.n_rows:(i + 1) * self.n_rows] for i, c in enumerate(self.columns)}
+        self._memo = {}
+        self._parts = None
+
+    def _view(self, codes: dict, n_rows: int) -> "SymbolFeatures":
+        view = object.__new__(SymbolFeatures)
+        view.columns, view.n_rows, view.codes = self.columns, n_rows, codes
+        view.uniques, view._memo, view._parts = self.uniques, self._memo, self._parts
+        return view
+
+    def take(self, rows) -> "SymbolFeatures":
+        """Index of a subset of the rows (boolean mask or positions), sharing the memo."""
+        rows = np.asarray(rows)
+        codes = {c: k[rows] for c, k in self.codes.items()}
+        n_rows = int(rows.sum()) if rows.dtype == bool else len(rows)
+        return self._view(codes, n_rows)
+
+    def extend(self, rows: pd.DataFrame) -> "SymbolFeatures":
+        """Index of these rows followed by `rows`, as after pd.concat([df, rows])."""
+        known = pd.Index(self.uniques)
+        extra = pd.concat([rows[c] for c in self.columns if c in rows.columns], ignore_index=True)
+        new = pd.unique(extra[extra.notna() & (known.get_indexer(extra) < 0)])
+        uniques = np.concatenate([self.uniques, np.asarray(new, dtype=object)])
+        index = pd.Index(uniques)
+        codes = {}
+        for c in self.columns:
+            if c in rows.columns:
+                add = np.where(rows[c].notna(), index.get_indexer(rows[c]), -1)
+            else:
+                add = np.full(len(rows), -1)
+            codes[c] = np.concatenate([self.codes[c], add])
+        view = self._view(codes, self.n_rows + len(rows))
+        view.uniques, view._parts = uniques, None
+        # Extend memoised markers by evaluating only the new values
+        view._memo = {}
+        if len(new):
+            tail = SymbolFeatures(pd.DataFrame({"s": np.asarray(new, dtype=object)}), columns=("s",))
+            for spec, flags in self._memo.items():
+                view._memo[spec] = np.concatenate([flags, tail.flag(spec)])
+        else:
+            view._memo = self._memo
+        return view
+
+    @property
+    def parts(self) -> pd.DataFrame:
+        """component / pin / prefix of every distinct value (NaN for non-strings)."""
+        if self._parts is None:
+            s = self._strings()
+            split = s.str.split(":", n=1, expand=True).reindex(columns=[0, 1])
+            self._parts = pd.DataFrame({
+                "symbol": s,
+                "component": split[0],
+                "pin": split[1],
+                "prefix": s.str.extract(r"^(-?[A-Za-z]+)", expand=False),
+            })
+        return self._parts
+
+    def _strings(self) -> pd.Series:
+        is_str = np.fromiter((isinstance(v, str) for v in self.uniques), dtype=bool, count=len(self.uniques))
+        return pd.Series(np.where(is_str, self.uniques, np.nan), dtype=object)
+
+    def _evaluate(self, op: str, arg) -> np.ndarray:
+        s = self._strings()
+        if op == "equals":
+            out = s == arg
+        elif op == "contains":
+            out = s.str.contains(arg, regex=False, na=False)
+        elif op == "search":
+            out = s.str.contains(arg, regex=True, na=False)
+        elif op == "match":
+            out = s.str.match(arg, na=False)
+        elif op == "startswith":
+            out = s.str.startswith(arg, na=False)
+        elif op == "endswith":
+            out = s.str.endswith(arg, na=False)
+        elif op == "pin_contains":
+            out = self.parts["pin"].str.contains(arg, regex=False, na=False)
+        elif op == "pin_in":
+            out = self.parts["pin"].isin(arg)
+        elif op == "component_in":
+            out = self.parts["component"].isin(arg)
+        else:
+            raise ValueError(f"Unknown symbol marker op {op!r}")
+        return out.to_numpy(dtype=bool)
+
+    def flag(self, spec) -> np.ndarray:
+        """Boolean array over the distinct values for a marker name or (op, arg) spec."""
+        if isinstance(spec, np.ndarray):
+            return spec
+        spec = SYMBOL_FLAGS.get(spec, spec) if isinstance(spec, str) else spec
+        if spec not in self._memo:
+            self._memo[spec] = self._evaluate(*spec)
+        return self._memo[spec]
+
+    def present(self, columns=None) -> np.ndarray:
+        """Which distinct values occur in the given columns of the current rows."""
+        out = np.zeros(len(self.uniques), dtype=bool)
+        for c in self._columns(columns):
+            k = self.codes[c]
+            out[k[k >= 0]] = True
+        return out
+
+    def _columns(self, columns):
+        if columns is None:
+            return self.columns
+        return tuple(c for c in columns if c in self.codes)
+
+    def mask(self, spec, columns=None) -> np.ndarray:
+        """Row mask: the marker matches in any of the columns."""
+        flags = np.append(self.flag(spec), False)
+        out = np.zeros(self.n_rows, dtype=bool)
+        for c in self._columns(columns):
+            out |= flags[self.codes[c]]
+        return out
+
+    def any(self, spec, columns=None) -> bool:
+        return bool((self.flag(spec) & self.present(columns)).any())
+
+    def values(self, spec, columns=None) -> set:
+        """Distinct values in the given columns that match the marker."""
+        return set(self.uniques[self.flag(spec) & self.present(columns)])
+
+    def components_with_pins(self, pins, columns=None) -> set:
+        """Components that show up with every one of `pins` (e.g. EKF modules)."""
+        pins = set(pins)
+        parts = self.parts[self.flag(("pin_in", tuple(sorted(pins)))) & self.present(columns)]
+        seen = parts.groupby("component")["pin"].nunique()
+        return set(seen.index[seen == len(pins)])
+
 def stage1_pipeline_1(df: pd.DataFrame):
-    df = df.copy()
+    df = _stage_copy(df)
     df = df.fillna("")
     df = df.astype(str)
     if 'Line-Article' in df.columns:
@@ -57,36 +585,12 @@ def stage1_pipeline_2(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 def stage1_pipeline_3(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    replacements = {
-        "24VDC.": "24VDC",
-        "DBL": "DBU",
-        "DBLWH": "DBU/WH",
-        "DBUWH": "DBU/WH",
-        "RDWH": "RD/WH",
-        "LBL": "BU",
-        "N'": "N2",
-        "N´": "N2",
-        "N`": "N2",
-        "'": "",
-        "\u23F6": "~",
-        ".P": "",
-        ".S": "",
-        "1,0": "0,75",
-        "\u23E6": "~",
-        "0VDC.": "0VDC",
-        "24VDC.": "24VDC",
-        "24VDC1.": "24VDC1",
-        "24VDC2.": "24VDC2"
-    }
-    for col in df.columns:
-        df[col] = df[col].astype(str)
-        for old, new in replacements.items():
-            df[col] = df[col].str.replace(old, new, regex=False)
-    return df
+    df = _stage_copy(df)
+    # One gated pass per column; columns without any token are left untouched
+    return STAGE1_TOKEN_REPLACER.apply_frame(df, stringify=True)
 
 def stage1_pipeline_4(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+    df = _stage_copy(df)
     col6_name = df.columns[5] if len(df.columns) > 5 else None
     col1_name = df.columns[0] if len(df.columns) > 0 else None
     col2_name = df.columns[1] if len(df.columns) > 1 else None
@@ -101,37 +605,76 @@ def stage1_pipeline_4(df: pd.DataFrame) -> pd.DataFrame:
     return df_filtered
 
 def stage1_pipeline_5(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+    df = _stage_copy(df)
     if 'Name' not in df.columns or 'Name.1' not in df.columns:
         return df
     mask_r = df['Name'].str.startswith('-R')
     df.loc[mask_r, ['Name', 'Name.1']] = df.loc[mask_r, ['Name.1', 'Name']].values
-    relay_map = {
-        row['Name.1']: row['Name']
-        for _, row in df.iterrows()
-        if isinstance(row['Name.1'], str) and row['Name.1'].startswith('-R')
-    }
-    rows_out = []
-    for idx, row in df.iterrows():
-        name_left = row['Name']
-        name_right = row['Name.1']
-        walked = set()
-        while isinstance(name_right, str) and name_right.startswith('-R') and name_right in relay_map:
-            if name_right in walked:
-                break
-            walked.add(name_right)
-            name_right = relay_map[name_right]
-        new_row = row.copy()
-        new_row['Name.1'] = name_right
-        rows_out.append(new_row)
-    result_df = pd.DataFrame(rows_out, columns=df.columns)
-    mask_duplicates = result_df['Name'] == result_df['Name.1']
-    result_df = result_df[~mask_duplicates].reset_index(drop=True)
+    # Each -R symbol in Name.1 points at the Name it is wired to (last row wins)
+    is_relay = df['Name.1'].str.startswith('-R', na=False)
+    relay_map = dict(zip(df.loc[is_relay, 'Name.1'], df.loc[is_relay, 'Name']))
+    terminal, cycles = resolve_relay_chains(relay_map)
+    for cycle in cycles:
+        get_logger("stage1_pipeline_5").warning("Relay cycle %s", ' → '.join(cycle + cycle[:1]))
+    # Rewrite every row's Name.1 to its chain terminal in one map
+    df['Name.1'] = df['Name.1'].map(terminal).fillna(df['Name.1'])
+    mask_duplicates = df['Name'] == df['Name.1']
+    result_df = df[~mask_duplicates].reset_index(drop=True)
     result_df = result_df.drop_duplicates(ignore_index=True)
     return result_df
 
+
+def resolve_relay_chains(relay_map: dict):
+    """
+    Resolve -R relay chains to their terminal symbol.
+
+    relay_map maps a -R symbol to the symbol it is wired to. Following the
+    map from a -R symbol ends at the first symbol that is not itself a
+    mapped -R symbol. In a cycle, the walk stops at the first symbol it
+    reaches again: members of a cycle resolve to themselves and symbols
+    leading into a cycle resolve to the cycle's entry.
+
+    Each symbol is resolved once; a walk stops as soon as it reaches a
+    symbol whose terminal is already known (path compression).
+
+    Returns:
+    --------
+    (dict, list)
+        terminal symbol per -R key of relay_map, and the list of cycles found
+        (each a list of symbols in walk order)
+    """
+    terminal = {}
+    cycles = []
+    for start in relay_map:
+        if start in terminal:
+            continue
+        path = []
+        position = {}
+        node = start
+        while True:
+            if node in terminal:
+                result = terminal[node]
+                break
+            if not (isinstance(node, str) and node.startswith('-R') and node in relay_map):
+                result = node
+                break
+            if node in position:
+                cycle = path[position[node]:]
+                cycles.append(cycle)
+                for member in cycle:
+                    terminal[member] = member
+                path = path[:position[node]]
+                result = node
+                break
+            position[node] = len(path)
+            path.append(node)
+            node = relay_map[node]
+        for member in path:
+            terminal[member] = result
+    return terminal, cycles
+
 def stage1_pipeline_6(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+    df = _stage_copy(df)
     suffixes = [':A', ':B', ':C', ':D', ':E', ':F']
     def check_pattern(val: str) -> bool:
         if not isinstance(val, str):
@@ -145,48 +688,121 @@ def stage1_pipeline_6(df: pd.DataFrame) -> pd.DataFrame:
     df_filtered = df.loc[mask_to_keep].reset_index(drop=True)
     return df_filtered
 
+class WirenoIndex:
+    """
+    Symbol → Wireno index: which Wireno does a Name / Name.1 symbol carry.
+
+    The first non-empty Wireno wins. With precedence="name_first" every
+    Name entry outranks every Name.1 entry (stage1_pipeline_7); with
+    precedence="row" rows win in order, Name before Name.1 within a row
+    (stage1_pipeline_7_1).
+
+    Entries are kept per row, so rows can be added or discarded as a frame
+    grows or shrinks without rescanning it; the lookup map is rebuilt
+    lazily (vectorised) on the next query.
+
+        index = WirenoIndex.from_frame(df)
+        index.lookup("-K1:13")
+    """
+
+    def __init__(self, precedence: str = "row"):
+        if precedence not in ("row", "name_first"):
+            raise ValueError(f"Unknown precedence {precedence!r}")
+        self.precedence = precedence
+        self._chunks = []
+        self._discarded = set()
+        self._next_row = 0
+        self._map = None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, precedence: str = "row") -> "WirenoIndex":
+        index = cls(precedence)
+        index.add(df)
+        return index
+
+    def add(self, df: pd.DataFrame) -> np.ndarray:
+        """Index the rows of df (appended after earlier rows); returns their row ids."""
+        rows = np.arange(self._next_row, self._next_row + len(df))
+        self._next_row += len(df)
+        if "Wireno" in df.columns and len(df):
+            wireno = df["Wireno"]
+            valid = (wireno.notna() & (wireno != "")).to_numpy()
+            for side, col in enumerate(("Name", "Name.1")):
+                self._chunks.append(pd.DataFrame({
+                    "symbol": df[col].to_numpy(dtype=object)[valid],
+                    "wireno": wireno.to_numpy(dtype=object)[valid],
+                    "row": rows[valid],
+                    "side": side,
+                }))
+            self._map = None
+        return rows
+
+    def discard(self, row_ids) -> None:
+        """Drop the entries of rows that were removed from the frame."""
+        self._discarded.update(int(r) for r in row_ids)
+        self._map = None
+
+    @property
+    def mapping(self) -> dict:
+        if self._map is None:
+            if not self._chunks:
+                self._map = {}
+                return self._map
+            entries = pd.concat(self._chunks, ignore_index=True)
+            if self._discarded:
+                entries = entries[~entries["row"].isin(self._discarded)]
+            order = ["side", "row"] if self.precedence == "name_first" else ["row", "side"]
+            entries = entries.sort_values(order, kind="stable").drop_duplicates("symbol")
+            self._map = dict(zip(entries["symbol"], entries["wireno"]))
+        return self._map
+
+    def lookup(self, symbol, default=""):
+        return self.mapping.get(symbol, default)
+
+    def __contains__(self, symbol) -> bool:
+        return symbol in self.mapping
+
+    def __len__(self) -> int:
+        return len(self.mapping)
+
+    def fill(self, df: pd.DataFrame) -> pd.Series:
+        """Wireno column with blanks filled by Name, then Name.1 (else "")."""
+        if "Wireno" in df.columns:
+            wireno = df["Wireno"]
+        else:
+            wireno = pd.Series("", index=df.index, dtype=object)
+        blank = wireno.isna() | (wireno == "")
+        if not blank.any():
+            return wireno
+        mapping = self.mapping
+        found = df["Name"].map(mapping).fillna(df["Name.1"].map(mapping)).fillna("")
+        return wireno.where(~blank, found)
+
+
 def stage1_pipeline_7(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+    df = _stage_copy(df)
     if not all(col in df.columns for col in ['Name', 'Name.1', 'Wireno']):
         return df
     df['Wireno'] = df['Wireno'].fillna("").astype(str)
-    wireno_map = {}
-    name_wireno = df.loc[df['Wireno'] != "", ['Name', 'Wireno']].drop_duplicates(subset=['Name'])
-    for _, row in name_wireno.iterrows():
-        wireno_map[row['Name']] = row['Wireno']
-    name1_wireno = df.loc[df['Wireno'] != "", ['Name.1', 'Wireno']].drop_duplicates(subset=['Name.1'])
-    for _, row in name1_wireno.iterrows():
-        if row['Name.1'] not in wireno_map:
-            wireno_map[row['Name.1']] = row['Wireno']
-    def fill_wireno(row):
-        if row['Wireno'] != "":
-            return row['Wireno']
-        for key in [row['Name'], row['Name.1']]:
-            if key in wireno_map and wireno_map[key] != "":
-                return wireno_map[key]
-        return ""
-    df['Wireno'] = df.apply(fill_wireno, axis=1)
+    wireno_index = WirenoIndex.from_frame(df, precedence="name_first")
+    df['Wireno'] = wireno_index.fill(df)
     return df
 
 def stage1_pipeline_7_1(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+    df = _stage_copy(df)
     targets = ["-X923:N", "-X924:N", "-X927:N", "-X928:N"]
-    has_flags = {key: False for key in targets}
+    wireno_index = WirenoIndex(precedence="row")
+    row_ids = wireno_index.add(df)
+    seen = set(df['Name'][df['Name'].isin(targets)]) | set(df['Name.1'][df['Name.1'].isin(targets)])
+    has_flags = {key: key in seen for key in targets}
+    # Line-Name / Line-Function come from the first -X923:N / -X924:N row
     stored_line_name = None
     stored_line_function = None
-    for _, row in df.iterrows():
-        names = [row['Name'], row['Name.1']]
-        if "-X923:N" in names or "-X924:N" in names:
-            has_flags["-X923:N"] = "-X923:N" in names or has_flags["-X923:N"]
-            has_flags["-X924:N"] = "-X924:N" in names or has_flags["-X924:N"]
-            if stored_line_name is None:
-                stored_line_name = row.get("Line-Name", "")
-                stored_line_function = row.get("Line-Function", "")
-        for val in ("-X927:N", "-X928:N"):
-            if val in names:
-                has_flags[val] = True
-        if all(has_flags.values()) and stored_line_name is not None:
-            break
+    first_n = (df['Name'].isin(["-X923:N", "-X924:N"]) | df['Name.1'].isin(["-X923:N", "-X924:N"])).to_numpy()
+    if first_n.any():
+        pos = int(np.argmax(first_n))
+        stored_line_name = df['Line-Name'].iat[pos] if 'Line-Name' in df.columns else ""
+        stored_line_function = df['Line-Function'].iat[pos] if 'Line-Function' in df.columns else ""
     base_cols = df.columns.tolist()
     def create_new_row(target_name1_val):
         new_row = {col: "" for col in base_cols}
@@ -200,7 +816,9 @@ def stage1_pipeline_7_1(df: pd.DataFrame) -> pd.DataFrame:
         if has_flags[val]:
             new_rows.append(create_new_row(val))
     if new_rows:
-        df = pd.concat([df, pd.DataFrame(new_rows)], ignore_index=True)
+        new_df = pd.DataFrame(new_rows)
+        row_ids = np.concatenate([row_ids, wireno_index.add(new_df)])
+        df = pd.concat([df, new_df], ignore_index=True)
     delete_pairs = {
         ("-X923:N", "-X923:N"),
         ("-X924:N", "-X924:N"),
@@ -229,96 +847,42 @@ def stage1_pipeline_7_1(df: pd.DataFrame) -> pd.DataFrame:
         ("-X927:230VN", "-X928:230VN"),
         ("-X0100:L", "-X0100:L3"),
     }
-    for idx in reversed(df.index):
-        row = df.loc[idx]
-        val_pair = (row["Name"], row["Name.1"])
-        if val_pair in delete_pairs:
-            df.drop(index=idx, inplace=True)
+    drop = _pair_mask(df["Name"], df["Name.1"], delete_pairs).to_numpy()
+    if drop.any():
+        wireno_index.discard(row_ids[drop])
+        df = df[~drop]
     # Wireno fill
-    wireno_map = {}
-    for idx, row in df.iterrows():
-        for key in [row["Name"], row["Name.1"]]:
-            wireno_val = row.get("Wireno", "")
-            if pd.notna(wireno_val) and wireno_val != "":
-                if key not in wireno_map:
-                    wireno_map[key] = wireno_val
-    def fill_wireno(row):
-        if pd.isna(row.get("Wireno", "")) or row.get("Wireno", "") == "":
-            for key in [row["Name"], row["Name.1"]]:
-                if key in wireno_map:
-                    return wireno_map[key]
-            return ""
-        else:
-            return row["Wireno"]
-    df["Wireno"] = df.apply(fill_wireno, axis=1)
+    df["Wireno"] = wireno_index.fill(df)
     return df.reset_index(drop=True)
 
 
+
 def stage1_pipeline_8(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+    df = _stage_copy(df)
     if not all(col in df.columns for col in ['Name', 'Name.1']):
         return df
 
     # 0) Identify X102 rows to force-keep
-    force_keep = {
-        idx
-        for idx, row in df.iterrows()
-        if str(row['Name']).startswith('-X102:') or str(row['Name.1']).startswith('-X102:')
-    }
-
-    # 1) Build connectivity map, skipping forced rows
-    value_to_rows = defaultdict(set)
-    for idx, row in df.iterrows():
-        if idx in force_keep:
-            continue
-        name = str(row['Name']).strip()
-        name1 = str(row['Name.1']).strip()
-        if name and name != 'nan':
-            value_to_rows[name].add(idx)
-        if name1 and name1 != 'nan':
-            value_to_rows[name1].add(idx)
-
-    parent = {}
-    def find(x):
-        parent.setdefault(x, x)
-        if parent[x] != x:
-            parent[x] = find(parent[x])
-        return parent[x]
-    def union(a, b):
-        pa, pb = find(a), find(b)
-        if pa != pb:
-            parent[pa] = pb
-
-    # 2) Initialize all indices
-    for idx in df.index:
-        parent[idx] = idx
-
-    # 3) Union only groups with >1 connection, skipping forced rows
-    for group in value_to_rows.values():
-        members = list(group)
-        for other in members[1:]:
-            union(members[0], other)
-
-    # 4) Build daisy‐chain numbers
-    groups = defaultdict(list)
-    for idx in df.index:
-        groups[find(idx)].append(idx)
-
-    daisy_mapping = {}
-    daisy_no = 1
-    for members in groups.values():
-        if len(members) > 1:
-            for idx in members:
-                daisy_mapping[idx] = daisy_no
-            daisy_no += 1
-        else:
-            daisy_mapping[members[0]] = 0
-
-    # 5) Enforce DaisyNo=0 for forced rows
-    for idx in force_keep:
-        daisy_mapping[idx] = 0
+    force_keep = (
+        df['Name'].astype(str).str.startswith('-X102:') |
+        df['Name.1'].astype(str).str.startswith('-X102:')
+    ).to_numpy()
+
+    # 1) Rows sharing a (non-blank) symbol are connected; forced rows stay out
+    name = df['Name'].astype(str).str.strip()
+    name1 = df['Name.1'].astype(str).str.strip()
+    comps = connected_components(
+        name, name1,
+        left_valid=(name != '') & (name != 'nan') & ~force_keep,
+        right_valid=(name1 != '') & (name1 != 'nan') & ~force_keep,
+    )
 
-    df['DaisyNo'] = df.index.map(daisy_mapping)
+    # 2) Daisy-chain numbers 1, 2, … for multi-row groups in order of first
+    #    row; single rows (including forced -X102 rows) get DaisyNo=0
+    chained = comps.sizes > 1
+    daisy = np.zeros(len(df), dtype=np.int64)
+    daisy[chained] = pd.factorize(comps.labels[chained])[0] + 1
+    df['DaisyNo'] = daisy
 
     # 6) Final sort
     df = df.sort_values(by=['DaisyNo', 'Wireno'], ascending=[True, True]).reset_index(drop=True)
@@ -333,15 +897,15 @@ def stage1_pipeline_8(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def stage1_pipeline_9(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+    df = _stage_copy(df)
+    feats = SymbolFeatures(df)
     # 0) Force-keep any -X102:* rows
-    force_keep = df[
-        df['Name'].str.startswith('-X102:', na=False) |
-        df['Name.1'].str.startswith('-X102:', na=False)
-    ]
+    force_keep = df[feats.mask("x102")]
 
     # 1) Work on the remaining rows
-    working = df.drop(force_keep.index)
+    in_working = ~df.index.isin(force_keep.index)
+    working = df[in_working]
+    feats = feats.take(in_working)
 
     # ── original pipeline_9 logic ──
     line_name_values = {
@@ -355,10 +919,8 @@ def stage1_pipeline_9(df: pd.DataFrame) -> pd.DataFrame:
     exact_mask = working['Name'].isin(line_name_values) | working['Name.1'].isin(line_name_values)
     working.loc[exact_mask, 'Line-Name'] = '1,5'
 
-    pat_bat = re.compile(r'-G.*BAT', re.IGNORECASE)
-    pat_in  = re.compile(r'-G.*IN',  re.IGNORECASE)
-    mask_bat = working['Name'].str.contains(pat_bat, na=False) | working['Name.1'].str.contains(pat_bat, na=False)
-    mask_in  = working['Name'].str.contains(pat_in,  na=False) | working['Name.1'].str.contains(pat_in,  na=False)
+    mask_bat = feats.mask("g_bat")
+    mask_in  = feats.mask("g_in")
     working.loc[mask_bat,                   'Line-Name'] = '2,5'
     working.loc[mask_in & ~mask_bat,        'Line-Name'] = '1,5'
 
@@ -369,8 +931,8 @@ def stage1_pipeline_9(df: pd.DataFrame) -> pd.DataFrame:
     mask_new = working['Name'].isin(new_symbols) | working['Name.1'].isin(new_symbols)
     working.loc[mask_new & working['Line-Name'].eq(""), 'Line-Name'] = '1,5'
 
-    has_g90  = working[['Name','Name.1']].apply(lambda s: s.str.contains(r'\bG90A3\b',na=False)).any().any()
-    has_out = working[['Name','Name.1']].apply(lambda s: s.eq('G90A3:OUT+')).any().any()
+    has_g90  = feats.any("g90a3_word")
+    has_out = feats.any(("equals", 'G90A3:OUT+'))
     if has_g90 and not has_out:
         base = list(working.columns)
         new = {c:"" for c in base}
@@ -378,16 +940,18 @@ def stage1_pipeline_9(df: pd.DataFrame) -> pd.DataFrame:
             'Name':'G90A3:OUT+','Name.1':'-X0102:24VDC','Wireno':'24VDC',
             'Line-Name':'2,5','Line-Function':'DBU'
         })
-        working = pd.concat([working, pd.DataFrame([new])], ignore_index=True)
-        
+        new = pd.DataFrame([new])
+        working = pd.concat([working, new], ignore_index=True)
+        feats = feats.extend(new)
+
     # old 2,5 filtering rule
     # mask_25 = working['Line-Name']=='2,5'
     # mask_bat = working['Name'].str.contains('BAT',na=False,case=False) | working['Name.1'].str.contains('BAT',na=False,case=False)
     # working = working[~(mask_25 & ~mask_bat)]
 
     mask_25 = working['Line-Name']=='2,5'
-    mask_bat = working['Name'].str.contains('BAT',na=False,case=False) | working['Name.1'].str.contains('BAT',na=False,case=False)
-    mask_transformer = working['Name'].str.contains(r'-T8\d', na=False, regex=True) | working['Name.1'].str.contains(r'-T8\d', na=False, regex=True)
+    mask_bat = feats.mask("bat")
+    mask_transformer = feats.mask("t8x")
     working = working[~(mask_25 & ~mask_bat & ~mask_transformer)]
 
     # ── end original logic ──
@@ -400,6 +964,49 @@ def stage1_pipeline_9(df: pd.DataFrame) -> pd.DataFrame:
 
 
 
+class FunctionTrie:
+    """
+    Prefix trie of the component-function symbols of every group, keyed
+    on their ':'-separated segments.
+
+    A wire symbol belongs to a group when one of the group's functions
+    equals it or is followed in it by ':' (re.match(rf'^{re.escape(f)}(:|$)', s)).
+    Walking the symbol's own segments finds every such function at once,
+    so a symbol costs O(its segments) however many functions there are.
+
+        trie = FunctionTrie({"CONTROL": ["-K1", "-K2"]})
+        trie.groups("-K1:13")   # {"CONTROL"}
+    """
+
+    def __init__(self, group_symbols: dict):
+        self._root = {}
+        for group, funcs in group_symbols.items():
+            for func in funcs:
+                node = self._root
+                for segment in func.split(":"):
+                    node = node.setdefault(segment, {})
+                # None never clashes with a segment (always a str)
+                node.setdefault(None, set()).add(group)
+
+    def groups(self, symbol: str) -> set:
+        found = set()
+        node = self._root
+        for segment in symbol.split(":"):
+            node = node.get(segment)
+            if node is None:
+                break
+            found.update(node.get(None, ()))
+        return found
+
+    def match(self, symbols) -> dict:
+        """group → set of the given symbols that belong to it."""
+        matched = {}
+        for symbol in symbols:
+            for group in self.groups(symbol):
+                matched.setdefault(group, set()).add(symbol)
+        return matched
+
+
 def parse_component_functions(df_f):
     # Expects: one-column DataFrame, filter only those starting with '='
     func_col = df_f.columns[0]
@@ -449,13 +1056,8 @@ def stage1_pipeline_10(df: pd.DataFrame, group_symbols: dict) -> pd.DataFrame:
     }
     CONTROL_WIRENOS = {"F903/N", "F903/L3", "230VL2", "230VN2"}
 
-    def get_first_row_mapping(wireno: str, section: pd.DataFrame) -> str:
-        syms = {
-            str(s).strip()
-            for col in ("Name", "Name.1")
-            for s in section[col]
-            if pd.notna(s) and str(s).strip() != "nan"
-        }
+    def get_first_row_mapping(wireno: str, syms: set) -> str:
+        # syms: the section's stripped symbols; "" and "nan" contain none of the markers
         has_v2    = any("230VL2" in s or "230VN2" in s for s in syms)
         has_g90   = any("-G90A3" in s for s in syms)
         has_f9031 = any("-F903.1" in s for s in syms)
@@ -490,24 +1092,17 @@ def stage1_pipeline_10(df: pd.DataFrame, group_symbols: dict) -> pd.DataFrame:
             return "-C903:10"
         return f"-X0101:{wireno}"
 
-    df = df.copy()
+    df = _stage_copy(df)
+
+    feats = SymbolFeatures(df, columns=("Name", "Name.1", "Wireno"))
+    symbols = ("Name", "Name.1")
 
     # 1. Preserve -M92X:N rows
-    m_pat = r"-M92[345]:N"
-    m_rows = df[
-        df["Name"].str.contains(m_pat, na=False, regex=True) |
-        df["Name.1"].str.contains(m_pat, na=False, regex=True)
-    ].copy()
+    m_rows = df[feats.mask("m92x_n", symbols)].copy()
 
     # 2. Global flags
-    has_g90 = df[["Name", "Name.1"]].apply(
-        lambda s: s.str.contains(r"-G90A3", na=False)
-    ).any().any()
-    has_v2 = (
-        df["Name"].str.contains("230VL2|230VN2", na=False).any() or
-        df["Name.1"].str.contains("230VL2|230VN2", na=False).any() or
-        df["Wireno"].str.contains("230VL2|230VN2", na=False).any()
-    )
+    has_g90 = feats.any("g90a3", symbols)
+    has_v2 = feats.any("v2")
 
     # 3. Prepare base columns
     base_cols = list(df.columns)
@@ -568,27 +1163,11 @@ def stage1_pipeline_10(df: pd.DataFrame, group_symbols: dict) -> pd.DataFrame:
         
     # 1) Identify EKF components only if they appear with all of these suffixes:
     ekf_suffixes = {"A1S1", "A2S1", "B1S1", "B2S1", "GND", "BAT+"}
-    # Build a mapping from component base name to set of observed suffixes
-    comp_suffixes = defaultdict(set)
-    for _, row in df.iterrows():
-        for side in ("Name", "Name.1"):
-            val = row.get(side, "")
-            if isinstance(val, str) and ":" in val:
-                comp, suffix = val.split(":", 1)
-                if suffix in ekf_suffixes:
-                    comp_suffixes[comp].add(suffix)
-    
-    # Filter only those components that have all required suffixes
-    ekf_comps = {comp for comp, suffixes in comp_suffixes.items() if ekf_suffixes.issubset(suffixes)}
+    ekf_comps = feats.components_with_pins(ekf_suffixes, symbols)
     
     # 2) Drop any existing rows for those components where Name or Name.1 ends with ":GND"
-    df = df[~df.apply(
-        lambda r: any(
-            r[col].endswith(":GND") and r[col].split(":", 1)[0] in ekf_comps 
-            for col in ("Name", "Name.1")
-        ),
-        axis=1
-    )].reset_index(drop=True)
+    ekf_gnd = feats.flag(("endswith", ":GND")) & feats.flag(("component_in", tuple(sorted(ekf_comps))))
+    df = df[~feats.mask(ekf_gnd, symbols)].reset_index(drop=True)
     
     # 3) Create unique grounding rows for each EKF component
     for comp in sorted(ekf_comps):
@@ -596,45 +1175,42 @@ def stage1_pipeline_10(df: pd.DataFrame, group_symbols: dict) -> pd.DataFrame:
         add_unique(f"{comp}:~/-",     "-X0102:0VDC", "0VDC", "DBU/WH")
 
 
-    # 5. Collect meta for SPECIAL_WIRENOS
+    # 5. Collect meta for SPECIAL_WIRENOS (rows in order, Name then Name.1; the last one wins)
     meta = {}
-    for _, r in df.iterrows():
-        w = r.get("Wireno", "")
-        if w in SPECIAL_WIRENOS:
-            for c in ("Name", "Name.1"):
-                s = str(r[c]).strip()
-                if s and s != "nan":
-                    meta.setdefault(w, {})[s] = {
-                        "Line-Name":     r.get("Line-Name", ""),
-                        "Line-Function": r.get("Line-Function", "")
-                    }
+    special = df[df["Wireno"].isin(SPECIAL_WIRENOS)] if "Wireno" in df.columns else df.iloc[:0]
+    if len(special):
+        entries = _symbol_cells(special, ("Wireno", "Line-Name", "Line-Function"))
+        entries = entries[~entries["Symbol"].isin(["", "nan"])]
+        entries = entries.drop_duplicates(["Wireno", "Symbol"], keep="last")
+        for s, w, line_name, line_function in entries.itertuples(index=False, name=None):
+            meta.setdefault(w, {})[s] = {"Line-Name": line_name, "Line-Function": line_function}
 
     # 6. Drop rows where Name == Name.1
     if {"Name", "Name.1"}.issubset(df.columns):
         df = df[df["Name"] != df["Name.1"]]
 
-    # 7. Build daisy chains
+    # 7. Build daisy chains, one Wireno group at a time
     daisy_rows = []
+    trie = FunctionTrie(group_symbols)
+    sections = dict(tuple(df[df["Wireno"].isin(SPECIAL_WIRENOS)].groupby("Wireno", sort=False)))
     for wireno in SPECIAL_WIRENOS:
-        sec = df[df["Wireno"] == wireno]
-        if sec.empty:
+        sec = sections.get(wireno)
+        if sec is None:
             continue
-        syms = {
-            str(s).strip()
-            for s in pd.concat([sec["Name"], sec["Name.1"]])
-            if pd.notna(s) and str(s).strip()
-        }
+        values = pd.concat([sec["Name"], sec["Name.1"]])
+        values = values[values.notna()].astype(str).str.strip()
+        syms = set(values[values != ""])
         terminal = TERMINAL_MAP.get(wireno, f"-X0101:{wireno}")
-        first    = get_first_row_mapping(wireno, sec)
+        first    = get_first_row_mapping(wireno, syms)
         ln       = "1,5" if wireno in CONTROL_WIRENOS else "0,75"
 
-        for grp, funcs in group_symbols.items():
-            matches = sorted({
-                s for s in syms
-                # for f in funcs if f in s  # <-- REPLACE THIS LINE OLD LOGIC
-                for f in funcs if re.match(rf'^{re.escape(f)}(:|$)', s)  # <-- NEW LINE
+        # A symbol matches a function f when it is f or starts with "f:"
+        by_group = trie.match(syms)
+        for grp in group_symbols:
+            matches = sorted(
+                s for s in by_group.get(grp, ())
                 if (s, terminal) not in seen and (terminal, s) not in seen and s != first
-            })
+            )
             if not matches:
                 continue
 
@@ -686,17 +1262,15 @@ def stage1_pipeline_10(df: pd.DataFrame, group_symbols: dict) -> pd.DataFrame:
     # 9. Remove duplicates & finalize, preferring DaisyNo="0"
     if {"Name", "Name.1", "DaisyNo"}.issubset(out.columns):
         # Identify all (Name, Name.1) pairs that have a DaisyNo of "0"
+        zero = out["DaisyNo"] == "0"
         zero_pairs = set(
-            out.loc[out["DaisyNo"] == "0", ["Name", "Name.1"]]
+            out.loc[zero, ["Name", "Name.1"]]
                .itertuples(index=False, name=None)
         )
         # Exclude any rows with the same pair but DaisyNo != "0"
-        out = out[~out.apply(
-            lambda r: (r["Name"], r["Name.1"]) in zero_pairs and r["DaisyNo"] != "0",
-            axis=1
-        )]
+        out = out[~(_pair_mask(out["Name"], out["Name.1"], zero_pairs) & ~zero)]
         # Finally drop any true duplicates, keeping the first
-        out = out.drop_duplicates(subset=["Name", "Name.1"], keep="first")
+        out = _drop_duplicate_pairs(out)
     if "DaisyNo" in out.columns:
         out["DaisyNo"] = out["DaisyNo"].astype(str)
 
@@ -715,55 +1289,31 @@ def stage1_pipeline_11(df: pd.DataFrame) -> pd.DataFrame:
     3. Removes rows where Name and Name.1 are identical
     4. Sorts by DaisyNo first, then by Line-Name second
     """
-    df = df.copy()
-
-    # Step 1: Build exact match dictionaries from both Name and Name.1 columns
-    def build_exact_mappings(df):
-        line_name_map = {}
-        line_function_map = {}
-
-        # Collect all non-empty values for mapping from BOTH Name and Name.1 columns
-        for idx, row in df.iterrows():
-            for col in ['Name', 'Name.1']:
-                value = str(row[col]).strip()
-                if not value or value == 'nan' or value == '':
-                    continue
-
-                # Collect Line-Name mappings (first non-empty occurrence wins)
-                line_name = str(row.get('Line-Name', '')).strip()
-                if line_name and line_name != '' and line_name != 'nan':
-                    if value not in line_name_map:
-                        line_name_map[value] = line_name
-
-                # Collect Line-Function mappings (first non-empty occurrence wins)
-                line_function = str(row.get('Line-Function', '')).strip()
-                if line_function and line_function != '' and line_function != 'nan':
-                    if value not in line_function_map:
-                        line_function_map[value] = line_function
-
-        return line_name_map, line_function_map
-
-    line_name_map, line_function_map = build_exact_mappings(df)
-
-    # Step 2: Apply exact matching to fill empty values
-    for idx, row in df.iterrows():
-        # Check and fill Line-Name if empty
-        current_line_name = str(row.get('Line-Name', '')).strip()
-        if not current_line_name or current_line_name == '' or current_line_name == 'nan':
-            for col in ['Name', 'Name.1']:
-                value = str(row[col]).strip()
-                if value and value in line_name_map:  # EXACT match only
-                    df.at[idx, 'Line-Name'] = line_name_map[value]
-                    break
-
-        # Check and fill Line-Function if empty
-        current_line_function = str(row.get('Line-Function', '')).strip()
-        if not current_line_function or current_line_function == '' or current_line_function == 'nan':
-            for col in ['Name', 'Name.1']:
-                value = str(row[col]).strip()
-                if value and value in line_function_map:  # EXACT match only
-                    df.at[idx, 'Line-Function'] = line_function_map[value]
-                    break
+    df = _stage_copy(df)
+
+    BLANK = ["", "nan"]
+
+    # Step 1: Build exact match maps from both Name and Name.1 columns:
+    # symbol -> first non-empty value, rows in order, Name before Name.1
+    def build_exact_mapping(col):
+        if col not in df.columns:
+            return pd.Series(dtype=object)
+        cells = _symbol_cells(df, (col,))
+        cells[col] = cells[col].astype(str).str.strip()
+        cells = cells[~cells["Symbol"].isin(BLANK) & ~cells[col].isin(BLANK)]
+        return cells.drop_duplicates("Symbol").set_index("Symbol")[col]
+
+    # Step 2: Fill empty values by exact match, Name first, then Name.1
+    names = [df[col].astype(str).str.strip() for col in ("Name", "Name.1")]
+    for col in ("Line-Name", "Line-Function"):
+        mapping = build_exact_mapping(col)
+        if mapping.empty:
+            continue
+        empty = df[col].astype(str).str.strip().isin(BLANK)
+        found = names[0].map(mapping).fillna(names[1].map(mapping))
+        fill = empty & found.notna()
+        if fill.any():
+            df[col] = df[col].mask(fill, found)
 
     # Step 3: Remove rows where Name and Name.1 are identical
     if 'Name' in df.columns and 'Name.1' in df.columns:
@@ -793,11 +1343,11 @@ def stage1_pipeline_12(df: pd.DataFrame) -> pd.DataFrame:
     1. Replacing cells containing 'Error' with empty strings
     2. Identifying blank cells and ensuring proper data types for the data editor
     """
-    df = df.copy()
+    df = _stage_copy(df)
 
     # Replace any cell containing 'Error' with empty string across entire DataFrame
     # This handles partial matches (case-insensitive)
-    df = df.replace(to_replace=r'.*[Ee]rror.*', value='', regex=True)
+    df = ERROR_CELL_SCRUBBER.apply_frame(df)
 
     # Ensure DaisyNo is string type to avoid Arrow serialization issues
     if 'DaisyNo' in df.columns:
@@ -857,7 +1407,7 @@ def stage1_pipeline_14(df: pd.DataFrame) -> pd.DataFrame:
         Filtered DataFrame with matching rows removed
     """
 
-    df = df.copy()
+    df = _stage_copy(df)
 
     # Pattern for -F***2:1 where *** can be any 3 characters and total length is 8
     pattern = re.compile(r'^-F.{3}2:1$')
@@ -902,7 +1452,7 @@ def stage1_pipeline_15(df: pd.DataFrame) -> pd.DataFrame:
         DataFrame with corrected Line-Function values
     """
 
-    df = df.copy()
+    df = _stage_copy(df)
 
     # Define the potential mapping
     POTENTIAL_MAP = {
@@ -923,18 +1473,14 @@ def stage1_pipeline_15(df: pd.DataFrame) -> pd.DataFrame:
     if 'Wireno' not in df.columns or 'Line-Function' not in df.columns:
         return df
 
-    # Iterate through rows and correct Line-Function values
-    for idx, row in df.iterrows():
-        wireno = str(row['Wireno']).strip()
-
-        # If this Wireno is in our mapping
-        if wireno in POTENTIAL_MAP:
-            expected_line_function = POTENTIAL_MAP[wireno]
-            current_line_function = str(row['Line-Function']).strip()
+    # Expected Line-Function per row (NaN where the Wireno is not mapped)
+    expected = df['Wireno'].astype(str).str.strip().map(POTENTIAL_MAP)
+    current = df['Line-Function'].astype(str).str.strip()
 
-            # If current value doesn't match expected value, correct it
-            if current_line_function != expected_line_function:
-                df.at[idx, 'Line-Function'] = expected_line_function
+    # Correct only mapped rows whose current value doesn't match
+    mask = expected.notna() & (current != expected)
+    if mask.any():
+        df.loc[mask, 'Line-Function'] = expected[mask]
 
     return df
 
@@ -943,32 +1489,30 @@ def stage1_pipeline_16(df: pd.DataFrame) -> pd.DataFrame:
     """
     Stage 1 Pipeline 16 – Enhanced with -X102 protection
     """
-    df = df.copy()
+    df = _stage_copy(df)
+    feats = SymbolFeatures(df, columns=("Name", "Name.1", "Wireno"))
+    symbols = ("Name", "Name.1")
     
     # 0) Force-keep any -X102:* rows
-    force_keep = df[
-        df['Name'].str.startswith('-X102:', na=False) |
-        df['Name.1'].str.startswith('-X102:', na=False)
-    ]
+    force_keep = df[feats.mask("x102", symbols)]
     
     # 1) Work on remaining rows
-    working = df.drop(force_keep.index)
+    in_working = ~df.index.isin(force_keep.index)
+    working = df[in_working]
+    feats = feats.take(in_working)
 
     # 1. Drop -Fxxx:x rows except -F9xx:x
-    pattern = re.compile(r'^-F(?!9\d{2}:\d$)(?!\d{2}8:2$)(?!8\d{2}:\d$)\d{3}:\d$')
-    mask_drop = working['Name'].str.match(pattern, na=False) | working['Name.1'].str.match(pattern, na=False)
+    pattern = r'^-F(?!9\d{2}:\d$)(?!\d{2}8:2$)(?!8\d{2}:\d$)\d{3}:\d$'
+    mask_drop = feats.mask(("match", pattern), symbols)
     working = working.loc[~mask_drop].reset_index(drop=True)
+    feats = feats.take(~mask_drop)
 
 
     # 2. Check for 230VL2/VN2 anywhere
-    has_230vl2_or_230vn2 = (
-        working['Name'].str.contains('230VL2|230VN2', na=False).any() or
-        working['Name.1'].str.contains('230VL2|230VN2', na=False).any() or
-        working['Wireno'].str.contains('230VL2|230VN2', na=False).any()
-    )
+    has_230vl2_or_230vn2 = feats.any("v2")
 
     if has_230vl2_or_230vn2:
-        mask_t901 = working['Name'].astype(str).str.startswith('-T901:') | working['Name.1'].astype(str).str.startswith('-T901:')
+        mask_t901 = feats.mask("t901", symbols)
         working = working.loc[~mask_t901].reset_index(drop=True)
 
     # 3. Only add T901 supply row if NO 230VL2/VN2 present anywhere
@@ -998,7 +1542,7 @@ def stage1_pipeline_17(df: pd.DataFrame) -> pd.DataFrame:
     For any row where Name or Name.1 appears in new_symbols,
     set 'Line-Name' to '1,5'.
     """
-    df = df.copy()
+    df = _stage_copy(df)
     new_symbols = {
         '-F903:2',   '-F903:N2',  '-F903.1:2', '-F903.1:N2', '-F904:2',  '-F904.1:N2',
         '-T901',     '-C903:10',  '-C903:11',  '-F903.2:2',  '-F903.2:1', '-F901.1:1'
@@ -1031,7 +1575,8 @@ def stage1_pipeline_18(df: pd.DataFrame) -> pd.DataFrame:
     pd.DataFrame
         DataFrame with swapped duplicates removed
     """
-    df = df.copy()
+    log = get_logger("stage1_pipeline_18")
+    df = _stage_copy(df)
     
     if len(df) == 0:
         return df
@@ -1039,67 +1584,52 @@ def stage1_pipeline_18(df: pd.DataFrame) -> pd.DataFrame:
     # Check if required columns exist
     required_cols = ['Name', 'Name.1']
     if not all(col in df.columns for col in required_cols):
-        print("⚠️ Pipeline 18: Required columns (Name, Name.1) not found")
+        log.warning("Required columns (Name, Name.1) not found")
         return df
     
-    print(f"🔄 Pipeline 18: Processing {len(df)} rows for swapped duplicates")
-    
-    # Create normalized identifier for each row
-    def create_normalized_key(row):
-        name = str(row.get('Name', '')).strip()
-        name1 = str(row.get('Name.1', '')).strip()
-        
-        # Skip rows where both names are empty or identical
-        if not name or not name1 or name == name1:
-            # Use original values to avoid false matches
-            return (name, name1, 
-                   str(row.get('Wireno', '')).strip(),
-                   str(row.get('Line-Function', '')).strip(), 
-                   str(row.get('Line-Name', '')).strip())
-        
-        # Sort names alphabetically to normalize swapped pairs
-        sorted_names = tuple(sorted([name, name1]))
-        
-        # Include other fields that must match for true duplicates
-        wireno = str(row.get('Wireno', '')).strip()
-        line_function = str(row.get('Line-Function', '')).strip()
-        line_name = str(row.get('Line-Name', '')).strip()
-        
-        return (sorted_names, wireno, line_function, line_name)
-    
-    # Apply normalization and track original indices
-    df_with_keys = df.copy()
-    df_with_keys['_temp_key'] = df.apply(create_normalized_key, axis=1)
-    df_with_keys['_original_index'] = df.index
-    
-    # Find duplicates before removal
-    duplicate_keys = df_with_keys['_temp_key'].duplicated(keep=False)
-    duplicates = df_with_keys[duplicate_keys]
+    log.debug("Processing %d rows for swapped duplicates", len(df))
     
-    if len(duplicates) > 0:
-        print(f"🔍 Pipeline 18: Found {len(duplicates)} rows with potential swapped duplicates")
-        
-        # Group by normalized key to show what's being removed
-        for key, group in duplicates.groupby('_temp_key'):
-            if len(group) > 1:
-                print(f"   📋 Duplicate group (keeping first):")
+    # Normalised key per row: the unordered (Name, Name.1) pair plus the
+    # fields that must match for a true duplicate. Rows whose names are
+    # empty or identical keep their order, so they never match a swapped
+    # pair (a real pair has two different, non-empty names).
+    def text(col):
+        if col not in df.columns:
+            return pd.Series("", index=df.index)
+        return df[col].astype(str).str.strip()
+
+    name, name1 = text('Name'), text('Name.1')
+    swappable = (name != '') & (name1 != '') & (name != name1)
+    key = _pair_key(name, name1, swappable.to_numpy(),
+                    by=[text(c) for c in ('Wireno', 'Line-Function', 'Line-Name')])
+
+    # Keep first occurrence of each normalized key
+    duplicate = pd.Series(key).duplicated(keep='first').to_numpy()
+    df_dedup = df[~duplicate]
+
+    if duplicate.any():
+        # Rows in duplicate groups: the removed ones plus the first of each group
+        dup_keys = key[duplicate]
+        log.info("Found %d rows with potential swapped duplicates",
+                 int(duplicate.sum()) + len(np.unique(dup_keys)))
+
+        # Group by normalized key to show what's being removed (DEBUG only; built lazily)
+        if log.isEnabledFor(logging.DEBUG):
+            in_group = np.isin(key, dup_keys)
+            for _, group in df[in_group].groupby(key[in_group], sort=False):
+                log.debug("Duplicate group (keeping first):")
                 for idx, row in group.iterrows():
                     status = "KEEP" if idx == group.index[0] else "REMOVE"
-                    print(f"      {status}: {row['Name']} ↔ {row['Name.1']} | {row.get('Wireno', '')} | {row.get('Line-Function', '')}")
-    
-    # Keep first occurrence of each normalized key
-    df_dedup = df_with_keys.drop_duplicates(subset=['_temp_key'], keep='first')
-    
-    # Remove temporary columns
-    df_dedup = df_dedup.drop(['_temp_key', '_original_index'], axis=1)
+                    log.debug("  %s: %s ↔ %s | %s | %s", status, row['Name'], row['Name.1'],
+                              row.get('Wireno', ''), row.get('Line-Function', ''))
     
     # Report results
     removed_count = len(df) - len(df_dedup)
+    rows_removed(removed_count)
     if removed_count > 0:
-        print(f"✅ Pipeline 18: Removed {removed_count} swapped duplicate rows")
-        print(f"📊 Pipeline 18: {len(df)} → {len(df_dedup)} rows")
+        log.info("Removed %d swapped duplicate rows (%d → %d rows)", removed_count, len(df), len(df_dedup))
     else:
-        print("✅ Pipeline 18: No swapped duplicates found")
+        log.debug("No swapped duplicates found")
     
     return df_dedup.reset_index(drop=True)
 
@@ -1126,34 +1656,31 @@ def stage1_pipeline_19(df: pd.DataFrame) -> pd.DataFrame:
         Cleaned DataFrame with appropriate modifications
     """
     
-    df = df.copy()
+    log = get_logger("stage1_pipeline_19")
+    df = _stage_copy(df)
     
     # Step 1: Check if Wireno column contains 230VN2 or 230VL2
-    has_230vn2_or_230vl2 = False
-    if 'Wireno' in df.columns:
-        has_230vn2_or_230vl2 = df['Wireno'].str.contains('230VN2|230VL2', na=False).any()
+    feats = SymbolFeatures(df, columns=("Name", "Name.1", "Wireno"))
+    symbols = ("Name", "Name.1")
+    has_230vn2_or_230vl2 = feats.any("v2", ("Wireno",))
     
-    print(f"🔍 Pipeline 19: 230VN2/230VL2 detected in Wireno: {has_230vn2_or_230vl2}")
+    log.info("230VN2/230VL2 detected in Wireno: %s", has_230vn2_or_230vl2)
     
     if has_230vn2_or_230vl2:
         # Step 2: Delete all rows that contain -T901 OR -F901.1 in Name or Name.1
         initial_count = len(df)
-        mask_t901_f901_1 = (
-            df['Name'].astype(str).str.contains('-T901|-F901\\.1', na=False, regex=True) |
-            df['Name.1'].astype(str).str.contains('-T901|-F901\\.1', na=False, regex=True)
-        )
+        mask_t901_f901_1 = feats.mask("t901_or_f901_1", symbols)
         df = df[~mask_t901_f901_1].reset_index(drop=True)
+        feats = feats.take(~mask_t901_f901_1)
         removed_rows = initial_count - len(df)
+        rows_removed(removed_rows)
         if removed_rows > 0:
-            print(f"✂️ Pipeline 19: Removed {removed_rows} rows containing -T901 or -F901.1")
+            log.info("Removed %d rows containing -T901 or -F901.1", removed_rows)
         
         # Step 3: Check if there are any -F901: values in Name or Name.1
-        has_f901 = (
-            df['Name'].astype(str).str.contains('-F901:', na=False).any() or
-            df['Name.1'].astype(str).str.contains('-F901:', na=False).any()
-        )
+        has_f901 = feats.any("f901", symbols)
         
-        print(f"🔍 Pipeline 19: -F901: values detected: {has_f901}")
+        log.info("-F901: values detected: %s", has_f901)
         
         # Step 4: If no -F901: values, create the two specific rows
         if not has_f901:
@@ -1187,7 +1714,8 @@ def stage1_pipeline_19(df: pd.DataFrame) -> pd.DataFrame:
             ]
             
             df = pd.concat([df, pd.DataFrame(new_rows)], ignore_index=True)
-            print("✅ Pipeline 19: Added 2 new -F901: rows")
+            rows_added(len(new_rows))
+            log.info("Added %d new -F901: rows", len(new_rows))
     
     # Final cleanup and sorting
     sort_columns = []
@@ -1204,7 +1732,7 @@ def stage1_pipeline_19(df: pd.DataFrame) -> pd.DataFrame:
     if 'DaisyNo' in df.columns:
         df['DaisyNo'] = df['DaisyNo'].astype(str)
     
-    print(f"📊 Pipeline 19: Final result - {len(df)} rows")
+    log.debug("Final result - %d rows", len(df))
     return df
 
 
@@ -1234,58 +1762,57 @@ def stage1_pipeline_20(df: pd.DataFrame) -> pd.DataFrame:
         Cleaned DataFrame with ensured terminal rows
     """
 
-    df = df.copy()
+    log = get_logger("stage1_pipeline_20")
+    df = _stage_copy(df)
+    rows_in = len(df)
 
     # Step 1: Remove rows where Name == Name.1
     if 'Name' in df.columns and 'Name.1' in df.columns:
         df = df[df['Name'] != df['Name.1']].reset_index(drop=True)
 
+    feats = SymbolFeatures(df, columns=("Name", "Name.1", "Wireno"))
+
     # Step 2: Detect 230VN2/VL2 in Wireno
-    has_230vn2_or_230vl2 = ('Wireno' in df.columns and
-        df['Wireno'].str.contains('230VN2|230VL2', na=False).any()
-    )
-    print(f"🔍 Pipeline 20: 230VN2/230VL2 detected: {has_230vn2_or_230vl2}")
+    has_230vn2_or_230vl2 = feats.any("v2", ("Wireno",))
+    log.info("230VN2/230VL2 detected: %s", has_230vn2_or_230vl2)
 
     # Step 3: Find target prefixes (skip those containing 230VL2)
     prefixes = ['-X923:', '-X924:', '-X927:', '-X928:']
     found = set()
     # Only include symbols ending with ':N' or ':230VN2'
+    neutral = feats.flag(("endswith", ':N')) | feats.flag(("endswith", ':230VN2'))
     for p in prefixes:
-        mask1 = (df['Name'].str.startswith(p, na=False)
-                 & (df['Name'].str.endswith(':N', na=False)
-                    | df['Name'].str.endswith(':230VN2', na=False)))
-        mask2 = (df['Name.1'].str.startswith(p, na=False)
-                 & (df['Name.1'].str.endswith(':N', na=False)
-                    | df['Name.1'].str.endswith(':230VN2', na=False)))
-        found.update(df.loc[mask1, 'Name'])
-        found.update(df.loc[mask2, 'Name.1'])
+        target = feats.flag(("startswith", p)) & neutral
+        found.update(df.loc[feats.mask(target, ('Name',)), 'Name'])
+        found.update(df.loc[feats.mask(target, ('Name.1',)), 'Name.1'])
     found = [v for v in found if isinstance(v, str) and v]
     if not found:
         # Deduplicate and return early
         if {'Name','Name.1'}.issubset(df.columns):
-            df = df.drop_duplicates(['Name','Name.1'], keep='first').reset_index(drop=True)
+            df = _drop_duplicate_pairs(df).reset_index(drop=True)
+        rows_removed(rows_in - len(df))
         return df
 
-    print(f"🔍 Pipeline 20: Valid X-values: {sorted(found)}")
+    log.info("Valid X-values: %s", sorted(found))
 
     # Step 4: Create missing terminal rows
     suffix = '230VN2' if has_230vn2_or_230vl2 else 'N'
     terminal = f'-X0100:{suffix}'
-    print(f"🔧 Pipeline 20: Using terminal {terminal}")
+    log.info("Using terminal %s", terminal)
 
     base_cols = list(df.columns)
     for c in ['Name','Name.1','Wireno','Line-Name','Line-Function','DaisyNo']:
         if c not in base_cols: base_cols.append(c)
 
-    existing = set()
-    for _,r in df.iterrows():
-        n,n1 = str(r['Name']).strip(), str(r['Name.1']).strip()
-        if n==terminal and n1 in found: existing.add(n1)
-        if n1==terminal and n in found: existing.add(n)
+    names = df['Name'].astype(str).str.strip()
+    names1 = df['Name.1'].astype(str).str.strip()
+    existing = set(names1[(names == terminal) & names1.isin(found)])
+    existing.update(names[(names1 == terminal) & names.isin(found)])
 
     missing = [x for x in found if x not in existing]
+    removed = rows_in - len(df)
     if missing:
-        print(f"🔧 Creating {len(missing)} missing terminal rows")
+        log.info("Creating %d missing terminal rows", len(missing))
         new_rows = []
         for x in missing:
             sample = df[(df['Name']==x)|(df['Name.1']==x)].iloc[0]
@@ -1299,16 +1826,19 @@ def stage1_pipeline_20(df: pd.DataFrame) -> pd.DataFrame:
                 'DaisyNo': sample.get('DaisyNo','0')
             })
             new_rows.append(row)
-            print(f"  ✅ {x} → {terminal}")
+            log.debug("  %s → %s", x, terminal)
         df = pd.concat([df, pd.DataFrame(new_rows)], ignore_index=True)
+        rows_added(len(new_rows))
     else:
-        print("✅ Pipeline 20: All terminal rows already exist")
+        log.debug("All terminal rows already exist")
 
     # Step 5: Remove duplicate Name/Name.1 rows
     if {'Name','Name.1'}.issubset(df.columns):
         before = len(df)
-        df = df.drop_duplicates(subset=['Name','Name.1'], keep='first').reset_index(drop=True)
-        print(f"✂️ Removed {before-len(df)} duplicate Name/Name.1 rows")
+        df = _drop_duplicate_pairs(df).reset_index(drop=True)
+        removed += before - len(df)
+        if before > len(df):
+            log.info("Removed %d duplicate Name/Name.1 rows", before - len(df))
 
     # Step 6: Remove explicit unwanted pairs
     delete_pairs = {
@@ -1325,11 +1855,9 @@ def stage1_pipeline_20(df: pd.DataFrame) -> pd.DataFrame:
         ("-X928:230VN2","-X928:230VN2"),("-X923:230VN2","-X928:230VN2"),
         ("-X924:230VN2","-X928:230VN2"),("-X927:230VN2","-X928:230VN2")
     }
-    for idx in reversed(df.index):
-        pair = (df.at[idx,"Name"], df.at[idx,"Name.1"])
-        if pair in delete_pairs:
-            df.drop(idx, inplace=True)
-    df.reset_index(drop=True, inplace=True)
+    before = len(df)
+    df = df[~_pair_mask(df["Name"], df["Name.1"], delete_pairs)].reset_index(drop=True)
+    rows_removed(removed + before - len(df))
 
     # Final cleanup & sorting
     sort_cols = [c for c in ['Wireno','DaisyNo','Line-Name'] if c in df.columns]
@@ -1338,7 +1866,7 @@ def stage1_pipeline_20(df: pd.DataFrame) -> pd.DataFrame:
     if 'DaisyNo' in df.columns:
         df['DaisyNo'] = df['DaisyNo'].astype(str)
 
-    print(f"📊 Pipeline 20 final rows: {len(df)}")
+    log.debug("Final rows: %d", len(df))
     return df
 
 def stage1_pipeline_21(df: pd.DataFrame) -> pd.DataFrame:
@@ -1357,7 +1885,7 @@ def stage1_pipeline_21(df: pd.DataFrame) -> pd.DataFrame:
     WIRENOS = {"0VDC", "24VDC", "24VDC1", "24VDC2", "230VL", "230VN"}
     SPECIAL_TERMS = {"-F901.1:1", "-T901:115 V"}
 
-    df = df.copy()
+    df = _stage_copy(df)
 
     # Ensure required columns exist
     if "Wireno" not in df.columns or "Line-Name" not in df.columns:
@@ -1405,38 +1933,35 @@ def stage1_pipeline_22(df: pd.DataFrame) -> pd.DataFrame:
     Only considers M_PREFS and X_PREFS entries that end with ':N'.
     Special case: when has_k924 is True, map '-M925:N' to '-X924:N'.
     """
-    df = df.copy()
+    df = _stage_copy(df)
+    feats = SymbolFeatures(df, columns=("Name", "Name.1", "Wireno"))
+    symbols = ('Name', 'Name.1')
     # Flags
-    has_k924 = df[['Name', 'Name.1']].apply(lambda col: col.str.startswith('-K924', na=False)).any().any()
-    has_vnl2 = df['Wireno'].astype(str).str.contains('230VN2|230VL2', na=False).any()
+    has_k924 = feats.any("k924", symbols)
+    has_vnl2 = feats.any("v2", ('Wireno',))
 
     # Prefix lists
     M_PREFS = ['-M923:', '-M924:', '-M925:']
     X_PREFS = ['-X923:', '-X924:', '-X927:', '-X928:']
 
     # Gather matching symbols that end with ':N'
-    m_syms = {
-        val for col in ['Name', 'Name.1']
-        for val in df[col].astype(str)
-        for p in M_PREFS
-        if val.startswith(p) and val.endswith(':N')
-    }
-    x_syms = {
-        val for col in ['Name', 'Name.1']
-        for val in df[col].astype(str)
-        for p in X_PREFS
-        if val.startswith(p) and val.endswith(':N')
-    }
-
-    # Remove ventilator rows
+    ends_n = feats.flag(("endswith", ':N'))
+    def prefixed(prefs):
+        hit = np.zeros_like(ends_n)
+        for p in prefs:
+            hit |= feats.flag(("startswith", p))
+        return feats.values(hit & ends_n, symbols)
+    m_syms = prefixed(M_PREFS)
+    x_syms = prefixed(X_PREFS)
+
+    # Remove ventilator rows: a Name / Name.1 starting with one of the
+    # symbols, and a Name / Name.1 ending with the neutral suffix
     suffix = '230VN2' if has_vnl2 else 'N'
-    def to_remove(row):
-        for sym in m_syms | x_syms:
-            if (row['Name'].startswith(sym) or row['Name.1'].startswith(sym)) and (
-               row['Name'].endswith(suffix) or row['Name.1'].endswith(suffix)):
-                return True
-        return False
-    df_filtered = df.loc[~df.apply(to_remove, axis=1)].reset_index(drop=True)
+    starts = np.zeros_like(ends_n)
+    for sym in m_syms | x_syms:
+        starts |= feats.flag(("startswith", sym))
+    to_remove = feats.mask(starts, symbols) & feats.mask(("endswith", suffix), symbols)
+    df_filtered = df.loc[~to_remove].reset_index(drop=True)
 
     # Build new VENTS rows
     target_wireno = '230VN2' if has_vnl2 else 'F903/N'
@@ -1486,22 +2011,16 @@ def stage1_pipeline_23(df: pd.DataFrame) -> pd.DataFrame:
     2. For each such pair, delete any row where Name and Name.1 match the pair
        but Name.1 does NOT contain '_MAIN'.
     """
-    df = df.copy()
+    df = _stage_copy(df)
     # 1. Collect pairs from rows with '_MAIN' in Name.1
-    main_pairs = {
-        (row['Name'], row['Name.1'].replace('_MAIN', '', 1))
-        for _, row in df.iterrows()
-        if isinstance(row.get('Name.1'), str) and '_MAIN' in row['Name.1']
-    }
-    # 2. Filter out non-_MAIN duplicates
-    def keep_row(row):
-        for name, base_name1 in main_pairs:
-            if row['Name'] == name and row['Name.1'] == base_name1:
-                # drop this non-MAIN duplicate
-                return False
-        return True
-
-    return df[df.apply(keep_row, axis=1)].reset_index(drop=True)
+    is_main = df['Name.1'].str.contains('_MAIN', regex=False, na=False)
+    main_pairs = set(zip(
+        df.loc[is_main, 'Name'],
+        df.loc[is_main, 'Name.1'].str.replace('_MAIN', '', n=1, regex=False)
+    ))
+    # 2. Filter out non-_MAIN duplicates in one pass
+    drop = _pair_mask(df['Name'], df['Name.1'], main_pairs)
+    return df[~drop].reset_index(drop=True)
 
 def stage1_pipeline_24(df):
     """
@@ -1524,13 +2043,14 @@ def stage1_pipeline_24(df):
     """
     import pandas as pd
     
-    df = df.copy()
+    log = get_logger("stage1_pipeline_24")
+    df = _stage_copy(df)
     
-    print(f"🔧 Pipeline 24: Processing {len(df)} rows for DOOR duplicates")
+    log.debug("Processing %d rows for DOOR duplicates", len(df))
     
     # Check if required columns exist
     if 'DaisyNo' not in df.columns or 'Wireno' not in df.columns:
-        print("⚠️ Pipeline 24: Required columns (DaisyNo, Wireno) not found")
+        log.warning("Required columns (DaisyNo, Wireno) not found")
         return df
     
     # Step 1: Identify rows with DOOR DaisyNo (case insensitive)
@@ -1539,59 +2059,34 @@ def stage1_pipeline_24(df):
     non_door_rows = df[~door_mask]
     
     if door_rows.empty:
-        print("✅ Pipeline 24: No DOOR rows found, no changes needed")
+        log.debug("No DOOR rows found, no changes needed")
         return df
     
-    print(f"🔍 Pipeline 24: Found {len(door_rows)} DOOR rows")
-    
-    # Step 2: Process DOOR rows to keep only first occurrence of 0VDC and 230VN
-    processed_door_rows = []
-    seen_0vdc = False
-    seen_230vn = False
-    removed_count = 0
-    
-    for idx, row in door_rows.iterrows():
-        wireno = str(row['Wireno']).strip()
-        
-        # Check for 0VDC
-        if wireno == '0VDC':
-            if not seen_0vdc:
-                seen_0vdc = True
-                processed_door_rows.append(row)
-                print(f"✅ Pipeline 24: Keeping first 0VDC DOOR row (index {idx})")
-            else:
-                removed_count += 1
-                print(f"🗑️ Pipeline 24: Removing duplicate 0VDC DOOR row (index {idx})")
-                continue
-        
-        # Check for 230VN
-        elif wireno == '230VN':
-            if not seen_230vn:
-                seen_230vn = True
-                processed_door_rows.append(row)
-                print(f"✅ Pipeline 24: Keeping first 230VN DOOR row (index {idx})")
-            else:
-                removed_count += 1
-                print(f"🗑️ Pipeline 24: Removing duplicate 230VN DOOR row (index {idx})")
-                continue
-        
-        # Keep all other DOOR rows
-        else:
-            processed_door_rows.append(row)
+    log.info("Found %d DOOR rows", len(door_rows))
     
+    # Step 2: Keep only the first DOOR occurrence of 0VDC and of 230VN
+    wireno = door_rows['Wireno'].astype(str).str.strip()
+    drop = pd.Series(False, index=door_rows.index)
+    for target in ('0VDC', '230VN'):
+        hits = wireno.index[wireno == target]
+        if len(hits) == 0:
+            continue
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Keeping first %s DOOR row (index %s)", target, hits[0])
+            for idx in hits[1:]:
+                log.debug("Removing duplicate %s DOOR row (index %s)", target, idx)
+        drop.loc[hits[1:]] = True
+    removed_count = int(drop.sum())
+
     # Step 3: Combine processed DOOR rows with non-DOOR rows
-    if processed_door_rows:
-        processed_door_df = pd.DataFrame(processed_door_rows)
-        result_df = pd.concat([non_door_rows, processed_door_df], ignore_index=True)
-    else:
-        result_df = non_door_rows.copy()
+    result_df = pd.concat([non_door_rows, door_rows[~drop]], ignore_index=True)
     
     # Report results
+    rows_removed(removed_count)
     if removed_count > 0:
-        print(f"✂️ Pipeline 24: Removed {removed_count} duplicate DOOR rows")
-        print(f"📊 Pipeline 24: {len(df)} → {len(result_df)} rows")
+        log.info("Removed %d duplicate DOOR rows (%d → %d rows)", removed_count, len(df), len(result_df))
     else:
-        print("✅ Pipeline 24: No duplicate DOOR rows to remove")
+        log.debug("No duplicate DOOR rows to remove")
     
     return result_df.reset_index(drop=True)
 
@@ -1611,17 +2106,15 @@ def stage1_pipeline_25(df: pd.DataFrame) -> pd.DataFrame:
     8. Add T901 PE rows if T901 exists
     9. Always add X921:PE row if not exists
     """
-    df = df.copy()
+    df = _stage_copy(df)
 
-    # Collect all symbols from Name and Name.1
-    all_symbols = set()
-    for col in ('Name', 'Name.1'):
-        if col in df.columns:
-            all_symbols.update(df[col].astype(str).dropna().tolist())
-    all_symbols = {s for s in all_symbols if s and s != 'nan' and s.strip()}
+    # Index all symbols from Name and Name.1
+    feats = SymbolFeatures(df)
+    def seen(marker):
+        return feats.any(("contains", marker))
 
     # 1) has_carel flag
-    has_carel = any(':' in s and 'J' in s.split(':', 1)[1] for s in all_symbols)
+    has_carel = feats.any("carel_j")
 
     # Prepare base columns
     base_cols = list(df.columns)
@@ -1644,7 +2137,7 @@ def stage1_pipeline_25(df: pd.DataFrame) -> pd.DataFrame:
         })
 
     # 3) K5511 row if no carel
-    if not has_carel and any('-K5511:' in s for s in all_symbols):
+    if not has_carel and seen('-K5511:'):
         new_rows.append({
             'Name':'-K5511:PE','Name.1':'-XPE:PE','Wireno':'PE',
             'Line-Name':'0,75','Line-Function':'GNYE','DaisyNo':'CONTROL'
@@ -1653,15 +2146,15 @@ def stage1_pipeline_25(df: pd.DataFrame) -> pd.DataFrame:
     # 4) Transformer rows (only if has_carel)
     if has_carel:
         for t in ('-T1011','-T2011','-T3011','-T4011','-T5011','-T5511','-T5711'):
-            if any(t in s for s in all_symbols):
+            if seen(t):
                 new_rows.append({
                     'Name':f'{t}:-','Name.1':'-XPE:PE','Wireno':'PE',
                     'Line-Name':'0,75','Line-Function':'GNYE','DaisyNo':'CONTROL'
                 })
 
     # 5) Motor rows
-    has_k924 = any('-K924' in s for s in all_symbols)
-    motors = [m for m in ('-M923','-M924','-M925') if any(m in s for s in all_symbols)]
+    has_k924 = seen('-K924')
+    motors = [m for m in ('-M923','-M924','-M925') if seen(m)]
     if motors:
         if has_k924:
             if '-M925' in motors:
@@ -1703,32 +2196,31 @@ def stage1_pipeline_25(df: pd.DataFrame) -> pd.DataFrame:
                              'Line-Name':'1,5','Line-Function':'GNYE','DaisyNo':'POWER'})
 
     # 6) Capacitor rows
-    if any('-C903:' in s for s in all_symbols):
+    if seen('-C903:'):
         for c in ('-C903:11','-C903:1'):
             new_rows.append({'Name':c,'Name.1':'-XPE:PE','Wireno':'PE',
                              'Line-Name':'1,5','Line-Function':'GNYE','DaisyNo':'CONTROL'})
-    if any('-C90A1:' in s for s in all_symbols):
+    if seen('-C90A1:'):
         for c in ('-C90A1:PE','-C90A1:-'):
             new_rows.append({'Name':c,'Name.1':'-XPE:PE','Wireno':'PE',
                              'Line-Name':'1,5','Line-Function':'GNYE','DaisyNo':'CONTROL'})
 
     # 7) T8x:S2 rows
-    t8_matches = [s for s in all_symbols if re.match(r'-T8.*:S2', s)]
-    if t8_matches:
+    if feats.any("t8x_s2"):
         for t in ('-T81:S2','-T81.1:S2','-T81.2:S2'):
             new_rows.append({'Name':t,'Name.1':'-XPE:PE','Wireno':'PE',
                              'Line-Name':'2,5','Line-Function':'GNYE','DaisyNo':'POWER'})
 
     # 8) T901 rows
-    if any('-T901:' in s for s in all_symbols):
+    if seen('-T901:'):
         for t in ('-T901:PE','-T901:0 V'):
             new_rows.append({'Name':t,'Name.1':'-XPE:PE','Wireno':'PE',
                              'Line-Name':'1,5','Line-Function':'GNYE','DaisyNo':'CONTROL'})
 
     # 9) Always add X921:PE if missing
-    exists = any(
-        (r.get('Name')=='-X921:PE' and r.get('Name.1')=='-XPE:PE')
-        for _,r in df.iterrows()
+    exists = (
+        {'Name', 'Name.1'}.issubset(df.columns)
+        and ((df['Name'] == '-X921:PE') & (df['Name.1'] == '-XPE:PE')).any()
     )
     if not exists:
         new_rows.append({'Name':'-X921:PE','Name.1':'-XPE:PE','Wireno':'PE',
@@ -1737,7 +2229,7 @@ def stage1_pipeline_25(df: pd.DataFrame) -> pd.DataFrame:
     # 10) X927/X928 PE rows - NEW ADDITION
     x_terminals = ['-X927', '-X928']
     for x_term in x_terminals:
-        if any(x_term in s for s in all_symbols):
+        if seen(x_term):
             new_rows.append({
                 'Name':f'{x_term}:PE','Name.1':'-XPE:PE','Wireno':'PE',
                 'Line-Name':'1,5','Line-Function':'GNYE','DaisyNo':'POWER'
@@ -1754,6 +2246,46 @@ def stage1_pipeline_25(df: pd.DataFrame) -> pd.DataFrame:
         return df.reset_index(drop=True)
 
 
+# Everything after the second colon of a pin ("a:b:c" → "c"); no match below two colons
+SECOND_COLON_TAIL = re.compile(r"^[^:]*:[^:]*:(.*)", re.S)
+
+# Wire-end terminals whose N / L3 / PE pins always get a Ferrule (stage2_pipeline_4)
+FERRULE_TERMINALS = ('-M923', '-M924', '-M925', '-X923', '-X924', '-X927', '-X928', '-XPE')
+FERRULE_PINS = (':N', ':L3', ':PE')
+
+
+def _changed_cells(before: pd.Series, after: pd.Series) -> int:
+    """Number of cells that differ between two aligned Series (missing on both sides is equal)."""
+    if before is after:
+        return 0
+    old, new = before.to_numpy(dtype=object), after.to_numpy(dtype=object)
+    return int(((old != new) & ~(pd.isna(old) & pd.isna(new))).sum())
+
+
+def _map_distinct(series: pd.Series, func) -> pd.Series:
+    """Apply a vectorised Series → Series func once per distinct value; missing cells are kept."""
+    codes, uniques = pd.factorize(series)
+    if len(uniques) == 0:
+        return series
+    mapped = func(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+    values = np.where(codes >= 0, mapped[codes], series.to_numpy(dtype=object))
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def _strip_until_second_colon(pins: pd.Series) -> pd.Series:
+    """":" + everything after the second colon for pins with two or more colons; others unchanged."""
+    tail = pins.str.extract(SECOND_COLON_TAIL, expand=False)
+    return pins.where(tail.isna(), ":" + tail)
+
+
+def _below_min_length(val) -> bool:
+    """Whether a 'Länge in mm' cell is a number (decimal comma allowed) under 270."""
+    try:
+        return float(str(val).replace(",", ".")) < 270
+    except Exception:
+        return False
+
+
 def stage2_pipeline_1(uploaded_file) -> pd.DataFrame:
     """
     Stage-2 Pipeline 1 (KOMAX CSV) with conditional space removal:
@@ -1761,52 +2293,19 @@ def stage2_pipeline_1(uploaded_file) -> pd.DataFrame:
         - Otherwise, preserve internal spaces
     """
     # 1. Load CSV with auto-detected delimiter and encoding
-    uploaded_file.seek(0)
-    sample = uploaded_file.read(8192).decode("utf-8", errors="replace")
-    uploaded_file.seek(0)
-    try:
-        dialect = csv.Sniffer().sniff(sample, delimiters=[",", ";", "\t", "|"])
-        sep = dialect.delimiter
-    except csv.Error:
-        sep = ","
-    df = None
-    for enc in ("utf-8", "latin1", "cp1252"):
-        uploaded_file.seek(0)
-        try:
-            df = pd.read_csv(
-                uploaded_file,
-                sep=sep,
-                engine="python",
-                dtype=str,
-                encoding=enc,
-                keep_default_na=False
-            )
-            break
-        except UnicodeDecodeError:
-            continue
-    if df is None:
-        raise ValueError("Unable to read CSV with utf-8 / latin1 / cp1252.")
-
     # 2. Split on delimiter if only one wide column (common in Excel export)
-    if df.shape[1] == 1:
-        first = df.columns[0]
-        df = (
-            df[first]
-            .str.split(sep, expand=True)
-            .applymap(lambda x: x.strip() if isinstance(x, str) else x)
-        )
+    df = read_komax_csv(uploaded_file)
+    count("rows_read", len(df))
 
     cols = df.columns.tolist()
 
     # 3. Clean PINs (columns 3 and 10): if >1 colon, keep everything from second colon onward
-    def strip_until_second_colon(val: str):
-        if not isinstance(val, str): return val
-        parts = val.split(":")
-        return ":" + ":".join(parts[2:]) if len(parts) > 2 else val
-
+    changed = {}
     for idx in (3, 10):
         if idx < len(cols):
-            df[cols[idx]] = df[cols[idx]].apply(strip_until_second_colon)
+            pin = df[cols[idx]]
+            df[cols[idx]] = _map_distinct(pin, _strip_until_second_colon)
+            changed["pins"] = changed.get("pins", 0) + _changed_cells(pin, df[cols[idx]])
 
     # -------- CONDITIONAL SPACE REMOVAL ONLY ON -K ROWS ------
     # Mask for rows with -K in Betriebsmittelkennzeichen or Betriebsmittelkennzeichen.1
@@ -1821,28 +2320,40 @@ def stage2_pipeline_1(uploaded_file) -> pd.DataFrame:
         for pin_col in pin_cols:
             if pin_col:
                 # Remove all spaces for those rows in Pin/Pin.1 only
+                before = df[pin_col].copy()
                 df.loc[mask_k, pin_col] = df.loc[mask_k, pin_col].str.replace(" ", "", regex=False)
+                changed["-K spaces"] = changed.get("-K spaces", 0) + _changed_cells(before, df[pin_col])
     # Leave all other rows untouched (including cases with spaces in pin names)
 
     # 4. Enforce minimum length in column 17 ('Länge in mm'): min 270
     if 17 < len(cols):
         col_r = cols[17]
-        def enforce_min(val):
-            try:
-                num = float(str(val).replace(",", "."))
-                return "270" if num < 270 else str(val)
-            except Exception:
-                return val
-        df[col_r] = df[col_r].apply(enforce_min)
+        length = df[col_r]
+        # float() semantics (spaces, "1e3", "nan", ...) decided once per distinct value
+        short = [v for v in pd.unique(length) if _below_min_length(v)]
+        df[col_r] = length.mask(length.isin(short), "270")
+        changed["min length"] = _changed_cells(length, df[col_r])
 
     # 5. Replace single space " " cells with empty string
-    df.replace(to_replace="^ $", value="", regex=True, inplace=True)
+    blanks = 0
+    for col in df.columns:
+        before = df[col]
+        after = BLANK_CELL_SCRUBBER.apply(before)
+        if after is not before:
+            df[col] = after
+            blanks += _changed_cells(before, after)
+    changed["blank cells"] = blanks
+    for rule, n in changed.items():
+        count(f"cells changed ({rule})", n)
+    get_logger("stage2_pipeline_1").info("Cells changed - %s", ", ".join(f"{rule}: {n}" for rule, n in changed.items()))
 
     # 6. Drop duplicate rows based on columns C-D-J-K (indices 2-3-9-10)
     indices_needed = [2, 3, 9, 10]
     subset_cols = [cols[i] for i in indices_needed if i < len(cols)]
     if subset_cols:
+        before = len(df)
         df = df.drop_duplicates(subset=subset_cols, keep="first").reset_index(drop=True)
+        rows_removed(before - len(df))
 
     return df
 
@@ -1861,7 +2372,7 @@ def stage2_pipeline_2(df: pd.DataFrame) -> pd.DataFrame:
     - Special override: 'common' -> 'common_ferrule' for specific component types
     """
     
-    df = df.copy()
+    df = _stage_copy(df)
     
     # Get column names by index (more reliable than assuming names)
     cols = df.columns.tolist()
@@ -1876,127 +2387,38 @@ def stage2_pipeline_2(df: pd.DataFrame) -> pd.DataFrame:
     col_L = cols[13]  # Hülse.1 (ferrule marking)
     
     # Create composite identifiers like "symbol+pin"
-    df['Left_ID'] = df[col_C].astype(str) + df[col_D].astype(str)
-    df['Right_ID'] = df[col_J].astype(str) + df[col_K].astype(str)
-    
-    # Build connection map (similar to stage1_pipeline_8 logic)
-    value_to_rows = defaultdict(set)
-    
-    for idx, row in df.iterrows():
-        left_id = str(row['Left_ID']).strip()
-        right_id = str(row['Right_ID']).strip()
-        
-        if left_id and left_id != 'nan' and left_id != '':
-            value_to_rows[left_id].add(idx)
-        if right_id and right_id != 'nan' and right_id != '':
-            value_to_rows[right_id].add(idx)
-    
-    # Union-Find to group connected components
-    parent = {}
-    
-    def find(x):
-        if x not in parent:
-            parent[x] = x
-        if parent[x] != x:
-            parent[x] = find(parent[x])
-        return parent[x]
-    
-    def union(x, y):
-        px, py = find(x), find(y)
-        if px != py:
-            parent[px] = py
-    
-    # Initialize
-    for idx in df.index:
-        parent[idx] = idx
-    
-    # Group rows that share common identifiers
-    for value, row_indices in value_to_rows.items():
-        if len(row_indices) > 1:
-            row_list = list(row_indices)
-            for i in range(1, len(row_list)):
-                union(row_list[0], row_list[i])
-    
-    # Find groups
-    groups = defaultdict(list)
-    for idx in df.index:
-        root = find(idx)
-        groups[root].append(idx)
-    
-    # Mark ferrule/common for each group
-    for root, row_indices in groups.items():
-        if len(row_indices) > 1:  # Only process daisy chains (multiple connections)
-            # Sort by row index to maintain order
-            row_indices.sort()
-            
-            # Count how many times each component appears in the chain
-            component_count = defaultdict(int)
-            for idx in row_indices:
-                left_id = str(df.at[idx, 'Left_ID']).strip()
-                right_id = str(df.at[idx, 'Right_ID']).strip()
-                if left_id and left_id != 'nan':
-                    component_count[left_id] += 1
-                if right_id and right_id != 'nan':
-                    component_count[right_id] += 1
-            
-            # Identify true endpoints (appear only once)
-            endpoints = {comp for comp, count in component_count.items() if count == 1}
-            
-            # Mark each row based on whether its components are endpoints
-            for idx in row_indices:
-                left_id = str(df.at[idx, 'Left_ID']).strip()
-                right_id = str(df.at[idx, 'Right_ID']).strip()
-                
-                # Left side (column E)
-                if left_id in endpoints:
-                    df.at[idx, col_E] = 'Ferrule'
-                else:
-                    df.at[idx, col_E] = 'common'
-                
-                # Right side (column L)  
-                if right_id in endpoints:
-                    df.at[idx, col_L] = 'Ferrule'
-                else:
-                    df.at[idx, col_L] = 'common'
-    
-    # Helper function to check special component patterns
-    def should_be_common_ferrule(component_str):
-        """Check if component should be marked as common_ferrule"""
-        if not isinstance(component_str, str):
-            return False
-        
-        component_str = component_str.strip()
-        
-        # Check prefixes
-        if component_str.startswith(('-S', '-P', '-Q', '-X010')) and not component_str.startswith('-Q81'):
-            return True
-            
-        # Check exact matches
-        if component_str in ('-X923:N', '-X924:N', '-X927:N', '-X928:N'):
-            return True
-            
-        return False
-    
+    left_id = (df[col_C].astype(str) + df[col_D].astype(str)).str.strip()
+    right_id = (df[col_J].astype(str) + df[col_K].astype(str)).str.strip()
+
+    # Group rows that share an identifier (same kernel as stage1_pipeline_8)
+    comps = connected_components(
+        left_id, right_id,
+        left_valid=(left_id != '') & (left_id != 'nan'),
+        right_valid=(right_id != '') & (right_id != 'nan'),
+    )
+
+    # Inside daisy chains, true endpoints (identifier seen only once) get
+    # 'Ferrule', middle connections get 'common'
+    chained = comps.sizes > 1
+    if chained.any():
+        df.loc[chained, col_E] = np.where(comps.left_endpoint[chained], 'Ferrule', 'common')
+        df.loc[chained, col_L] = np.where(comps.right_endpoint[chained], 'Ferrule', 'common')
+
     # Apply special override rules for common -> common_ferrule
-    for idx in df.index:
-        # Check column E (Left side - columns C+D)
-        if df.at[idx, col_E] == 'common':
-            left_component = str(df.at[idx, col_C]).strip()
-            if should_be_common_ferrule(left_component):
-                df.at[idx, col_E] = 'common_ferrule'
-        
-        # Check column L (Right side - columns J+K) 
-        if df.at[idx, col_L] == 'common':
-            right_component = str(df.at[idx, col_J]).strip()
-            if should_be_common_ferrule(right_component):
-                df.at[idx, col_L] = 'common_ferrule'
-    
-    # Clean up temporary columns
-    df = df.drop(['Left_ID', 'Right_ID'], axis=1)
-    
+    # (column E by component C, column L by component J)
+    df.loc[(df[col_E] == 'common') & _is_common_ferrule(df[col_C]), col_E] = 'common_ferrule'
+    df.loc[(df[col_L] == 'common') & _is_common_ferrule(df[col_J]), col_L] = 'common_ferrule'
+
     return df
 
 
+def _is_common_ferrule(components: pd.Series) -> pd.Series:
+    """Components whose shared ('common') connections need a ferrule."""
+    comp = components.astype(str).str.strip()
+    by_prefix = comp.str.startswith(('-S', '-P', '-Q', '-X010')) & ~comp.str.startswith('-Q81')
+    return by_prefix | comp.isin(['-X923:N', '-X924:N', '-X927:N', '-X928:N'])
+
+
 def stage2_pipeline_4(df):
     """
     Stage 2 Pipeline 4 - Overwrite with 'Ferrule' based on specific conditions
@@ -2027,14 +2449,15 @@ def stage2_pipeline_4(df):
         DataFrame with Ferrule values updated according to the rules
     """
     
-    df = df.copy()
+    log = get_logger("stage2_pipeline_4")
+    df = _stage_copy(df)
     
     # Get column list
     cols = df.columns.tolist()
     
     # Check if we have enough columns
     if len(cols) < 14:
-        print(f"⚠️ Pipeline 4: Not enough columns (need at least 14, got {len(cols)})")
+        log.warning("Not enough columns (need at least 14, got %d)", len(cols))
         return df
     
     # Define column indices based on the KOMAX Excel structure
@@ -2053,41 +2476,134 @@ def stage2_pipeline_4(df):
     col_K = cols[col_K_idx]
     col_N = cols[col_N_idx]
     
-    # Target prefixes that trigger the transformation
-    target_prefixes = ['-M923', '-M924', '-M925', '-X923', '-X924', '-X927', '-X928', '-XPE']
-    
-    print(f"🔧 Pipeline 4: Processing {len(df)} rows for Ferrule updates")
-    
-    # Counters for reporting
-    updates_G = 0
-    updates_N = 0
-    
-    # Process each row
-    # define the suffixes you want to catch
-    suffixes = {':N', ':L3', ':PE'}
-    for idx, row in df.iterrows():
-        # Rule 1: Check column C and D for updating column G
-        col_C_val = str(row[col_C]).strip() if pd.notna(row[col_C]) else ''
-        col_D_val = str(row[col_D]).strip() if pd.notna(row[col_D]) else ''
-        
-        if col_C_val in target_prefixes and col_D_val in suffixes:
-            df.at[idx, col_G] = 'Ferrule'
-            updates_G += 1
-        
-        # Rule 2: Check column J and K for updating column N  
-        col_J_val = str(row[col_J]).strip() if pd.notna(row[col_J]) else ''
-        col_K_val = str(row[col_K]).strip() if pd.notna(row[col_K]) else ''
-        
-        if col_J_val in target_prefixes and col_K_val in suffixes:
-            df.at[idx, col_N] = 'Ferrule'
-            updates_N += 1
-    
+    log.debug("Processing %d rows for Ferrule updates", len(df))
+
+    def _clean(col):
+        values = df[col]
+        return values.where(values.notna(), "").astype(str).str.strip()
+
+    # Rule 1: column C in FERRULE_TERMINALS and column D in FERRULE_PINS → column G
+    # Rule 2: column J in FERRULE_TERMINALS and column K in FERRULE_PINS → column N
+    updates = {}
+    for name_col, pin_col, target in ((col_C, col_D, col_G), (col_J, col_K, col_N)):
+        hit = _clean(name_col).isin(FERRULE_TERMINALS) & _clean(pin_col).isin(FERRULE_PINS)
+        before = df[target].copy()
+        df.loc[hit, target] = 'Ferrule'
+        updates[target] = (int(hit.sum()), _changed_cells(before, df[target]))
+    (updates_G, changed_G), (updates_N, changed_N) = updates[col_G], updates[col_N]
+
     # Report results
     total_updates = updates_G + updates_N
+    count("Ferrule G", updates_G)
+    count("Ferrule N", updates_N)
+    count("cells changed", changed_G + changed_N)
     if total_updates > 0:
-        print(f"✅ Pipeline 4: Updated {updates_G} G columns and {updates_N} N columns to 'Ferrule'")
-        print(f"📊 Pipeline 4: Total {total_updates} transformations applied")
+        log.info("Updated %d G columns and %d N columns to 'Ferrule' (%d cells changed)",
+                 updates_G, updates_N, changed_G + changed_N)
     else:
-        print("✅ Pipeline 4: No matching conditions found, no updates made")
+        log.debug("No matching conditions found, no updates made")
     
     return df
+
+
+# ------------------------------------------------------------
+# Pipeline registries – the one ordered list of stages that the
+# UI and batch runs resolve from
+# ------------------------------------------------------------
+def _stage1_pipeline_1_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """stage1_pipeline_1 without the removed-duplicates counter."""
+    df, _ = stage1_pipeline_1(df)
+    return df
+
+
+STAGE1_PIPELINES = PipelineRegistry("stage1", [
+    PipelineStage("stage1_pipeline_1", _stage1_pipeline_1_frame,
+                  description="Merge Carel J labels into Name/Name.1, drop label columns and duplicates"),
+    PipelineStage("stage1_pipeline_2", stage1_pipeline_2,
+                  description="Drop cable/power functions and rows mentioning PE"),
+    PipelineStage("stage1_pipeline_3", stage1_pipeline_3,
+                  description="Normalise colour, voltage and cross-section tokens"),
+    PipelineStage("stage1_pipeline_4", stage1_pipeline_4, description="Drop BK/LBL -F6xx fuse rows"),
+    PipelineStage("stage1_pipeline_5", stage1_pipeline_5, description="Resolve -R relay chains"),
+    PipelineStage("stage1_pipeline_6", stage1_pipeline_6, description="Drop -K coil rows (:A … :F)"),
+    PipelineStage("stage1_pipeline_7", stage1_pipeline_7, description="Propagate Wireno by symbol"),
+    PipelineStage("stage1_pipeline_7_1", stage1_pipeline_7_1,
+                  description="Add -X0100:N ventilator rows, drop N pairs, propagate Wireno"),
+    PipelineStage("stage1_pipeline_8", stage1_pipeline_8, description="Number connected daisy chains"),
+    PipelineStage("stage1_pipeline_9", stage1_pipeline_9,
+                  description="Assign Line-Name/Line-Function, drop non-battery 2,5 rows"),
+    PipelineStage("stage1_pipeline_10", stage1_pipeline_10, params=("group_symbols",),
+                  description="Build terminal and daisy-chain rows per group"),
+    PipelineStage("stage1_pipeline_11", stage1_pipeline_11,
+                  description="Back-fill Line-Name/Line-Function by exact symbol"),
+    PipelineStage("stage1_pipeline_12", stage1_pipeline_12, description="Scrub error cells, stringify for editing"),
+    PipelineStage("stage1_pipeline_14", stage1_pipeline_14, description="Drop -F***2:1 POWER rows"),
+    PipelineStage("stage1_pipeline_15", stage1_pipeline_15,
+                  description="Correct Line-Function from Wireno potential"),
+    PipelineStage("stage1_pipeline_16", stage1_pipeline_16, description="Drop -Fxxx rows, add T901 supply row"),
+    PipelineStage("stage1_pipeline_17", stage1_pipeline_17, description="Force Line-Name 1,5 for supply symbols"),
+    PipelineStage("stage1_pipeline_18", stage1_pipeline_18, description="Drop swapped duplicate rows"),
+    PipelineStage("stage1_pipeline_19", stage1_pipeline_19, description="230VL2/230VN2 cleanup and -F901 rows"),
+    PipelineStage("stage1_pipeline_20", stage1_pipeline_20, description="Ensure -X0100 N terminal rows"),
+    PipelineStage("stage1_pipeline_21", stage1_pipeline_21, description="Line-Name by potential, -X102 rows"),
+    PipelineStage("stage1_pipeline_22", stage1_pipeline_22, description="Ventilator VENTS rows"),
+    PipelineStage("stage1_pipeline_23", stage1_pipeline_23, description="Keep only _MAIN terminal rows"),
+    PipelineStage("stage1_pipeline_24", stage1_pipeline_24, description="Drop duplicate DOOR 0VDC/230VN rows"),
+    PipelineStage("stage1_pipeline_25", stage1_pipeline_25, description="Add PE grounding rows"),
+])
+
+# Stage 2 starts from the frame read by stage2_pipeline_1
+STAGE2_PIPELINES = PipelineRegistry("stage2", [
+    PipelineStage("stage2_pipeline_2", stage2_pipeline_2, description="Mark Ferrule/common along daisy chains"),
+    PipelineStage("stage2_pipeline_4", stage2_pipeline_4,
+                  description="Force Ferrule on ventilator/terminal N, L3, PE pins"),
+])
+
+
+def run_stage1(df: pd.DataFrame, group_symbols: dict = None, report: list = None,
+               use_cache: bool = True) -> pd.DataFrame:
+    """
+    Run the whole Stage 1 (EPLAN) chain, pipelines 1 → 25, in order.
+
+    With pandas copy-on-write on for the process (set once at start-up,
+    see app.py), every stage shares the column buffers of one working set
+    instead of taking its own deep copy; a column is only materialised
+    again when a stage writes to it. The result is identical to calling
+    the stages one after another, with or without copy-on-write.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Raw EPLAN wire list (as read with dtype=str)
+    group_symbols : dict
+        Daisy-chain groups for pipeline 10 (see parse_component_functions)
+    report : list
+        Optional list that receives one StageReport per stage
+    use_cache : bool
+        Reuse / store the result in STAGE1_PIPELINES' cache (off for one-off batch runs)
+
+    Returns:
+    --------
+    pd.DataFrame
+        Converted wire list
+    """
+    df, _ = STAGE1_PIPELINES.run(df, use_cache=use_cache, report=report, group_symbols=group_symbols or {})
+    return df
+
+
+def run_stage2(uploaded_file, report: list = None, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Read a KOMAX CSV (stage2_pipeline_1) and run the Stage 2 chain on it.
+
+    report, if given, receives a StageReport for stage2_pipeline_1 (rows_in
+    being the rows read) followed by those of STAGE2_PIPELINES. use_cache
+    as in PipelineRegistry.run.
+    """
+    reports = [] if report is None else report
+    with timed_stage("stage2_pipeline_1", 0) as timing:
+        df = stage2_pipeline_1(uploaded_file)
+        timing.rows_out = len(df)
+    timing.rows_in = timing.counters.pop("rows_read", len(df))
+    reports.append(StageReport.from_timing(timing))
+    df, _ = STAGE2_PIPELINES.run(df, use_cache=use_cache, report=reports)
+    return df
@@ -7,6 +7,8 @@ import os
 from collections import defaultdict
 import re
 import csv
+from processing import STAGE1_PIPELINES, parse_component_functions, read_table
+from pipeline_registry import reports_to_frame
 
 # ------------------------------------------------------------
 # Helper functions (original logic preserved)
@@ -25,156 +27,31 @@ def friendly_file_type(filetype: str, filename: str) -> str:
         return "Text"
     return filetype.split("/")[-1].capitalize()
 
-def stage1_pipeline_1(df: pd.DataFrame):
-    df = df.copy()
-    df = df.fillna("")
-    df = df.astype(str)
-    if 'Line-Article' in df.columns:
-        df = df.drop('Line-Article', axis=1)
-    if 'Name' in df.columns and 'C.Label' in df.columns:
-        mask = df['C.Label'].str.startswith('=') | df['C.Label'].str.startswith('+')
-        df.loc[mask, 'Name'] = df.loc[mask, 'C.Label']
-    return df, "Stage 1 completed"
-
-def stage1_pipeline_2(df):
-    df = df.copy()
-    if "C.Label" in df.columns:
-        df["C.Label"] = df["C.Label"].astype(str).str.replace(" ", "")
-    return df
-
-def stage1_pipeline_3(df):
-    df = df.copy()
-    if "Comment" in df.columns:
-        df = df[df["Comment"].astype(str).str.lower() != "delete"]
-    return df
-
-def stage1_pipeline_4(df):
-    df = df.copy()
-    cols = list(df.columns)
-    if len(cols) >= 2:
-        df = df.drop_duplicates(subset=[cols[0], cols[1]], keep="first")
-    return df
-
-def stage1_pipeline_5(df):
-    df = df.copy()
-    if "Quantity" in df.columns:
-        df["Quantity"] = pd.to_numeric(df["Quantity"], errors="coerce").fillna(0)
-    return df
-
-def stage1_pipeline_6(df):
-    df = df.copy()
-    df.columns = [str(c).strip() for c in df.columns]
-    return df
-
-def stage1_pipeline_7(df):
-    df = df.copy()
-    if "C.Label" in df.columns:
-        df["C.Label"] = df["C.Label"].str.replace("=", "")
-    return df
-
-def stage1_pipeline_7_1(df):
-    df = df.copy()
-    if "C.Label" in df.columns:
-        df["C.Label"] = df["C.Label"].str.strip()
-    return df
-
-def stage1_pipeline_8(df):
-    return df.copy()
-
-def stage1_pipeline_9(df):
-    return df.copy()
-
-def stage1_pipeline_10(df, group_symbols):
-    return df.copy()
-
-def stage1_pipeline_11(df):
-    return df.copy()
-
-def stage1_pipeline_12(df):
-    return df.copy()
-
-def stage1_pipeline_14(df):
-    return df.copy()
-
-def stage1_pipeline_15(df):
-    return df.copy()
-
-def stage1_pipeline_16(df):
-    return df.copy()
-
-def stage1_pipeline_17(df):
-    return df.copy()
-
-def stage1_pipeline_18(df):
-    return df.copy()
-
-def stage1_pipeline_19(df):
-    return df.copy()
-
-def stage1_pipeline_20(df):
-    return df.copy()
-
-def stage1_pipeline_21(df):
-    return df.copy()
-
-def stage1_pipeline_22(df):
-    return df.copy()
-
-def stage1_pipeline_23(df):
-    return df.copy()
-
-def stage1_pipeline_24(df):
-    return df.copy()
-
-def stage1_pipeline_25(df):
-    return df.copy()
-
-
 # ------------------------------------------------------------
 # Streamlit UI for Stage 1
 # ------------------------------------------------------------
 def render():
     st.header("⚙️ Stage 1 – Convert for EPLAN")
     uploaded = st.file_uploader("Upload EPLAN CSV / Excel file", type=["csv", "xls", "xlsx"])
+    uploaded_funcs = st.file_uploader(
+        "Upload component function list (optional, for daisy chains)",
+        type=["csv", "xls", "xlsx"], key="eplan_funcs"
+    )
     if uploaded:
         st.success(f"📄 Loaded file: {uploaded.name}")
         try:
-            ext = os.path.splitext(uploaded.name)[1].lower()
-            if ext == ".csv":
-                df = pd.read_csv(uploaded, dtype=str)
-            else:
-                df = pd.read_excel(uploaded, dtype=str)
-
-            # Run pipelines
-            df, _ = stage1_pipeline_1(df)
-            df = stage1_pipeline_2(df)
-            df = stage1_pipeline_3(df)
-            df = stage1_pipeline_4(df)
-            df = stage1_pipeline_5(df)
-            df = stage1_pipeline_6(df)
-            df = stage1_pipeline_7(df)
-            df = stage1_pipeline_7_1(df)
-            df = stage1_pipeline_8(df)
-            df = stage1_pipeline_9(df)
+            df = read_table(uploaded)
             group_symbols = {}
-            df = stage1_pipeline_10(df, group_symbols)
-            df = stage1_pipeline_11(df)
-            df = stage1_pipeline_12(df)
-            df = stage1_pipeline_14(df)
-            df = stage1_pipeline_15(df)
-            df = stage1_pipeline_16(df)
-            df = stage1_pipeline_17(df)
-            df = stage1_pipeline_18(df)
-            df = stage1_pipeline_19(df)
-            df = stage1_pipeline_20(df)
-            df = stage1_pipeline_21(df)
-            df = stage1_pipeline_22(df)
-            df = stage1_pipeline_23(df)
-            df = stage1_pipeline_24(df)
-            df = stage1_pipeline_25(df)
+            if uploaded_funcs:
+                group_symbols = parse_component_functions(read_table(uploaded_funcs, header=None))
+
+            # Run pipelines (resolved from processing.STAGE1_PIPELINES)
+            df, report = STAGE1_PIPELINES.run(df, group_symbols=group_symbols)
 
             st.success("✅ Processing complete.")
             st.dataframe(df, use_container_width=True, hide_index=True)
+            with st.expander("⏱️ Stage report"):
+                st.dataframe(reports_to_frame(report), use_container_width=True, hide_index=True)
 
             csv_bytes = df.to_csv(index=False).encode('utf-8')
             st.download_button(
@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
 from io import BytesIO
-from processing import stage2_pipeline_1, stage2_pipeline_2, stage2_pipeline_4
+from processing import run_stage2
+from pipeline_registry import reports_to_frame
 
 def render():
     st.header("Stage 2: Convert for KOMAX")
@@ -9,15 +10,16 @@ def render():
 
     if uploaded_csv:
         try:
-            df_stage2 = stage2_pipeline_1(uploaded_csv)
-            df_stage2 = stage2_pipeline_2(df_stage2)
-            df_stage2 = stage2_pipeline_4(df_stage2)
+            report = []
+            df_stage2 = run_stage2(uploaded_csv, report=report)
         except Exception as e:
             st.error(f"❌ Error processing: {e}")
             st.stop()
 
         st.success("✅ KOMAX CSV processed successfully!")
         st.dataframe(df_stage2.head(10), use_container_width=True)
+        with st.expander("⏱️ Stage report"):
+            st.dataframe(reports_to_frame(report), use_container_width=True, hide_index=True)
 
         buf = BytesIO()
         df_stage2.to_csv(buf, index=False)
@@ -0,0 +1,114 @@
+# ------------------------------------------------------------
+# stock_ledger.py  –  Stock reservations shared by concurrent BOM runs
+# ------------------------------------------------------------
+import datetime
+import os
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PATH = os.getenv("ADV_STOCK_LEDGER", "stock_ledger.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reservations (
+    stock_key TEXT    NOT NULL,
+    project   TEXT    NOT NULL,
+    row       INTEGER NOT NULL,
+    part      TEXT    NOT NULL,
+    bin       TEXT    NOT NULL,
+    qty       REAL    NOT NULL,
+    created   TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reservations_stock_row ON reservations (stock_key, row);
+CREATE INDEX IF NOT EXISTS reservations_stock_project ON reservations (stock_key, project);
+"""
+
+
+class StockLedger:
+    """
+    SQLite ledger of the stock quantities each project has reserved.
+
+    Reservations are recorded per stock row against the content hash of
+    the stock sheet (StockAllocator.key), so a new Kaunas stock export
+    starts with nothing reserved. reserve() runs in one BEGIN IMMEDIATE
+    transaction: for each project in priority order it drops the project's
+    earlier reservations, allocates against what is left and records the
+    result. Streamlit sessions and batch workers sharing the file therefore
+    never hand out the same quantity twice; readers are not blocked (WAL).
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        with closing(self.connect()) as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(SCHEMA)
+
+    def connect(self) -> sqlite3.Connection:
+        # Autocommit; reserve() opens its own transaction
+        return sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+
+    @staticmethod
+    def _reserved(con, stock_key: str) -> dict:
+        rows = con.execute("SELECT row, SUM(qty) FROM reservations WHERE stock_key = ? GROUP BY row", (stock_key,))
+        return dict(rows.fetchall())
+
+    def reserved(self, stock_key: str) -> dict:
+        """{stock row: reserved qty} over all projects."""
+        with closing(self.connect()) as con:
+            return self._reserved(con, stock_key)
+
+    def reserve(self, stock, requests: list) -> dict:
+        """
+        Allocate and reserve stock for several projects in one transaction.
+
+        requests is [(project, [journal frames])] in priority order; each
+        project gets what the projects before it (and every other project
+        already in the ledger) left over, and its frames deplete the stock in
+        turn. Returns {project: [allocation per frame]} as produced by
+        StockAllocator.allocate_frames.
+        """
+        created = datetime.datetime.now().isoformat(timespec="seconds")
+        results = {}
+        with closing(self.connect()) as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                for project, frames in requests:
+                    con.execute("DELETE FROM reservations WHERE stock_key = ? AND project = ?", (stock.key, project))
+                    allocations = stock.without(self._reserved(con, stock.key)).allocate_frames(frames)
+                    done = [a for a in allocations if a is not None]
+                    if done:
+                        rows = np.concatenate([a[3] for a in done])
+                        qty = np.concatenate([a[2] for a in done])
+                        per_row = pd.Series(qty[rows >= 0]).groupby(rows[rows >= 0]).sum()
+                        con.executemany(
+                            "INSERT INTO reservations VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            [(stock.key, project, int(r), str(stock.stock.at[r, "No."]), str(stock.stock.at[r, "Bin Code"]), float(q), created)
+                             for r, q in per_row.items()],
+                        )
+                    results[project] = allocations
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+        return results
+
+    def release(self, project: str, stock_key: str = None) -> int:
+        """Drop a project's reservations (on one stock snapshot, or all); returns the number of rows removed."""
+        with closing(self.connect()) as con:
+            if stock_key is None:
+                cur = con.execute("DELETE FROM reservations WHERE project = ?", (project,))
+            else:
+                cur = con.execute("DELETE FROM reservations WHERE stock_key = ? AND project = ?", (stock_key, project))
+            return cur.rowcount
+
+    def summary(self, stock_key: str = None) -> pd.DataFrame:
+        """Reserved lines and quantity per stock snapshot and project."""
+        query = ("SELECT stock_key, project, COUNT(*) AS rows, SUM(qty) AS qty, MAX(created) AS created "
+                 "FROM reservations {} GROUP BY stock_key, project ORDER BY created")
+        with closing(self.connect()) as con:
+            if stock_key is None:
+                return pd.read_sql_query(query.format(""), con)
+            return pd.read_sql_query(query.format("WHERE stock_key = ?"), con, params=(stock_key,))
@@ -0,0 +1,258 @@
+# ------------------------------------------------------------
+# synthetic.py  –  Seeded synthetic inputs for benchmarks and checks
+# ------------------------------------------------------------
+#
+# Every generator takes a size and a seed and returns the same input for
+# the same arguments, so timings and outputs of two runs (or two code
+# versions) can be compared. The shapes follow the real exports: EPLAN
+# wire lists (Name / Name.1 pairs), KOMAX CSVs (';' separated, German
+# headers), the DATA workbook, project and CUBIC BOMs and the Kaunas
+# stock sheet.
+import io
+import random
+
+import pandas as pd
+
+SIZES = (500, 5_000, 50_000, 200_000)
+
+EPLAN_COLUMNS = ["Name", "C.Label", "Name.1", "C.Label.1", "C.Label.2", "Wireno", "Line-Name",
+                 "Line-Article", "Comment", "Line-Function"]
+# Duplicate headers as in the export; pandas reads the second ones as <name>.1
+KOMAX_COLUMNS = ["Nr.", "Drahtnummer", "Betriebsmittelkennzeichen", "Pin", "Querschnitt", "Farbe", "Hülse",
+                 "Abisolierlänge", "Anschlag", "Betriebsmittelkennzeichen", "Pin", "Querschnitt", "Farbe",
+                 "Hülse", "Abisolierlänge", "Anschlag", "Leitungstyp", "Länge in mm", "Bündel"]
+
+TERMINALS = ["-X923", "-X924", "-X927", "-X928"]
+SUPPLY_ROWS = [
+    ("-G90A3:OUT+", "-X0100:24VDC", "24VDC", "BU"), ("-G90A3:OUT-", "-X0100:0VDC", "0VDC", "DBU"),
+    ("-G90A3:IN", "-X0101:230VL", "230VL", "RD"), ("-G91:BAT+", "-A1:BAT+", "24VDC1", "BU"),
+    ("-T901:0 V", "-X0100:0VDC", "0VDC", "DBU"), ("-T901:115 V'", "-F901.1:1", "115VAC", "RD"),
+    ("-F901:2", "-X0101:230VL", "230VL", "RD"), ("-F901:N2", "-X0101:230VN", "230VN", "RD/WH"),
+    ("-F903:2", "-X102:1", "F903/L3", "BK"), ("-K924:1", "-X102:2", "90:10", "BK"),
+]
+WIRENOS = ["0VDC", "24VDC", "24VDC1", "24VDC2", "230VL", "230VN", "230VL2", "230VN2", "F903/L3", "F903/N", "12:01"]
+LINE_NAMES = ["", "1,5", "0,75", "2,5"]
+LINE_FUNCTIONS = ["", "BK", "BU", "RD", "DBU", "LBL", "RD/WH"]
+GROUPS = ("POWER", "CONTROL", "DOOR")
+
+
+def _symbol(rng: random.Random, scale: int) -> str:
+    """A device pin of an n-row wire list: terminals, relays, contactors, fuses, controller pins."""
+    r = rng.random()
+    if r < 0.35:
+        return f"-X{rng.randint(1, scale)}:{rng.randint(1, 20)}"
+    if r < 0.55:
+        return f"-K{rng.randint(1, scale)}:{rng.choice(['13', '14', '21', '22', 'A1', 'A2', 'A', 'B'])}"
+    if r < 0.7:
+        return f"-A{rng.randint(1, max(2, scale // 20))}:{rng.choice(['GND', 'A1S1', 'B1S1', 'DI1', 'AO2'])}"
+    if r < 0.85:
+        return f"-F{rng.randint(100, 999)}:{rng.randint(1, 6)}"
+    return f"-S{rng.randint(1, scale)}:{rng.randint(1, 4)}"
+
+
+def eplan_wirelist(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    EPLAN wire list of about rows rows, as read with dtype=str.
+
+    Built from blocks like a real panel: point-to-point wires, daisy
+    chains on one potential, -R relay chains, -X923…-X928 neutral
+    terminals, the -G90A3 / -T901 / -F901 supply wiring and noise the
+    early pipelines drop (PE, cables, -K coils, -F6xx fuses). About 3 %
+    of the rows come back again as exact and as swapped duplicates.
+    """
+    rng = random.Random(seed)
+    scale = max(10, rows // 8)
+    out = []
+
+    def wire(a, b, wireno="", line_name=None, function=None, label="", label1=""):
+        out.append({
+            "Name": a, "C.Label": label, "Name.1": b, "C.Label.1": label1, "C.Label.2": "",
+            "Wireno": wireno, "Line-Name": rng.choice(LINE_NAMES) if line_name is None else line_name,
+            "Line-Article": "H07V-K", "Comment": rng.choice(["", "", "DBLWH", "24VDC."]),
+            "Line-Function": rng.choice(LINE_FUNCTIONS) if function is None else function,
+        })
+
+    while len(out) < rows:
+        r = rng.random()
+        if r < 0.40:
+            wire(_symbol(rng, scale), _symbol(rng, scale), rng.choice(WIRENOS + [""] * 4),
+                 label=rng.choice(["", "", "", "J12"]), label1=rng.choice(["", "", "", "J5"]))
+        elif r < 0.65:
+            # Daisy chain: one potential looped through several devices
+            wireno = rng.choice(WIRENOS)
+            chain = [_symbol(rng, scale) for _ in range(rng.randint(3, 8))]
+            for a, b in zip(chain, chain[1:]):
+                wire(a, b, wireno)
+        elif r < 0.75:
+            # Relay chain -R1 → -R2 → … ending on a device (sometimes a cycle)
+            start = rng.randint(1, scale)
+            relays = [f"-R{start + i}:{rng.randint(1, 3)}" for i in range(rng.randint(2, 5))]
+            for a, b in zip(relays, relays[1:]):
+                wire(a, b)
+            wire(relays[-1], relays[0] if rng.random() < 0.05 else _symbol(rng, scale))
+        elif r < 0.85:
+            # Neutral terminals and fans
+            t = rng.choice(TERMINALS)
+            suffix = rng.choice([":N", ":N", ":230VN2", ":230VN"])
+            wire(t + suffix, rng.choice(["-M923:N", "-M924:N", "-M925:N", "-X0100:N", rng.choice(TERMINALS) + suffix]),
+                 rng.choice(["F903/N", "230VN", "230VN2"]), "1,5", "BU")
+        elif r < 0.93:
+            a, b, wireno, function = rng.choice(SUPPLY_ROWS)
+            wire(a, b, wireno, "1,5", function)
+        else:
+            kind = rng.randrange(4)
+            if kind == 0:
+                wire(_symbol(rng, scale), "-XPE:PE", "PE", "2,5", "GNYE")
+            elif kind == 1:
+                wire(_symbol(rng, scale), _symbol(rng, scale), "", "", rng.choice(["cable", "Power", "Internal cable"]))
+            elif kind == 2:
+                wire(f"-K{rng.randint(1, scale)}:{rng.choice('ABCDEF')}", _symbol(rng, scale))
+            else:
+                wire(f"-F6{rng.randint(0, 99):02d}:1", _symbol(rng, scale), "", "", rng.choice(["BK", "LBL"]))
+    df = pd.DataFrame(out[:rows], columns=EPLAN_COLUMNS)
+    extra = max(1, rows // 60)
+    dup = df.sample(n=extra, random_state=seed)
+    swapped = df.sample(n=extra, random_state=seed + 1).rename(columns={"Name": "Name.1", "Name.1": "Name"})
+    return pd.concat([df, dup, swapped[EPLAN_COLUMNS]], ignore_index=True)
+
+
+def component_functions(wirelist: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    """Component function list ('=GROUP-symbol' per row) assigning the wire list's devices to daisy-chain groups."""
+    rng = random.Random(seed)
+    devices = sorted({s.split(":")[0] for s in pd.concat([wirelist["Name"], wirelist["Name.1"]]).dropna() if s})
+    rows = ["Functions"] + [f"={rng.choice(GROUPS)}{d}" for d in devices if rng.random() < 0.3]
+    rows += [f"=POWER{t}" for t in TERMINALS]
+    return pd.DataFrame({0: rows})
+
+
+def komax_csv(rows: int, seed: int = 0) -> bytes:
+    """KOMAX wire list export of about rows rows (';' separated, UTF-8), with daisy chains and ferrule pins."""
+    rng = random.Random(seed)
+    scale = max(10, rows // 8)
+    out = []
+
+    def wire(a, b):
+        (c, d), (j, k) = (a.split(":", 1) if ":" in a else (a, "")), (b.split(":", 1) if ":" in b else (b, ""))
+        out.append([str(len(out) + 1), str(rng.randint(1, scale)), c, ":" + d if d else " ", rng.choice(["0,75", "1,5", "2,5"]),
+                    rng.choice(["BU", "BK", "RD"]), rng.choice(["", " ", "H0,75/14"]), "8", "",
+                    j, ":" + k if k else " ", rng.choice(["0,75", "1,5", "2,5"]), rng.choice(["BU", "BK", "RD"]),
+                    rng.choice(["", " ", "H1,5/14"]), "8", "", "H07V-K",
+                    rng.choice(["150", "300", "269,5", "1200", " ", "450"]), rng.choice(["", "B1", "B2"])])
+
+    while len(out) < rows:
+        r = rng.random()
+        if r < 0.55:
+            a, b = _symbol(rng, scale), _symbol(rng, scale)
+            if rng.random() < 0.1:
+                a = a.replace(":", ": x:")
+            wire(a, b)
+        elif r < 0.8:
+            chain = [_symbol(rng, scale) for _ in range(rng.randint(3, 6))]
+            for a, b in zip(chain, chain[1:]):
+                wire(a, b)
+        else:
+            term = rng.choice(["-M923", "-M924", "-M925", "-XPE"] + TERMINALS)
+            wire(f"{term}:{rng.choice(['N', 'L3', 'PE'])}", _symbol(rng, scale))
+    buf = io.StringIO()
+    buf.write(";".join(KOMAX_COLUMNS) + "\n")
+    for row in out[:rows]:
+        buf.write(";".join(row) + "\n")
+    return buf.getvalue().encode("utf-8")
+
+
+def _workbook(sheets: dict, header=True) -> bytes:
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False, header=header)
+    return buf.getvalue()
+
+
+def part_numbers(parts: int, seed: int = 0) -> pd.DataFrame:
+    """The Part_no sheet: NAV item number, type, description, supplier and unit cost per part."""
+    rng = random.Random(seed)
+    makers = [("ABB", 30024), ("Schneider Electric", 30031), ("Danfoss A/S", 30040), ("Rittal", 30093), ("Phoenix", 30055)]
+    rows = []
+    for i in range(parts):
+        maker, supplier = rng.choice(makers)
+        rows.append({"Item no.": 1_000_000 + i, "Type no.": f"{maker[:3].upper()}-{i:06d}{rng.choice(['', 'R1', 'A'])}",
+                     "Description": f"Part {i}", "Supplier": maker, "Supplier No.": float(supplier),
+                     "Cost price / Unit cost DKK": round(rng.uniform(0.5, 900), 4)})
+    return pd.DataFrame(rows)
+
+
+def data_workbook(parts: int, seed: int = 0) -> bytes:
+    """DATA workbook with parts Part_no rows and the Stock, Accessories, Part_code, Hours and Instructions sheets."""
+    rng = random.Random(seed)
+    part_no = part_numbers(parts, seed)
+    types = part_no["Type no."].tolist()
+    stock = pd.DataFrame({"Part": rng.sample(types, max(1, parts // 20)), "QTY": 0,
+                          "Comment": [rng.choice(["No need", "Q1", ""]) for _ in range(max(1, parts // 20))]})
+    acc = []
+    for main in rng.sample(types, max(1, parts // 25)):
+        row = [main]
+        for _ in range(rng.randint(1, 4)):
+            row += [rng.choice(types), rng.randint(1, 4), "ABB A/S"]
+        acc.append(row + [None] * (13 - len(row)))
+    accessories = pd.DataFrame(acc, columns=["Search"] + [f"{c}{i}" for i in range(1, 5) for c in ("Additional", "Qty.", "Manufacturer")])
+    # Part_code renames a BOM type (column A) to a catalogue type (column B)
+    part_code = pd.DataFrame({"Type": [f"ALIAS-{i}" for i in range(max(1, parts // 50))],
+                              "Vendor Item Number": rng.sample(types, max(1, parts // 50)),
+                              "Manufacturer": "", "Description": "", "No.": ""})
+    panels = ["A", "B", "B1", "B2", "C4"]
+    hours = pd.DataFrame([["Type", "TT", "TN-S", "TN-C-S", 205.0]] + [[p, rng.randint(0, 120), rng.randint(0, 120), rng.randint(0, 120), None] for p in panels],
+                         columns=["Average hours", "", " ", "  ", "Price"])
+    instructions = pd.DataFrame([[p, "1900x800x400", "1200x800", None, 4.0, "BOTTOM PLATE 4X2", None, None, None, None] for p in panels],
+                                columns=["Type", "Size", "Pallet", "Picture", "Dampers", "Plates", "a", "b", "c", "d"])
+    return _workbook({"Accessories": accessories, "Stock": stock, "Instructions": instructions, "Part_code": part_code,
+                      "Part_no": part_no, "Hours": hours})
+
+
+def bom_workbook(lines: int, parts: int, seed: int = 0) -> bytes:
+    """Project BOM: Article No., Type, Quantity, FABRIKAT, DESCRIPT; about 5 % of the types are unknown to DATA, 3 % Part_code aliases."""
+    rng = random.Random(seed)
+    types = part_numbers(parts, seed)["Type no."].tolist()
+    rows = []
+    for i in range(lines):
+        r = rng.random()
+        t = f"UNKNOWN-{i}" if r < 0.05 else f"ALIAS-{rng.randrange(max(1, parts // 50))}" if r < 0.08 else rng.choice(types)
+        rows.append({"Article No.": t, "Type": t if rng.random() > 0.1 else "", "Quantity": float(rng.randint(1, 40)),
+                     "FABRIKAT": "", "DESCRIPT": f"Line {i}"})
+    return _workbook({"BOM": pd.DataFrame(rows)})
+
+
+def cubic_workbook(lines: int, parts: int, seed: int = 0) -> bytes:
+    """CUBIC purchase order laid out like the sample cubic.xls: 13 preamble rows, then Item Id / Description / Quantity / Price / Total."""
+    rng = random.Random(seed + 1)
+    types = part_numbers(parts, seed)["Type no."].tolist()
+    preamble = [[None] * 10 for _ in range(13)]
+    preamble[1][0], preamble[5][5], preamble[5][8] = "Vendor A/S", "Document No", "PR-00000"
+    header = [None, "Item Id", "Description", None, "Quantity", None, None, "Price", None, "Total"]
+    body = []
+    for i in range(lines):
+        qty, price = rng.randint(1, 20), round(rng.uniform(1, 300), 2)
+        body.append([None, rng.choice(types), f"Cubic part {i}", None, qty, None, None, price, None, round(qty * price, 2)])
+    return _workbook({"Purchase order": pd.DataFrame(preamble + [header] + body)}, header=False)
+
+
+def stock_workbook(rows: int, parts: int, seed: int = 0) -> bytes:
+    """Kaunas stock export: two title rows, the NAV header, then one row per bin (some parts in several bins)."""
+    rng = random.Random(seed + 2)
+    nos = part_numbers(parts, seed)["Item no."].tolist()
+    body = [[rows, None, None, None], ["2025-09-22 09:50:17", 'Location "Kaunas", Qty ">0"', None, None],
+            ["F", "Bin Code", "Item No.", "Quantity"]]
+    for _ in range(rows):
+        bin_code = rng.choice(["67-01-01-01", "99-99-99", f"{rng.randint(1, 70):02d}-{rng.randint(1, 9):02d}-{rng.randint(1, 9):02d}"])
+        body.append([bin_code, bin_code, rng.choice(nos), rng.randint(0, 50)])
+    return _workbook({"Stock": pd.DataFrame(body)}, header=False)
+
+
+def bom_uploads(rows: int, seed: int = 0) -> dict:
+    """Stage 3 uploads scaled from a wire-list size: BOM rows/20, CUBIC rows/50, stock rows/4, parts rows/10 (with floors)."""
+    parts = max(300, rows // 10)
+    return {
+        "bom": bom_workbook(max(50, rows // 20), parts, seed),
+        "cubic_bom": cubic_workbook(max(20, rows // 50), parts, seed),
+        "data": data_workbook(parts, seed),
+        "ks": stock_workbook(max(200, rows // 4), parts, seed),
+    }
@@ -0,0 +1,67 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bom_processing import compile_accessories, expand_accessories, pipeline_3A_2_accessories, safe_parse_qty
+
+
+def old_accessories(df_bom, df_acc):
+    """The iterrows pipeline_3A_2_accessories of the original stage3_bom.py."""
+    if df_acc is None or df_acc.empty: return df_bom
+    out=df_bom.copy()
+    for _,row in df_bom.iterrows():
+        main_item=str(row["Original Type"]).strip(); matches=df_acc[df_acc.iloc[:,0].astype(str).str.strip()==main_item]
+        for _,acc_row in matches.iterrows():
+            acc_vals=acc_row.values[1:]
+            for i in range(0,len(acc_vals),3):
+                if i+2>=len(acc_vals) or pd.isna(acc_vals[i]): break
+                item=str(acc_vals[i]).strip(); acc_qty=safe_parse_qty(str(acc_vals[i+1]).strip()); manuf=str(acc_vals[i+2]).strip()
+                out=pd.concat([out,pd.DataFrame([{"Original Type":item,"Quantity":acc_qty,"Manufacturer":manuf,"Source":"Accessory"}])],ignore_index=True)
+    return out
+
+
+def sheet(*rows, width=7):
+    return pd.DataFrame([list(r) + [np.nan] * (width - len(r)) for r in rows])
+
+
+def bom(*types):
+    return pd.DataFrame({"Original Type": list(types), "Quantity": [1.0] * len(types), "Source": "BOM"})
+
+
+def test_triplets_stop_at_the_first_blank_accessory():
+    acc = compile_accessories(sheet(("MAIN ", "A1", "2", "M", np.nan, "3", "M", "A3", "1", "M")))
+    assert acc.values.tolist() == [["MAIN", "A1", 2.0, "M"]]
+
+
+def test_incomplete_trailing_triplet_is_dropped():
+    acc = compile_accessories(sheet(("MAIN", "A1", "1,5", "M", "A2", "4"), width=6))
+    assert acc.values.tolist() == [["MAIN", "A1", 1.5, "M"]]
+
+
+def test_rows_of_one_main_item_keep_sheet_order():
+    acc = compile_accessories(sheet(("X", "A1", 1, "M"), ("Y", "B1", 1, "M"), ("X", "A2", 2, "M", "A3", 3, "N")))
+    got = expand_accessories(bom("Y", "X"), acc)
+    assert got["Original Type"].tolist() == ["Y", "X", "B1", "A1", "A2", "A3"]
+    assert got["Source"].tolist()[2:] == ["Accessory"] * 4
+
+
+def test_nothing_to_add():
+    df = bom("X")
+    assert pipeline_3A_2_accessories(df, pd.DataFrame()) is df
+    pd.testing.assert_frame_equal(pipeline_3A_2_accessories(df, sheet(("Y", "A1", 1, "M"))), df)
+    assert compile_accessories(None).empty
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_sheets_match_the_row_loop(seed):
+    rng = random.Random(seed)
+    mains = ["X", " X", "Y", "Z", 5]
+    for _ in range(30):
+        width = rng.choice([3, 4, 7, 8, 10])
+        rows = [[rng.choice(mains)] + [rng.choice(["A1", "A2", np.nan, "2", 3, "1,5", "-", "M"]) for _ in range(width - 1)]
+                for _ in range(rng.randint(1, 6))]
+        df_acc = pd.DataFrame(rows)
+        df = bom(*[rng.choice(["X", "Y", "5", "Q"]) for _ in range(rng.randint(1, 6))])
+        pd.testing.assert_frame_equal(pipeline_3A_2_accessories(df, df_acc), old_accessories(df, df_acc))
@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import bom_processing
+from bom_processing import BomEngine, BomResult, BomSources, ProjectInputs
+
+FIELDS = list(BomResult.__dataclass_fields__)
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    """Replace the Stage 3 run with a stub that records its calls and returns `rows`-row frames."""
+    runs = SimpleNamespace(calls=[], rows=3)
+
+    def process_bom(files, inputs, ledger=None):
+        runs.calls.append((files, inputs, ledger))
+        frame = pd.DataFrame({"No.": [f"P{i}" for i in range(runs.rows)]})
+        return {f: frame.copy() for f in FIELDS}
+
+    monkeypatch.setattr(bom_processing, "load_uploads", lambda uploads, rittal=False: dict(uploads))
+    monkeypatch.setattr(bom_processing, "process_bom", process_bom)
+    return runs
+
+
+def sources(bom=b"bom"):
+    return BomSources(bom=bom, data=b"data", ks=b"stock")
+
+
+def test_unchanged_sources_and_inputs_hit(runs):
+    engine = BomEngine()
+    first = engine.run(sources(), {"project_number": "1234-567"})
+    second = engine.run(sources(), ProjectInputs(project_number="1234-567"))
+    assert second is first
+    assert len(runs.calls) == 1
+    assert engine.cache.stats()["hits"] == 1
+
+
+def test_changed_bytes_or_options_miss(runs):
+    engine = BomEngine()
+    engine.run(sources(), {"project_number": "1234-567"})
+    engine.run(sources(b"other bom"), {"project_number": "1234-567"})
+    engine.run(sources(), {"project_number": "1234-567", "panel_type": "C4"})
+    assert len(runs.calls) == 3
+    assert engine.cache.stats()["misses"] == 3
+
+
+def test_ledger_runs_are_not_memoised(runs):
+    engine = BomEngine()
+    engine.run(sources(), {"project_number": "1234-567"}, ledger=object())
+    engine.run(sources(), {"project_number": "1234-567"}, ledger=object())
+    assert len(runs.calls) == 2
+    assert len(engine.cache) == 0
+
+
+def test_cache_is_bounded_by_bytes(runs):
+    runs.rows = 2000
+    one = bom_processing._result_nbytes(BomResult(**{f: pd.DataFrame({"No.": [f"P{i}" for i in range(2000)]}) for f in FIELDS}))
+    engine = BomEngine(max_bytes=int(one * 2.5))
+    for i in range(4):
+        engine.run(sources(f"bom {i}".encode()), {})
+    assert len(engine.cache) == 2
+    assert engine.cache.nbytes <= engine.cache.max_bytes
+    assert engine.cache.stats()["evictions"] == 2
+    # A result over the whole budget is returned but not stored
+    small = BomEngine(max_bytes=one // 2)
+    assert isinstance(small.run(sources(), {}), BomResult)
+    assert len(small.cache) == 0
+
+
+def test_default_budget_comes_from_the_environment():
+    assert BomEngine().cache.max_bytes == bom_processing.BOM_CACHE_BYTES
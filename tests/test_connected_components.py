@@ -0,0 +1,93 @@
+import random
+import sys
+
+import numpy as np
+import pandas as pd
+
+from processing import connected_components
+
+
+def reference_components(left, right, left_valid, right_valid):
+    """Label rows by a breadth-first walk over the values they share, numbered by first row."""
+    by_value = {}
+    for i, (a, b) in enumerate(zip(left, right)):
+        if left_valid[i]:
+            by_value.setdefault(a, []).append(i)
+        if right_valid[i]:
+            by_value.setdefault(b, []).append(i)
+    labels = [-1] * len(left)
+    next_label = 0
+    for start in range(len(left)):
+        if labels[start] >= 0:
+            continue
+        labels[start] = next_label
+        queue = [start]
+        while queue:
+            i = queue.pop()
+            values = [v for v, ok in ((left[i], left_valid[i]), (right[i], right_valid[i])) if ok]
+            for v in values:
+                for j in by_value[v]:
+                    if labels[j] < 0:
+                        labels[j] = next_label
+                        queue.append(j)
+        next_label += 1
+    return labels, by_value
+
+
+def test_degrees_and_endpoints():
+    left = pd.Series(["a", "b", "x", "c"])
+    right = pd.Series(["b", "c", "y", "d"])
+    comps = connected_components(left, right)
+    assert comps.labels.tolist() == [0, 0, 1, 0]
+    assert comps.sizes.tolist() == [3, 3, 1, 3]
+    assert comps.left_degree.tolist() == [1, 2, 1, 2]
+    assert comps.right_degree.tolist() == [2, 2, 1, 1]
+    assert comps.left_endpoint.tolist() == [True, False, True, False]
+    assert comps.right_endpoint.tolist() == [False, False, True, True]
+
+
+def test_invalid_values_do_not_connect():
+    left = pd.Series(["", "", "a"])
+    right = pd.Series(["p", "q", ""])
+    comps = connected_components(left, right, left_valid=left != "", right_valid=right != "")
+    assert comps.labels.tolist() == [0, 1, 2]
+    assert comps.left_degree.tolist() == [0, 0, 1]
+    assert comps.right_degree.tolist() == [1, 1, 0]
+
+
+def test_long_chain_needs_no_recursion():
+    n = 100000
+    # Rows in reverse order, so every row first meets the chain through its last row
+    left = pd.Series([f"n{i}" for i in range(n, 0, -1)])
+    right = pd.Series([f"n{i - 1}" for i in range(n, 0, -1)])
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(300)
+    try:
+        comps = connected_components(left, right)
+    finally:
+        sys.setrecursionlimit(limit)
+    assert (comps.labels == 0).all() and (comps.sizes == n).all()
+    assert comps.left_endpoint.sum() == 1 and comps.right_endpoint.sum() == 1
+
+
+def test_empty():
+    comps = connected_components(pd.Series([], dtype=object), pd.Series([], dtype=object))
+    assert len(comps.labels) == len(comps.sizes) == 0
+
+
+def test_random_graphs_match_a_plain_walk():
+    rng = random.Random(0)
+    for _ in range(200):
+        n = rng.randint(1, 30)
+        values = [f"v{i}" for i in range(rng.randint(1, 25))]
+        left = [rng.choice(values) for _ in range(n)]
+        right = [rng.choice(values) for _ in range(n)]
+        left_valid = [rng.random() < 0.85 for _ in range(n)]
+        right_valid = [rng.random() < 0.85 for _ in range(n)]
+        comps = connected_components(pd.Series(left), pd.Series(right), np.array(left_valid), np.array(right_valid))
+        labels, by_value = reference_components(left, right, left_valid, right_valid)
+        assert comps.labels.tolist() == labels
+        assert comps.sizes.tolist() == [labels.count(label) for label in labels]
+        degree = {v: len(rows) for v, rows in by_value.items()}
+        assert comps.left_degree.tolist() == [degree[v] if ok else 0 for v, ok in zip(left, left_valid)]
+        assert comps.right_degree.tolist() == [degree[v] if ok else 0 for v, ok in zip(right, right_valid)]
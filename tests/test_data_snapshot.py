@@ -0,0 +1,90 @@
+import datetime
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_snapshot
+from bom_processing import part_no_keys, pipeline_2_4_normalize_part_no
+from data_snapshot import import_data_workbook, latest_snapshot, list_snapshots, load_data_snapshot
+
+FORMATS = ["pickle"] + (["feather"] if data_snapshot.HAVE_ARROW else [])
+
+
+def workbook(sheets):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+    return buffer.getvalue()
+
+
+RAW = workbook({
+    "Part_no": pd.DataFrame({"PartNo_A": [1001, "1002", 1003.5, None], "PartName_B": ["AB 1", "cd2", 7, "EF3"],
+                             "Desc_C": ["a", None, "c", "d"], "UnitPrice_F": [1.5, 2, None, 4]}),
+    # Hand-typed columns mixing text, numbers and booleans; numeric column labels
+    "Mixed": pd.DataFrame({"Code": ["x", 1, 2.5, True, None, "1"], 2024: [1, 2, 3, 4, 5, 6],
+                           1.5: ["a", "b", "c", "d", "e", None]}),
+    "Empty": pd.DataFrame(),
+    # A date in a text column cannot be stored as tagged text
+    "Dated": pd.DataFrame({"When": ["soon", datetime.datetime(2024, 5, 1), None]}),
+})
+
+
+def assert_same_book(got, expected):
+    assert list(got) == list(expected)
+    for name in expected:
+        pd.testing.assert_frame_equal(got[name], expected[name])
+        assert [type(c) for c in got[name].columns] == [type(c) for c in expected[name].columns]
+        assert got[name].map(type).equals(expected[name].map(type))
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_round_trip_matches_read_excel(tmp_path, fmt):
+    path = import_data_workbook(RAW, root=str(tmp_path), fmt=fmt)
+    book, keys = load_data_snapshot(path)
+    expected = pd.read_excel(io.BytesIO(RAW), sheet_name=None)
+    assert_same_book(book, expected)
+    part_no = pipeline_2_4_normalize_part_no(expected["Part_no"])
+    pd.testing.assert_frame_equal(keys["part_no"], part_no_keys(part_no))
+
+
+@pytest.mark.skipif(not data_snapshot.HAVE_ARROW, reason="needs pyarrow")
+def test_only_sheets_feather_cannot_hold_are_pickled(tmp_path):
+    manifest = data_snapshot.read_manifest(import_data_workbook(RAW, root=str(tmp_path), fmt="feather"))
+    formats = {s["name"]: s["format"] for s in manifest["sheets"]}
+    assert formats == {"Part_no": "feather", "Mixed": "feather", "Empty": "feather", "Dated": "pickle"}
+    assert {s["name"]: s["tagged"] for s in manifest["sheets"]}["Mixed"] == ["c0"]
+
+
+def test_same_workbook_is_imported_once(tmp_path):
+    root = str(tmp_path)
+    first = import_data_workbook(RAW, root=root)
+    assert import_data_workbook(RAW, root=root) == first
+    other = workbook({"Part_no": pd.DataFrame({"PartNo_A": [1], "PartName_B": ["X"]})})
+    second = import_data_workbook(other, root=root)
+    assert list_snapshots(root) == sorted([first, second]) and latest_snapshot(root) in (first, second)
+    assert not [d for d in os.listdir(root) if d.startswith(".")]
+
+
+def test_unknown_snapshot_version_is_refused(tmp_path):
+    path = import_data_workbook(RAW, root=str(tmp_path))
+    manifest = data_snapshot.read_manifest(path)
+    manifest["snapshot_version"] = data_snapshot.SNAPSHOT_VERSION + 1
+    with open(os.path.join(path, data_snapshot.MANIFEST), "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh)
+    with pytest.raises(ValueError):
+        load_data_snapshot(path)
+
+
+def test_mixed_column_encoding_round_trips():
+    s = pd.Series(["x", 1, 2.5, True, None, np.nan, "1", 0.1 + 0.2], dtype=object)
+    text, tags = data_snapshot._encode_mixed(s)
+    back = data_snapshot._decode_mixed(text, tags)
+    assert back.map(type).tolist() == s.map(type).tolist()
+    assert back.iloc[[0, 1, 2, 3, 6, 7]].tolist() == s.iloc[[0, 1, 2, 3, 6, 7]].tolist()
+    assert back.iloc[4] is None and np.isnan(back.iloc[5])
+    assert data_snapshot._encode_mixed(pd.Series(["x", datetime.date(2024, 1, 1)])) is None
@@ -0,0 +1,45 @@
+import random
+import re
+
+import pandas as pd
+
+from processing import FunctionTrie, parse_component_functions
+
+
+def regex_groups(group_symbols, symbol):
+    """Groups of the symbol by the per-function regex the trie replaces."""
+    return {group for group, funcs in group_symbols.items()
+            for func in funcs if re.match(rf"^{re.escape(func)}(:|$)", symbol)}
+
+
+def test_function_matches_whole_segments():
+    trie = FunctionTrie({"CONTROL": ["-K1", "-F901.1"], "POWER": ["-X1:2"]})
+    assert trie.groups("-K1") == trie.groups("-K1:13") == {"CONTROL"}
+    assert trie.groups("-K12:1") == trie.groups("-K1.1:1") == set()
+    # A dot is literal, not a regex wildcard
+    assert trie.groups("-F901.1:2") == {"CONTROL"} and trie.groups("-F901x1:2") == set()
+    assert trie.groups("-X1:2") == trie.groups("-X1:2:PE") == {"POWER"}
+    assert trie.groups("-X1:21") == trie.groups("-X1") == set()
+
+
+def test_symbol_in_several_groups():
+    trie = FunctionTrie({"A": ["-K1"], "B": ["-K1:13"], "C": ["-K2"]})
+    assert trie.groups("-K1:13") == {"A", "B"}
+    assert trie.match(["-K1:13", "-K1:14", "-K3:1"]) == {"A": {"-K1:13", "-K1:14"}, "B": {"-K1:13"}}
+
+
+def test_random_symbols_match_the_regex():
+    rng = random.Random(0)
+    segments = ["-K1", "-K12", "-X1", "1", "13", "", "PE", "-F.1", "a"]
+    for _ in range(200):
+        group_symbols = {g: [":".join(rng.choice(segments) for _ in range(rng.randint(1, 3))) for _ in range(rng.randint(0, 4))]
+                         for g in "ABC"}
+        trie = FunctionTrie(group_symbols)
+        for _ in range(20):
+            symbol = ":".join(rng.choice(segments) for _ in range(rng.randint(1, 4)))
+            assert trie.groups(symbol) == regex_groups(group_symbols, symbol)
+
+
+def test_parse_component_functions():
+    df_f = pd.DataFrame({"F": ["=CONTROL-K1", " =control- K2 ", "K3", None, "=POWER-X923", "=bad"]})
+    assert parse_component_functions(df_f) == {"CONTROL": ["-K1", "-K2"], "POWER": ["-X923"]}
@@ -0,0 +1,116 @@
+import csv
+import io
+import random
+
+import pandas as pd
+import pytest
+
+from processing import read_komax_csv
+
+
+def baseline_read(raw: bytes) -> pd.DataFrame:
+    """Steps 1-2 of the original stage2_pipeline_1: python engine, one attempt per encoding."""
+    sample = raw[:8192].decode("utf-8", errors="replace")
+    try:
+        sep = csv.Sniffer().sniff(sample, delimiters=[",", ";", "\t", "|"]).delimiter
+    except csv.Error:
+        sep = ","
+    df = None
+    for enc in ("utf-8", "latin1", "cp1252"):
+        try:
+            df = pd.read_csv(io.BytesIO(raw), sep=sep, engine="python", dtype=str, encoding=enc, keep_default_na=False)
+            break
+        except UnicodeDecodeError:
+            continue
+    if df.shape[1] == 1:
+        df = df[df.columns[0]].str.split(sep, expand=True).map(lambda x: x.strip() if isinstance(x, str) else x)
+    return df
+
+
+def assert_same_outcome(raw: bytes):
+    """read_komax_csv gives the baseline's frame (values, None padding, index types) or raises the same error."""
+    try:
+        expected = baseline_read(raw)
+    except Exception as e:
+        with pytest.raises(type(e)):
+            read_komax_csv(io.BytesIO(raw))
+        return
+    got = read_komax_csv(io.BytesIO(raw))
+    pd.testing.assert_frame_equal(got, expected, check_exact=True)
+    # None padding of short rows must survive, not become ""
+    assert got.map(type).equals(expected.map(type))
+    assert [type(v) for v in got.index.to_flat_index()] == [type(v) for v in expected.index.to_flat_index()]
+
+
+CASES = {
+    "cr only, quoted field": b'a;b;c\r"x";2;3\r4;5;6\r',
+    "cr only, quoted delimiter": b'a,b,c\r"x,y",2,3\r4,5,6\r',
+    "cr only, short row": b'a;b;c\r"x";2;3\r4;5\r',
+    "mixed endings, quoted": b'a;b;c\r\n"x";2;3\r4;5;6\n7;8;9\r',
+    "mixed endings, unquoted": b"a;b;c\r\nx;2;3\r4;5;6\n7;8;9\r",
+    "quoted newline": b'a;b;c\n"x\ny";2;3\n4;5;6\n',
+    "excel quoted lines, cr": b'"a;b;c"\r"x;2;3"\r"4;5;6"\r',
+    "quoted whitespace only": b'"   "\n',
+    "quoted tab only": b'"\t"',
+    "bom only": b"\xef\xbb\xbf",
+    "bom, quoted header": b'\xef\xbb\xbf"q""uo";b\n1;2\n',
+    "bom, blank first line": b"\xef\xbb\xbf\t\na;b\n1;2\n",
+    "rows wider than header": b"a,b\n1,2,3\n4\n",
+    "wider rows, missing index field": b'a\tb\n"12","x",y\n"12"\n',
+    "cr only, blank line before leading tab": b"  y \t  y \r\r\tx",
+}
+
+
+@pytest.mark.parametrize("raw", CASES.values(), ids=CASES.keys())
+def test_same_frame_as_python_engine(raw):
+    assert_same_outcome(raw)
+
+
+def test_python_engine_errors_are_kept():
+    # Text after a closing quote: the python engine (strict csv) rejects it, so must we
+    raw = b'a,b\r"x"y,1\r2,3\r'
+    with pytest.raises(Exception) as baseline:
+        baseline_read(raw)
+    with pytest.raises(type(baseline.value)):
+        read_komax_csv(io.BytesIO(raw))
+
+
+CELLS = ["", " ", "   ", "\t", "x", "  y ", "12", "1,5", "a;b", "a|b", "a\tb", 'q"uo', '"q"', "ä ö", "é", "NA", "nan"]
+
+
+def random_csv(rng: random.Random) -> bytes:
+    """A small KOMAX-like CSV: any delimiter, ragged rows, quoting, blank lines, mixed endings and encodings."""
+    sep = rng.choice([",", ";", "\t", "|"])
+    width = rng.randint(1, 5)
+    lines = []
+    for _ in range(rng.randint(0, 8)):
+        n = width if rng.random() < 0.7 else max(1, width + rng.randint(-2, 2))
+        cells = []
+        for _ in range(n):
+            v = rng.choice(CELLS)
+            if rng.random() < 0.3 or sep in v or '"' in v:
+                # Mostly proper CSV quoting, sometimes a stray unescaped quote
+                v = '"' + v.replace('"', '""') + '"' if rng.random() < 0.9 else '"' + v + '"'
+            cells.append(v)
+        lines.append(sep.join(cells))
+        if rng.random() < 0.1:
+            lines.append(rng.choice(["", " ", '""', '"  "']))
+    if rng.random() < 0.15:
+        # Excel: every line exported as one quoted field
+        lines = ['"' + line.replace('"', '""') + '"' for line in lines]
+    endings = [rng.choice(["\n", "\r\n", "\r"])] if rng.random() < 0.7 else ["\n", "\r\n", "\r"]
+    text = "".join(line + rng.choice(endings) for line in lines)
+    if rng.random() < 0.1:
+        text = text.rstrip("\r\n")
+    encoding = rng.choice(["utf-8", "latin1", "utf-8-sig"])
+    try:
+        return text.encode(encoding)
+    except UnicodeEncodeError:
+        return text.encode("utf-8")
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_random_files_same_as_python_engine(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        assert_same_outcome(random_csv(rng))
@@ -0,0 +1,86 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from processing import _symbol_cells, stage1_pipeline_11
+
+
+def old_stage1_pipeline_11(df):
+    """The iterrows backfill of the original stage1_pipeline_11, verbatim apart from layout."""
+    df = df.copy()
+    line_name_map = {}
+    line_function_map = {}
+    for idx, row in df.iterrows():
+        for col in ['Name', 'Name.1']:
+            value = str(row[col]).strip()
+            if not value or value == 'nan':
+                continue
+            line_name = str(row.get('Line-Name', '')).strip()
+            if line_name and line_name != 'nan' and value not in line_name_map:
+                line_name_map[value] = line_name
+            line_function = str(row.get('Line-Function', '')).strip()
+            if line_function and line_function != 'nan' and value not in line_function_map:
+                line_function_map[value] = line_function
+    for idx, row in df.iterrows():
+        current_line_name = str(row.get('Line-Name', '')).strip()
+        if not current_line_name or current_line_name == 'nan':
+            for col in ['Name', 'Name.1']:
+                value = str(row[col]).strip()
+                if value and value in line_name_map:
+                    df.at[idx, 'Line-Name'] = line_name_map[value]
+                    break
+        current_line_function = str(row.get('Line-Function', '')).strip()
+        if not current_line_function or current_line_function == 'nan':
+            for col in ['Name', 'Name.1']:
+                value = str(row[col]).strip()
+                if value and value in line_function_map:
+                    df.at[idx, 'Line-Function'] = line_function_map[value]
+                    break
+    if 'Name' in df.columns and 'Name.1' in df.columns:
+        df = df[df['Name'] != df['Name.1']]
+    sort_columns = [c for c in ('Wireno', 'DaisyNo', 'Line-Name') if c in df.columns]
+    if sort_columns:
+        df = df.sort_values(by=sort_columns, ascending=True).reset_index(drop=True)
+    if 'DaisyNo' in df.columns:
+        df['DaisyNo'] = df['DaisyNo'].astype(str)
+    return df
+
+
+SYMBOLS = ["-K1:1", "-K1:2", " -K1:1", "-X2:3 ", "-X2:3", "", " ", "nan", np.nan]
+VALUES = ["1,5", "0,75", " 2,5", "", " ", "nan", np.nan, "CONTROL"]
+
+
+def random_frame(rng, n, columns):
+    data = {
+        "Name": [rng.choice(SYMBOLS) for _ in range(n)],
+        "Name.1": [rng.choice(SYMBOLS) for _ in range(n)],
+        "Wireno": [rng.choice(["10", "20", "230VL"]) for _ in range(n)],
+        "DaisyNo": [rng.choice([1, 2, 3]) for _ in range(n)],
+        "Line-Name": [rng.choice(VALUES) for _ in range(n)],
+        "Line-Function": [rng.choice(VALUES) for _ in range(n)],
+    }
+    return pd.DataFrame({c: data[c] for c in columns}).astype(object)
+
+
+def test_symbol_cells_stack_name_before_name_1():
+    df = pd.DataFrame({"Name": [" -K1:1", np.nan], "Name.1": ["-X2:3", "-K1:2"], "Wireno": ["10", "20"]})
+    cells = _symbol_cells(df, ("Wireno", "Line-Name"))
+    assert cells["Symbol"].tolist() == ["-K1:1", "-X2:3", "nan", "-K1:2"]
+    assert cells["Wireno"].tolist() == ["10", "10", "20", "20"]
+    assert cells["Line-Name"].tolist() == [""] * 4
+    assert cells.index.tolist() == [0, 0, 1, 1]
+
+
+@pytest.mark.parametrize("columns", [
+    ["Name", "Name.1", "Wireno", "DaisyNo", "Line-Name", "Line-Function"],
+    ["Name", "Name.1", "Wireno", "Line-Name"],
+    ["Name", "Name.1", "DaisyNo", "Line-Function"],
+])
+@pytest.mark.parametrize("seed", range(3))
+def test_random_frames_match_the_iterrows_version(columns, seed):
+    rng = random.Random(seed)
+    for _ in range(30):
+        df = random_frame(rng, rng.randint(0, 40), columns)
+        pd.testing.assert_frame_equal(stage1_pipeline_11(df), old_stage1_pipeline_11(df))
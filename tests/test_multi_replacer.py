@@ -0,0 +1,72 @@
+import random
+import re
+
+import numpy as np
+import pandas as pd
+
+from processing import ERROR_CELL_SCRUBBER, STAGE1_TOKEN_REPLACER, MultiReplacer
+
+
+def chained_replace(series, rules):
+    """The str.replace chain of the original stage1_pipeline_3."""
+    series = series.astype(str)
+    for old, new in rules:
+        series = series.str.replace(old, new, regex=False)
+    return series
+
+
+def test_rules_apply_first_listed_first():
+    replacer = MultiReplacer({"DBL": "DBU", "DBLWH": "DBU/WH", "DBUWH": "DBU/WH"})
+    # DBL->DBU runs first, so DBLWH reaches DBUWH->DBU/WH, not the DBLWH rule
+    assert replacer.replace("DBLWH") == "DBU/WH"
+    assert MultiReplacer({"b": "c", "a": "b"}).replace("ab") == "bc"
+    assert MultiReplacer({"a": "b", "b": "c"}).replace("ab") == "cc"
+
+
+def test_value_no_rule_matches_is_the_same_object():
+    value = "".join(["-X1", "02:1"])
+    assert STAGE1_TOKEN_REPLACER.replace(value) is value
+    series = pd.Series(["-K1:A1", "-X102:1", None, 3], dtype=object)
+    assert STAGE1_TOKEN_REPLACER.apply(series) is series
+
+
+def test_non_string_cells_are_left_alone():
+    series = pd.Series(["DBL", np.nan, 1.0, None, "LBL"], dtype=object)
+    out = STAGE1_TOKEN_REPLACER.apply(series)
+    assert out.iloc[[0, 4]].tolist() == ["DBU", "BU"]
+    assert np.isnan(out.iloc[1]) and out.iloc[2] == 1.0 and out.iloc[3] is None
+
+
+def test_stringify_casts_like_astype_str():
+    series = pd.Series(["1,0", 1.0, None, np.nan], dtype=object)
+    out = STAGE1_TOKEN_REPLACER.apply(series, stringify=True)
+    assert out.tolist() == chained_replace(series, STAGE1_TOKEN_REPLACER.rules).tolist()
+    numbers = pd.Series([1, 2])
+    assert STAGE1_TOKEN_REPLACER.apply(numbers, stringify=True).tolist() == ["1", "2"]
+
+
+def test_apply_frame_only_reassigns_changed_columns():
+    df = pd.DataFrame({"a": ["DBL", "x"], "b": ["y", "z"], "n": [1, 2]})
+    untouched = df["b"].to_numpy()
+    out = STAGE1_TOKEN_REPLACER.apply_frame(df)
+    assert out is df
+    assert df["a"].tolist() == ["DBU", "x"]
+    assert np.shares_memory(df["b"].to_numpy(), untouched)
+    assert df["n"].dtype == np.int64
+
+
+def test_regex_rules_match_df_replace():
+    df = pd.DataFrame({"a": ["Error 4", "no error here", "ok", None, "ERROR"], "b": [1, 2, 3, 4, 5]})
+    expected = df.replace(r'.*[Ee]rror.*', '', regex=True)
+    pd.testing.assert_frame_equal(ERROR_CELL_SCRUBBER.apply_frame(df.copy()), expected)
+
+
+def test_random_tokens_match_the_replace_chain():
+    rng = random.Random(0)
+    pieces = [old for old, _ in STAGE1_TOKEN_REPLACER.rules] + ["-X1", ":", "WH", "VDC", ".", "1", "0", ",", "N"]
+    values = ["".join(rng.choice(pieces) for _ in range(rng.randint(0, 6))) for _ in range(3000)]
+    series = pd.Series(values, dtype=object)
+    expected = chained_replace(series, STAGE1_TOKEN_REPLACER.rules)
+    pd.testing.assert_series_equal(STAGE1_TOKEN_REPLACER.apply(series), expected)
+    gated = [v for v in set(values) if not re.search("|".join(map(re.escape, dict(STAGE1_TOKEN_REPLACER.rules))), v)]
+    assert all(STAGE1_TOKEN_REPLACER.replace(v) is v for v in gated)
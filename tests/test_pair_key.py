@@ -0,0 +1,76 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from processing import _drop_duplicate_pairs, _pair_key, stage1_pipeline_18
+
+
+def same_groups(key, tuples):
+    """Two rows share a key exactly when they share a tuple."""
+    n = len(tuples)
+    return all((key[i] == key[j]) == (tuples[i] == tuples[j]) for i in range(n) for j in range(n))
+
+
+def old_swapped_key(row):
+    """create_normalized_key of the original stage1_pipeline_18."""
+    name = str(row.get('Name', '')).strip()
+    name1 = str(row.get('Name.1', '')).strip()
+    rest = tuple(str(row.get(c, '')).strip() for c in ('Wireno', 'Line-Function', 'Line-Name'))
+    if not name or not name1 or name == name1:
+        return (name, name1) + rest
+    return (tuple(sorted([name, name1])),) + rest
+
+
+def test_ordered_and_unordered_keys():
+    left, right = ["a", "b", "a", "b", None], ["b", "a", "b", "b", "a"]
+    ordered = _pair_key(left, right)
+    assert ordered[0] == ordered[2] and ordered[0] != ordered[1]
+    unordered = _pair_key(left, right, unordered=True)
+    assert unordered[0] == unordered[1] == unordered[2] and len(set(unordered)) == 3
+    # Only masked rows are swapped
+    masked = _pair_key(left, right, unordered=np.array([False, True, False, False, False]))
+    assert masked[0] == masked[1]
+    masked = _pair_key(left, right, unordered=np.array([True, False, False, False, False]))
+    assert masked[0] != masked[1]
+
+
+def test_missing_values_match_each_other():
+    key = _pair_key([None, np.nan, "a"], ["x", "x", "x"])
+    assert key[0] == key[1] != key[2]
+
+
+def test_by_columns_split_groups():
+    key = _pair_key(["a", "b", "a"], ["b", "a", "b"], unordered=True, by=[["1", "1", "2"]])
+    assert key[0] == key[1] != key[2]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_pairs(seed):
+    rng = random.Random(seed)
+    values = ["a", "b", "c", "", None, np.nan]
+    for _ in range(50):
+        n = rng.randint(0, 25)
+        df = pd.DataFrame({"Name": [rng.choice(values) for _ in range(n)],
+                           "Name.1": [rng.choice(values) for _ in range(n)],
+                           "W": [rng.choice("xy") for _ in range(n)]}, dtype=object)
+        pd.testing.assert_frame_equal(_drop_duplicate_pairs(df), df.drop_duplicates(subset=["Name", "Name.1"]))
+        left, right = (df[c].where(df[c].notna(), None) for c in ("Name", "Name.1"))
+        tuples = [(frozenset((a, b)), w) for a, b, w in zip(left, right, df["W"])]
+        assert same_groups(_pair_key(df["Name"], df["Name.1"], True, by=[df["W"]]), tuples)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_swapped_duplicates_match_the_old_key(seed):
+    rng = random.Random(seed)
+    names = ["-F901:1", "-F901:2", " -F901:1", "", " ", np.nan, "-K1:A1"]
+    for _ in range(40):
+        n = rng.randint(1, 25)
+        df = pd.DataFrame({"Name": [rng.choice(names) for _ in range(n)],
+                           "Name.1": [rng.choice(names) for _ in range(n)],
+                           "Wireno": [rng.choice(["230VL", "230VL ", "10"]) for _ in range(n)],
+                           "Line-Function": [rng.choice(["RD", "BU", np.nan]) for _ in range(n)]}, dtype=object)
+        keys = df.apply(old_swapped_key, axis=1)
+        expected = df[~keys.duplicated().to_numpy()].reset_index(drop=True)
+        pd.testing.assert_frame_equal(stage1_pipeline_18(df), expected)
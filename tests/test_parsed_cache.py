@@ -0,0 +1,70 @@
+import io
+
+import pandas as pd
+import pytest
+
+import bom_processing
+from bom_processing import PARSED_CACHE, read_excel_cached
+from caching import LRUCache
+
+
+def workbook(**sheets):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+    return buffer.getvalue()
+
+
+RAW = workbook(First=pd.DataFrame({"No.": ["A100", "A200"], "Quantity": [1, 2]}), Second=pd.DataFrame({"A": [1]}))
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Count the workbook parses behind the cache, starting from an empty cache."""
+    calls = []
+    read_excel = pd.read_excel
+
+    def counting(*args, **kwargs):
+        calls.append(kwargs)
+        return read_excel(*args, **kwargs)
+
+    monkeypatch.setattr(bom_processing.pd, "read_excel", counting)
+    PARSED_CACHE.clear()
+    yield calls
+    PARSED_CACHE.clear()
+
+
+def test_same_bytes_and_options_parse_once(parses):
+    first = read_excel_cached(RAW)
+    second = read_excel_cached(bytes(RAW))
+    assert len(parses) == 1
+    pd.testing.assert_frame_equal(first, second)
+    pd.testing.assert_frame_equal(first, pd.read_excel(io.BytesIO(RAW)))
+
+
+def test_other_bytes_or_options_miss(parses):
+    read_excel_cached(RAW)
+    read_excel_cached(RAW, skiprows=1)
+    read_excel_cached(RAW, fallback=False)
+    read_excel_cached(workbook(First=pd.DataFrame({"No.": ["300"]})))
+    assert len(parses) == 4
+    assert PARSED_CACHE.stats()["misses"] == 4
+
+
+def test_callers_get_private_copies(parses):
+    book = read_excel_cached(RAW, sheet_name=None)
+    book["First"].loc[0, "Quantity"] = 99
+    del book["Second"]
+    again = read_excel_cached(RAW, sheet_name=None)
+    assert list(again) == ["First", "Second"] and again["First"].loc[0, "Quantity"] == 1
+    assert len(parses) == 1
+
+
+def test_byte_budget_evicts_oldest():
+    frame = pd.DataFrame({"a": range(1000)})
+    cache = LRUCache(maxsize=10, max_bytes=int(frame.memory_usage(index=True, deep=True).sum() * 2.5))
+    for key in "abc":
+        cache.put(key, frame)
+    assert cache.get("a") is None and cache.get("c") is frame
+    assert len(cache) == 2 and cache.stats()["evictions"] == 1
@@ -0,0 +1,74 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bom_processing import PartCatalog, coalesce_cols, ensure_scalar_strings, part_catalog, pipeline_3A_3_nav
+
+
+def old_nav(df_bom, df_part_no):
+    """The merge-based pipeline_3A_3_nav of the original stage3_bom.py."""
+    if df_bom is None or df_bom.empty: return pd.DataFrame()
+    part=df_part_no.copy().reset_index(drop=True).rename(columns=lambda c:str(c).strip())
+    part["Norm_B"]=part["PartName_B"].astype(str).str.upper().str.replace(" ","").str.strip()
+    def _n(x):
+        try: return str(int(float(str(x).strip().replace(",","."))))
+        except Exception: return str(x).strip()
+    part["PartNo_A"]=part["PartNo_A"].map(_n).fillna("").astype(str)
+    part=part.drop_duplicates(subset=["Norm_B"],keep="first").drop_duplicates(subset=["PartNo_A"],keep="first")
+    df=df_bom.copy(); df["Norm_Type"]=df["Original Type"].astype(str).str.upper().str.replace(" ","").str.strip()
+    df["No."]=df["Norm_Type"].map(dict(zip(part["Norm_B"],part["PartNo_A"]))).fillna("").astype(str)
+    merge_cols=[c for c in ["PartNo_A","Desc_C","Manufacturer_D","SupplierNo_E","UnitPrice_F","Norm_B"] if c in part.columns]
+    df=df.merge(part[merge_cols],left_on="No.",right_on="PartNo_A",how="left",suffixes=("","_dup"))
+    df=df.rename(columns={"Desc_C":"Description","Manufacturer_D":"Supplier","SupplierNo_E":"Supplier No.","UnitPrice_F":"Unit Cost"})
+    df=coalesce_cols(df,"Description",["Description_dup","Desc_C"]); df=coalesce_cols(df,"Supplier",["Supplier_dup"]); df=coalesce_cols(df,"Supplier No.",["Supplier No._dup"]); df=coalesce_cols(df,"Unit Cost",["Unit Cost_dup"])
+    df=df.drop(columns=[c for c in ["Norm_Type","Norm_B","PartNo_A"] if c in df.columns],errors="ignore")
+    return ensure_scalar_strings(df)
+
+
+def part_no(rows):
+    return pd.DataFrame(rows, columns=["PartNo_A", "PartName_B", "Desc_C", "Manufacturer_D", "SupplierNo_E", "UnitPrice_F"])
+
+
+def bom(*types):
+    return pd.DataFrame({"Original Type": list(types), "Quantity": [1.0] * len(types)})
+
+
+def test_first_row_wins_on_type_and_number():
+    catalog = PartCatalog(part_no([
+        (1001, "ab 1", "first", "M", "S1", 1.5),
+        (1002, "AB1", "same type", "M", "S2", 2.0),
+        ("1001,0", "CD2", "same number", "M", "S3", 3.0),
+        (1003, "EF3", "third", "M", "S4", 4.0),
+    ]))
+    assert len(catalog) == 2
+    no, records = catalog.lookup(pd.Series(["AB 1", "cd2", "ef3", "zz"]))
+    assert no.tolist() == ["1001", "", "1003", ""]
+    assert records.loc[[0, 2], "Description"].tolist() == ["first", "third"]
+    assert records["Description"].isna().tolist() == [False, True, False, True]
+
+
+def test_unknown_type_picks_up_a_part_without_a_number():
+    catalog = PartCatalog(part_no([(1001, "AB1", "a", "M", "S", 1.0), (" ", "CD2", "no number", "M", "S", 2.0)]))
+    no, records = catalog.lookup(pd.Series(["unknown"]))
+    assert no.tolist() == [""] and records["Description"].tolist() == ["no number"]
+
+
+def test_catalog_is_reused_per_data_digest():
+    sheet = part_no([(1001, "AB1", "a", "M", "S", 1.0)])
+    assert part_catalog(sheet, data_digest="d1") is part_catalog(sheet, data_digest="d1")
+    assert part_catalog(sheet) is not part_catalog(sheet)
+    assert part_catalog(sheet.drop(columns="PartNo_A")) is None
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_sheets_match_the_merge(seed):
+    rng = random.Random(seed)
+    numbers = [1001, 1002, "1003", "1001.0", "X-7", " 1004 ", np.nan, ""]
+    names = ["AB1", "ab 1", "CD2", " cd2", "EF3", "GH4", np.nan, ""]
+    for _ in range(30):
+        sheet = part_no([(rng.choice(numbers), rng.choice(names), rng.choice(["d", np.nan, 5]), rng.choice(["M", np.nan]),
+                          rng.choice(["S", 7]), rng.choice([1.5, np.nan, 2])) for _ in range(rng.randint(1, 12))])
+        df = bom(*[rng.choice(names + ["ZZ", 12]) for _ in range(rng.randint(1, 15))])
+        pd.testing.assert_frame_equal(pipeline_3A_3_nav(df, sheet), old_nav(df, sheet))
@@ -0,0 +1,68 @@
+import pandas as pd
+
+from caching import LRUCache
+from instrumentation import count
+from pipeline_registry import PipelineRegistry, PipelineStage
+
+
+def add_one(df):
+    count("touched", len(df))
+    return df.assign(x=df["x"] + 1)
+
+
+def drop_first(df):
+    return df.iloc[1:]
+
+
+def registry(**kwargs):
+    return PipelineRegistry("test", [PipelineStage("add_one", add_one), PipelineStage("drop_first", drop_first)], **kwargs)
+
+
+def test_unchanged_input_replays_the_cached_result():
+    reg = registry()
+    df = pd.DataFrame({"x": [1, 2, 3]})
+    first, reports = reg.run(df)
+    second, cached = reg.run(df)
+    pd.testing.assert_frame_equal(first, second)
+    assert [r.cached for r in reports] == [False, False]
+    assert [r.cached for r in cached] == [True, True]
+    assert [(r.rows_in, r.rows_out, r.counters) for r in cached] == [(r.rows_in, r.rows_out, r.counters) for r in reports]
+    # Only the chain result is kept, not one frame per stage
+    assert len(reg.cache) == 1
+
+
+def test_result_is_not_shared_with_the_cache():
+    reg = registry()
+    df = pd.DataFrame({"x": [1, 2, 3]})
+    out, _ = reg.run(df)
+    out.loc[out.index[0], "x"] = 100
+    again, _ = reg.run(df)
+    assert again["x"].tolist() == [3, 4]
+
+
+def test_cache_can_be_turned_off():
+    df = pd.DataFrame({"x": [1, 2, 3]})
+    reg = registry()
+    reg.run(df, use_cache=False)
+    assert len(reg.cache) == 0
+    reg = registry(cache=None)
+    _, reports = reg.run(df)
+    _, reports = reg.run(df)
+    assert not any(r.cached for r in reports)
+    assert reg.with_overrides({}).cache is None
+
+
+def test_results_over_the_byte_budget_are_not_kept():
+    reg = registry(cache=LRUCache(maxsize=16, max_bytes=10))
+    reg.run(pd.DataFrame({"x": range(100)}))
+    assert len(reg.cache) == 0
+
+
+def test_run_leaves_the_copy_on_write_option_alone():
+    seen = []
+    reg = PipelineRegistry("test", [PipelineStage("probe", lambda df: seen.append(pd.get_option("mode.copy_on_write")) or df)],
+                           cache=None)
+    before = pd.get_option("mode.copy_on_write")
+    reg.run(pd.DataFrame({"x": [1]}))
+    assert seen == [before]
+    assert pd.get_option("mode.copy_on_write") == before
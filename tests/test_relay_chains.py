@@ -0,0 +1,58 @@
+import random
+
+from processing import resolve_relay_chains
+
+
+def walk(relay_map, start):
+    """Follow the map one hop at a time until a non -R symbol or a symbol seen before."""
+    seen = []
+    node = start
+    while isinstance(node, str) and node.startswith("-R") and node in relay_map and node not in seen:
+        seen.append(node)
+        node = relay_map[node]
+    return node
+
+
+def test_chain_ends_at_first_non_relay_symbol():
+    terminal, cycles = resolve_relay_chains({"-R1:1": "-R2:1", "-R2:1": "-R3:1", "-R3:1": "-K5:A1"})
+    assert terminal == {"-R1:1": "-K5:A1", "-R2:1": "-K5:A1", "-R3:1": "-K5:A1"}
+    assert cycles == []
+
+
+def test_unmapped_relay_symbol_is_terminal():
+    terminal, _ = resolve_relay_chains({"-R1:1": "-R9:1", "-R2:1": None})
+    assert terminal == {"-R1:1": "-R9:1", "-R2:1": None}
+
+
+def test_cycles_are_reported_and_resolve_to_themselves():
+    terminal, cycles = resolve_relay_chains({"-R1": "-R2", "-R2": "-R3", "-R3": "-R1", "-R4": "-R4"})
+    assert cycles == [["-R1", "-R2", "-R3"], ["-R4"]]
+    assert terminal == {"-R1": "-R1", "-R2": "-R2", "-R3": "-R3", "-R4": "-R4"}
+
+
+def test_entry_into_a_cycle_resolves_to_the_cycle_entry():
+    relay_map = {"-R0": "-R1", "-R1": "-R2", "-R2": "-R3", "-R3": "-R2", "-R5": "-R0"}
+    terminal, cycles = resolve_relay_chains(relay_map)
+    assert cycles == [["-R2", "-R3"]]
+    assert terminal == {"-R0": "-R2", "-R1": "-R2", "-R2": "-R2", "-R3": "-R3", "-R5": "-R2"}
+
+
+def test_long_chain():
+    n = 50000
+    relay_map = {f"-R{i}": f"-R{i + 1}" for i in range(n)}
+    relay_map[f"-R{n}"] = "-X1:1"
+    terminal, cycles = resolve_relay_chains(relay_map)
+    assert set(terminal.values()) == {"-X1:1"} and len(terminal) == n + 1 and cycles == []
+
+
+def test_random_maps_match_a_plain_walk():
+    rng = random.Random(0)
+    for _ in range(300):
+        symbols = [f"-R{i}" for i in range(rng.randint(1, 12))] + ["-K1:A1", "-X2:3"]
+        relay_map = {s: rng.choice(symbols) for s in symbols if s.startswith("-R") and rng.random() < 0.9}
+        terminal, cycles = resolve_relay_chains(relay_map)
+        in_cycle = {s for cycle in cycles for s in cycle}
+        for start in relay_map:
+            assert terminal[start] == (start if start in in_cycle else walk(relay_map, start))
+        for cycle in cycles:
+            assert [relay_map[s] for s in cycle] == cycle[1:] + cycle[:1]
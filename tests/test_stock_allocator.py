@@ -0,0 +1,175 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bom_processing import ALLOC_LOCATION_CODE, PURCHASE_LOCATION_CODE, StockAllocator, _job_journal
+
+PN = "1234-567"
+EXCLUDED = StockAllocator.EXCLUDED_BIN
+
+
+def allocate_from_stock(no, qty_needed, stock_rows):
+    """The per-line allocation of the original stage3_bom.py, verbatim."""
+    allocations = []
+    qty_needed = float(pd.to_numeric(pd.Series([qty_needed]), errors="coerce").fillna(0).iloc[0])
+    remaining = qty_needed
+    if stock_rows is not None and not stock_rows.empty:
+        for _, srow in stock_rows.iterrows():
+            if remaining <= 0:
+                break
+            bin_code = str(srow.get("Bin Code", "")).strip()
+            stock_qty = float(pd.to_numeric(pd.Series([srow.get("Quantity", 0)]), errors="coerce").fillna(0).iloc[0])
+            if stock_qty <= 0:
+                continue
+            if bin_code == "67-01-01-01":
+                continue
+            take = min(stock_qty, remaining)
+            if take > 0:
+                allocations.append({"No.": no, "Bin Code": bin_code, "Allocated Qty": take})
+                remaining -= take
+    if remaining > 0:
+        allocations.append({"No.": no, "Bin Code": "", "Allocated Qty": remaining})
+    return allocations
+
+
+def old_job_journal(df, stock):
+    """Job journal rows of the original pipeline_3A_4_stock / pipeline_3A_5_tables."""
+    groups = {k: v for k, v in stock.groupby("No.")}
+    rows = []
+    for _, row in df.iterrows():
+        no, qty = row["No."], float(row["Quantity"])
+        base = {"Entry Type": "Item", "No.": no, "Job No.": PN, "Job Task No.": 1144}
+        tail = {"Description": row.get("Description", ""), "Original Type": row.get("Original Type", "")}
+        stock_rows = groups.get(no)
+        if stock_rows is None or stock_rows.empty:
+            rows.append({**base, "Document No.": f"{PN}/N", "Quantity": qty, "Location Code": PURCHASE_LOCATION_CODE,
+                         "Bin Code": "", **tail})
+            continue
+        for alloc in allocate_from_stock(no, qty, stock_rows):
+            rows.append({**base, "Document No.": PN, "Quantity": alloc["Allocated Qty"],
+                         "Location Code": ALLOC_LOCATION_CODE if alloc["Bin Code"] else PURCHASE_LOCATION_CODE,
+                         "Bin Code": alloc["Bin Code"], **tail})
+    return pd.DataFrame(rows)
+
+
+def sequential_allocation(stock, nos, qtys):
+    """
+    allocate_from_stock line after line on the stock the earlier lines left
+    (what deplete=True promises), as (line, bin, qty, stock row) tuples.
+    """
+    left = stock["Quantity"].astype(float).to_numpy().copy()
+    out = []
+    for line, (no, qty) in enumerate(zip(nos, qtys)):
+        rows = np.flatnonzero(stock["No."].to_numpy() == no)
+        if not len(rows):
+            out.append((line, None, qty, -1))
+            continue
+        remaining = 0.0 if np.isnan(qty) else qty
+        for i in rows:
+            if remaining <= 0:
+                break
+            if left[i] <= 0 or stock["Bin Code"].iloc[i] == EXCLUDED:
+                continue
+            take = min(left[i], remaining)
+            out.append((line, stock["Bin Code"].iloc[i], take, i))
+            left[i] -= take
+            remaining -= take
+        if remaining > StockAllocator.EPS:
+            out.append((line, "", remaining, -1))
+    return out
+
+
+def stock_frame(rows):
+    return pd.DataFrame(rows, columns=["No.", "Bin Code", "Quantity"])
+
+
+def lines(*pairs):
+    return pd.DataFrame({"No.": [p[0] for p in pairs], "Quantity": [p[1] for p in pairs],
+                         "Description": [f"d{i}" for i in range(len(pairs))], "Original Type": "T"})
+
+
+def assert_journal_matches(df, stock):
+    got = _job_journal(df, PN, StockAllocator(stock))
+    expected = old_job_journal(df, stock)
+    if expected.empty:
+        assert got.empty
+        return
+    pd.testing.assert_frame_equal(got[expected.columns], expected, check_dtype=False)
+
+
+def assert_allocation_matches(stock, nos, qtys):
+    line, bins, qty, rows = StockAllocator(stock).allocate(np.array(nos, dtype=object), np.array(qtys, dtype=float),
+                                                           deplete=True)
+    got = list(zip(line.tolist(), bins.tolist(), qty.tolist(), rows.tolist()))
+    expected = sequential_allocation(stock, nos, np.array(qtys, dtype=float))
+    assert [(g[0], g[1], g[3]) for g in got] == [(e[0], e[1], e[3]) for e in expected]
+    np.testing.assert_allclose([g[2] for g in got], [e[2] for e in expected], rtol=0, atol=1e-9)
+
+
+STOCK = stock_frame([
+    ("100", "A-1", 2), ("100", EXCLUDED, 50), ("100", "A-2", 0), ("100", "A-3", 3),
+    ("200", EXCLUDED, 10), ("200", EXCLUDED, 4),
+    ("300", "C-1", -2), ("300", "C-2", 0.25), ("300", "C-3", 0.5),
+])
+
+
+@pytest.mark.parametrize("qty", [0, -1, -0.5])
+def test_zero_or_negative_need(qty):
+    # Parts with stock rows get no line at all; parts without stock rows keep their /N line
+    assert_journal_matches(lines(("100", qty), ("200", qty), ("999", qty)), STOCK)
+
+
+def test_all_bins_excluded_buys_without_the_n_document():
+    journal = _job_journal(lines(("200", 3)), PN, StockAllocator(STOCK))
+    assert journal[["Document No.", "Bin Code", "Quantity"]].values.tolist() == [[PN, "", 3.0]]
+    assert_journal_matches(lines(("200", 3)), STOCK)
+
+
+def test_n_document_only_for_parts_without_stock_rows():
+    journal = _job_journal(lines(("999", 2), ("100", 9)), PN, StockAllocator(STOCK))
+    assert journal["Document No."].tolist() == [f"{PN}/N", PN, PN, PN]
+    assert_journal_matches(lines(("999", 2), ("100", 9)), STOCK)
+
+
+def test_empty_and_negative_bins_are_skipped():
+    assert_journal_matches(lines(("100", 4), ("300", 1)), STOCK)
+
+
+@pytest.mark.parametrize("qty", [0.1, 0.3, 0.75, 5.2, 2.0000000001])
+def test_fractional_quantities(qty):
+    stock = stock_frame([("100", "A-1", 0.1), ("100", "A-2", 0.2), ("100", "A-3", 0.4)])
+    assert_journal_matches(lines(("100", qty), ("100", qty / 3)), stock)
+
+
+def test_lines_do_not_deplete_each_other_by_default():
+    journal = _job_journal(lines(("100", 6), ("100", 6)), PN, StockAllocator(STOCK))
+    assert journal[["Bin Code", "Quantity"]].values.tolist() == [["A-1", 2.0], ["A-3", 3.0], ["", 1.0]] * 2
+    assert_journal_matches(lines(("100", 6), ("100", 6)), STOCK)
+
+
+def test_repeated_part_depletes_in_line_order():
+    nos = ["100", "300", "100", "100", "200", "100"]
+    qtys = [1, 0.5, 3, 0, 2, 1.5]
+    assert_allocation_matches(STOCK, nos, qtys)
+    line, bins, qty, _ = StockAllocator(STOCK).allocate(np.array(nos, dtype=object), np.array(qtys, dtype=float),
+                                                        deplete=True)
+    # 100: A-1 (2) then A-3 (3) are shared by lines 0, 2 and 5
+    part_100 = [(l, b, q) for l, b, q in zip(line, bins, qty) if nos[l] == "100"]
+    assert part_100 == [(0, "A-1", 1.0), (2, "A-1", 1.0), (2, "A-3", 2.0), (5, "A-3", 1.0), (5, "", 0.5)]
+
+
+def test_depleting_with_zero_negative_and_nan_needs():
+    assert_allocation_matches(STOCK, ["100", "100", "100", "999", "100"], [-1, 0, np.nan, 2, 6])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_stock_against_old_semantics(seed):
+    rng = random.Random(seed)
+    for _ in range(40):
+        stock = stock_frame([(rng.choice("123"), rng.choice(["a", "b", "c", EXCLUDED]), rng.choice([0, 1, 2, 0.5, 3, -1, 0.1]))
+                             for _ in range(rng.randint(0, 12))])
+        pairs = [(rng.choice("1234"), rng.choice([1, 2, 0.5, 0, -1, 4, 0.3])) for _ in range(rng.randint(1, 10))]
+        assert_journal_matches(lines(*pairs), stock)
+        assert_allocation_matches(stock, [p[0] for p in pairs], [p[1] for p in pairs])
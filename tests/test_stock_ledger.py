@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+from bom_processing import StockAllocator
+from stock_ledger import StockLedger
+
+STOCK = StockAllocator(pd.DataFrame({
+    "No.": ["100", "100", "200", "300"],
+    "Bin Code": ["A-1", "A-2", "B-1", StockAllocator.EXCLUDED_BIN],
+    "Quantity": [5.0, 3.0, 4.0, 9.0],
+}))
+
+
+def journal(*pairs):
+    return pd.DataFrame({"No.": [p[0] for p in pairs], "Quantity": [p[1] for p in pairs]})
+
+
+def taken(allocation):
+    """[(line, bin, qty)] of one allocated frame."""
+    line, bins, qty, _ = allocation
+    return list(zip(line.tolist(), bins.tolist(), qty.tolist()))
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return StockLedger(str(tmp_path / "ledger.sqlite"))
+
+
+def test_records_per_row_quantities(ledger):
+    ledger.reserve(STOCK, [("P1", [journal(("100", 4), ("100", 3), ("200", 1), ("999", 2))])])
+    # Lines 0 and 1 share row 0 / row 1; the /N line and purchases reserve nothing
+    assert ledger.reserved(STOCK.key) == {0: 5.0, 1: 2.0, 2: 1.0}
+    summary = ledger.summary(STOCK.key)
+    assert summary[["project", "rows", "qty"]].values.tolist() == [["P1", 3, 8.0]]
+
+
+def test_other_projects_holdings_are_subtracted(ledger):
+    ledger.reserve(STOCK, [("P1", [journal(("100", 6))])])
+    got = ledger.reserve(STOCK, [("P2", [journal(("100", 4), ("200", 2))])])
+    # P1 holds all of A-1 and one of A-2
+    assert taken(got["P2"][0]) == [(0, "A-2", 2.0), (0, "", 2.0), (1, "B-1", 2.0)]
+    assert ledger.reserved(STOCK.key) == {0: 5.0, 1: 3.0, 2: 2.0}
+
+
+def test_rerun_replaces_own_reservations(ledger):
+    ledger.reserve(STOCK, [("P1", [journal(("100", 6))])])
+    got = ledger.reserve(STOCK, [("P1", [journal(("100", 2))])])
+    # The project's earlier reservation does not count against it
+    assert taken(got["P1"][0]) == [(0, "A-1", 2.0)]
+    assert ledger.reserved(STOCK.key) == {0: 2.0}
+    assert ledger.summary()["project"].tolist() == ["P1"]
+
+
+def test_priority_order_competes_for_one_bin(ledger):
+    got = ledger.reserve(STOCK, [("P1", [journal(("200", 3))]), ("P2", [journal(("200", 3))])])
+    assert taken(got["P1"][0]) == [(0, "B-1", 3.0)]
+    assert taken(got["P2"][0]) == [(0, "B-1", 1.0), (0, "", 2.0)]
+    assert ledger.reserved(STOCK.key) == {2: 4.0}
+    # Re-ordered, P1's standing reservation still counts until P1's own turn replaces it
+    got = ledger.reserve(STOCK, [("P2", [journal(("200", 3))]), ("P1", [journal(("200", 3))])])
+    assert taken(got["P2"][0]) == [(0, "B-1", 1.0), (0, "", 2.0)]
+    assert taken(got["P1"][0]) == [(0, "B-1", 3.0)]
+    assert ledger.reserved(STOCK.key) == {2: 4.0}
+    ledger.release("P1")
+    got = ledger.reserve(STOCK, [("P2", [journal(("200", 3))]), ("P1", [journal(("200", 3))])])
+    assert taken(got["P2"][0]) == [(0, "B-1", 3.0)]
+    assert taken(got["P1"][0]) == [(0, "B-1", 1.0), (0, "", 2.0)]
+
+
+def test_frames_of_one_project_deplete_in_turn(ledger):
+    got = ledger.reserve(STOCK, [("P1", [journal(("100", 6)), None, journal(("100", 3))])])
+    assert got["P1"][1] is None
+    assert taken(got["P1"][2]) == [(0, "A-2", 2.0), (0, "", 1.0)]
+
+
+def test_release(ledger):
+    other = StockAllocator(STOCK.stock.assign(Quantity=[1.0, 1.0, 1.0, 1.0]))
+    ledger.reserve(STOCK, [("P1", [journal(("100", 6))]), ("P2", [journal(("200", 1))])])
+    ledger.reserve(other, [("P1", [journal(("200", 1))])])
+    assert ledger.release("P1", STOCK.key) == 2
+    assert ledger.reserved(STOCK.key) == {2: 1.0}
+    assert ledger.reserved(other.key) == {2: 1.0}
+    assert ledger.release("P1") == 1
+    assert ledger.release("P1") == 0
+    got = ledger.reserve(STOCK, [("P3", [journal(("100", 8))])])
+    assert taken(got["P3"][0]) == [(0, "A-1", 5.0), (0, "A-2", 3.0)]
+
+
+def test_failed_reserve_rolls_back(ledger):
+    ledger.reserve(STOCK, [("P1", [journal(("100", 2))])])
+    with pytest.raises(Exception):
+        ledger.reserve(STOCK, [("P1", [journal(("100", 6))]), ("P2", [object()])])
+    assert ledger.reserved(STOCK.key) == {0: 2.0}
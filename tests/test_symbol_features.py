@@ -0,0 +1,78 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from processing import SYMBOL_FLAGS, SymbolFeatures
+
+SYMBOLS = ["-X102:1", "-X102:PE", "-G90A3:1", "-G1BAT:+", "-T81:S2", "-T901:1", "-F901.1:2", "-F901:3",
+           "-K924:A1", "-M923:N", "-X1:230VL2", "-A5:J12", "-A5:K1", "-EKF:1", "-EKF:2", "", np.nan, 3.0]
+
+
+def frame(rng, n):
+    return pd.DataFrame({"Name": [rng.choice(SYMBOLS) for _ in range(n)],
+                         "Name.1": [rng.choice(SYMBOLS) for _ in range(n)]})
+
+
+def assert_same_answers(feats, df):
+    fresh = SymbolFeatures(df)
+    assert feats.n_rows == fresh.n_rows == len(df)
+    for name in SYMBOL_FLAGS:
+        for columns in (None, ["Name"], ["Name.1"]):
+            np.testing.assert_array_equal(feats.mask(name, columns), fresh.mask(name, columns))
+            assert feats.any(name, columns) == fresh.any(name, columns)
+            assert feats.values(name, columns) == fresh.values(name, columns)
+    assert feats.components_with_pins({"1", "2"}) == fresh.components_with_pins({"1", "2"})
+
+
+def test_markers_match_row_by_row_string_tests():
+    df = frame(random.Random(0), 200)
+    feats = SymbolFeatures(df)
+    name = df["Name"].where(df["Name"].map(lambda v: isinstance(v, str)))
+    np.testing.assert_array_equal(feats.mask("x102", ["Name"]), name.str.startswith("-X102:", na=False))
+    np.testing.assert_array_equal(feats.mask("t8x_s2", ["Name"]), name.str.match(r"-T8.*:S2", na=False))
+    np.testing.assert_array_equal(feats.mask(("equals", "-F901:3"), ["Name"]), (name == "-F901:3").to_numpy())
+
+
+def test_components_with_every_pin():
+    feats = SymbolFeatures(pd.DataFrame({"Name": ["-EKF:1", "-A5:1", "-EKF:3"], "Name.1": ["-A5:2", "-EKF:2", "-B1:1"]}))
+    assert feats.components_with_pins({"1", "2"}) == {"-EKF", "-A5"}
+    assert feats.components_with_pins({"1", "2", "3"}) == {"-EKF"}
+    assert feats.components_with_pins({"1", "2"}, columns=["Name"]) == set()
+
+
+def test_non_strings_never_match():
+    feats = SymbolFeatures(pd.DataFrame({"Name": [np.nan, 3.0, None], "Name.1": ["x", "y", "z"]}))
+    assert not feats.mask(("search", ".*"), ["Name"]).any()
+    with pytest.raises(ValueError):
+        feats.flag(("nope", None))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_take_matches_a_fresh_index(seed):
+    rng = random.Random(seed)
+    df = frame(rng, rng.randint(0, 60))
+    feats = SymbolFeatures(df)
+    feats.mask("x102")
+    keep = np.array([rng.random() < 0.5 for _ in range(len(df))], dtype=bool)
+    assert_same_answers(feats.take(keep), df[keep])
+    positions = np.flatnonzero(~keep)
+    assert_same_answers(feats.take(positions), df.iloc[positions])
+    # The view shares the parent's memo
+    assert feats.take(keep)._memo is feats._memo
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_extend_matches_a_fresh_index(seed):
+    rng = random.Random(seed)
+    df = frame(rng, rng.randint(0, 40))
+    feats = SymbolFeatures(df)
+    for name in SYMBOL_FLAGS:
+        feats.flag(name)
+    rows = pd.DataFrame({"Name": ["-X102:9", rng.choice(SYMBOLS), "-NEW:1"], "Name.1": [rng.choice(SYMBOLS), np.nan, "-EKF:2"]})
+    assert_same_answers(feats.extend(rows), pd.concat([df, rows], ignore_index=True))
+    # A row frame without Name.1 leaves those cells empty
+    only_name = pd.DataFrame({"Name": ["-G90A3:2"]})
+    extended = feats.extend(only_name)
+    assert extended.mask("g90a3").tolist()[-1] and extended.codes["Name.1"][-1] == -1
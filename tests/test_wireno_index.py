@@ -0,0 +1,79 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from processing import WirenoIndex
+
+
+def frame(*rows):
+    return pd.DataFrame(rows, columns=["Name", "Name.1", "Wireno"])
+
+
+def first_wireno(df, precedence):
+    """Symbol -> Wireno by a loop over the rows, first non-empty Wireno wins."""
+    if precedence == "name_first":
+        cells = [(n, w) for n, w in zip(df["Name"], df["Wireno"])] + [(n, w) for n, w in zip(df["Name.1"], df["Wireno"])]
+    else:
+        cells = [(n, w) for a, b, w in zip(df["Name"], df["Name.1"], df["Wireno"]) for n in (a, b)]
+    mapping = {}
+    for symbol, wireno in cells:
+        if isinstance(wireno, str) and wireno != "" and symbol not in mapping:
+            mapping[symbol] = wireno
+    return mapping
+
+
+def test_precedence():
+    df = frame(("-K1:1", "-X1:1", "10"), ("-X1:1", "-K2:1", "20"))
+    assert WirenoIndex.from_frame(df, precedence="row").mapping == {"-K1:1": "10", "-X1:1": "10", "-K2:1": "20"}
+    # name_first: the Name of row 1 outranks the Name.1 of row 0
+    assert WirenoIndex.from_frame(df, precedence="name_first").mapping == {"-K1:1": "10", "-X1:1": "20", "-K2:1": "20"}
+    with pytest.raises(ValueError):
+        WirenoIndex("column")
+
+
+def test_blank_wireno_is_not_indexed():
+    index = WirenoIndex.from_frame(frame(("-K1:1", "-X1:1", ""), ("-K1:1", "-X2:1", None), ("-K1:1", "-X3:1", "7")))
+    assert index.mapping == {"-K1:1": "7", "-X3:1": "7"}
+    assert "-X1:1" not in index and index.lookup("-X1:1") == "" and index.lookup("-X1:1", None) is None
+    assert len(index) == 2
+
+
+def test_add_and_discard():
+    index = WirenoIndex()
+    first = index.add(frame(("-K1:1", "-X1:1", "10")))
+    second = index.add(frame(("-K1:1", "-X2:1", "20"), ("-K3:1", "-X1:1", "")))
+    assert first.tolist() == [0] and second.tolist() == [1, 2]
+    assert index.lookup("-K1:1") == "10"
+    index.discard(first)
+    assert index.mapping == {"-K1:1": "20", "-X2:1": "20"}
+    # Frames without a Wireno column still take row ids
+    assert index.add(pd.DataFrame({"Name": ["-K9:1"], "Name.1": ["-K9:2"]})).tolist() == [3]
+
+
+def test_fill_takes_name_then_name_1():
+    df = frame(("-K1:1", "-X1:1", "10"), ("-X5:1", "-X1:1", ""), ("-X6:1", "-X7:1", ""), ("-K1:1", "-X2:1", "30"))
+    filled = WirenoIndex.from_frame(df).fill(df)
+    assert filled.tolist() == ["10", "10", "", "30"]
+    no_wireno = df.drop(columns="Wireno")
+    assert WirenoIndex.from_frame(df).fill(no_wireno).tolist() == ["10", "10", "", "10"]
+
+
+@pytest.mark.parametrize("precedence", ["row", "name_first"])
+def test_random_edits_match_a_rebuild(precedence):
+    rng = random.Random(0)
+    symbols = [f"-K{i}:1" for i in range(8)]
+    for _ in range(100):
+        index = WirenoIndex(precedence)
+        df = frame().astype(object)
+        ids = np.array([], dtype=np.int64)
+        for _ in range(rng.randint(1, 5)):
+            rows = frame(*[(rng.choice(symbols), rng.choice(symbols), rng.choice(["", "1", "2", "3", None]))
+                           for _ in range(rng.randint(0, 6))])
+            ids = np.concatenate([ids, index.add(rows)])
+            df = pd.concat([df, rows], ignore_index=True)
+            drop = np.array([rng.random() < 0.3 for _ in range(len(df))], dtype=bool)
+            index.discard(ids[drop])
+            df, ids = df[~drop].reset_index(drop=True), ids[~drop]
+            assert index.mapping == first_wireno(df, precedence)